@@ -0,0 +1,216 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+
+import db
+import engine
+import migrations
+import snapshot
+
+MODEL_VERSION = 1   # bump when engine.predict changes behaviour
+
+_hist: engine.History | None = None
+
+
+def model_version(params: dict[str, float] | None = None, seasons: list[str] | None = None) -> str:
+    params = {**engine.DEFAULT_PARAMS, **(params or {})}
+    blob = json.dumps([params, engine.RECENT_WEIGHTS.tolist(), engine.MIN_GAMES], sort_keys=True)
+    if seasons and list(seasons) != [db.CURRENT_SEASON]:
+        blob += json.dumps(sorted(seasons))   # other history, other results
+    return f"{MODEL_VERSION}-{hashlib.sha1(blob.encode()).hexdigest()[:10]}"
+
+
+def rank_corr(pred_rank: np.ndarray, actual_rank: np.ndarray) -> float:
+    if len(pred_rank) < 3:
+        return np.nan
+    a = pred_rank - pred_rank.mean()
+    b = actual_rank - actual_rank.mean()
+    den = np.sqrt((a * a).sum() * (b * b).sum())
+    return float((a * b).sum() / den) if den else np.nan
+
+
+def evaluate(hist: engine.History, dates: list[str], params: dict[str, float] | None = None) -> list[dict]:
+    pred = engine.predict(hist, dates, params=params)
+    scored = ~np.isnan(pred['actual_eff']) & ~np.isnan(pred['pred_eff'])
+    days = engine.to_days(dates)
+
+    results = []
+    for date, day in zip(dates, days):
+        on_date = scored & (pred['eval_day'] == day)
+        err = pred['error_eff'][on_date]
+        corrs = [
+            rank_corr(pred['pred_rank'][on_date & (pred['game_id'] == g)].astype(float),
+                      pred['actual_rank'][on_date & (pred['game_id'] == g)].astype(float))
+            for g in np.unique(pred['game_id'][on_date])
+        ]
+        corrs = [c for c in corrs if not np.isnan(c)]
+        results.append({
+            'eval_date': date,
+            'players': int(on_date.sum()),
+            'games': len(corrs),
+            'abs_err_sum': float(np.abs(err).sum()),
+            'err_sum': float(err.sum()),
+            'rank_corr_sum': float(sum(corrs)),
+        })
+    return results
+
+
+def init_worker(db_path: str, seasons: list[str] | None = None, snapshot_path: str | None = None) -> None:
+    global _hist
+    if snapshot_path:
+        # every worker maps the same files; the pages are shared, not copied
+        _hist = engine.History.from_snapshot(snapshot.Season(snapshot_path))
+        return
+    conn = sqlite3.connect(db_path)
+    _hist = engine.History(conn, seasons)
+    conn.close()
+
+
+def evaluate_chunk(args: tuple[list[str], dict | None]) -> list[dict]:
+    dates, params = args
+    return evaluate(_hist, dates, params)
+
+
+def history_digests(cur: sqlite3.Cursor, seasons: list[str]) -> dict[str, tuple[int, str]]:
+    # (Boxscore rows, digest of the Games and Boxscore rows engine.History reads) on or
+    # before each date; a corrected stat or a moved game changes the digest of every
+    # date from it on, so those cached results are recomputed
+    cur.execute(f"""
+        SELECT g.game_date, g.game_id, g.home_team, g.away_team, b.player_id, pl.position,
+               b.minutes_played, b.eff, b.ft_made, b.ft_taken, b.fouls_rv, b.fouls_cm
+        FROM Games g
+        LEFT JOIN Boxscore b ON b.game_id = g.game_id
+        LEFT JOIN Players pl ON pl.player_id = b.player_id
+        WHERE g.season_code IN ({','.join('?' * len(seasons))})
+        ORDER BY g.game_date, g.game_id, b.player_id
+    """, seasons)
+    digest = hashlib.sha1()
+    rows = 0
+    digests = {}
+    for date, on_date in groupby(cur, key=itemgetter(0)):
+        on_date = list(on_date)
+        digest.update(repr(on_date).encode())
+        rows += sum(row[4] is not None for row in on_date)
+        digests[date] = (rows, digest.hexdigest())
+    return digests
+
+
+def run(db_path: str = db.DB_PATH, workers: int = 4, params: dict[str, float] | None = None,
+        force: bool = False, seasons: list[str] | None = None, snapshot_path: str | None = None) -> list[dict]:
+    conn = db.connect(db_path)
+    migrations.migrate(conn)
+    cur = conn.cursor()
+    seasons = list(seasons or [db.CURRENT_SEASON])
+    version = model_version(params, seasons)
+    if snapshot_path:
+        season = snapshot.Season(snapshot_path)
+        if sorted(season.seasons) != sorted(seasons):
+            raise ValueError(f"{snapshot_path} holds {', '.join(season.seasons)}, not {', '.join(seasons)}")
+        if not season.is_current(conn):
+            raise ValueError(f"{snapshot_path} is older than {db_path}; export it again with snapshot.py")
+
+    # every date of the seasons that already has box scores can be scored
+    cur.execute(f"""
+        SELECT DISTINCT g.game_date
+        FROM Games g
+        WHERE g.season_code IN ({','.join('?' * len(seasons))})
+          AND EXISTS (SELECT 1 FROM Boxscore b WHERE b.game_id = g.game_id)
+        ORDER BY g.game_date
+    """, seasons)
+    dates = [row[0] for row in cur.fetchall()]
+    history = history_digests(cur, seasons)
+
+    cur.execute("SELECT eval_date, history_digest FROM BacktestResults WHERE model_version = ?", (version,))
+    cached = dict(cur.fetchall())
+    todo = [d for d in dates if force or cached.get(d) != history[d][1]]
+
+    if todo:
+        if workers <= 1 or len(todo) < 2 * workers:
+            hist = engine.History.from_snapshot(season) if snapshot_path else engine.History(conn, seasons)
+            results = evaluate(hist, todo, params)
+        else:
+            chunks = [(todo[i::workers], params) for i in range(workers)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(db_path, seasons, snapshot_path)) as pool:
+                results = [row for chunk in pool.map(evaluate_chunk, chunks) for row in chunk]
+
+        cur.executemany(
+            """
+            INSERT INTO BacktestResults (eval_date, model_version, history_rows, history_digest, players, games,
+                                         abs_err_sum, err_sum, rank_corr_sum, computed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'))
+            ON CONFLICT(eval_date, model_version) DO UPDATE SET history_rows   = excluded.history_rows,
+                                                                history_digest = excluded.history_digest,
+                                                                players        = excluded.players,
+                                                                games          = excluded.games,
+                                                                abs_err_sum    = excluded.abs_err_sum,
+                                                                err_sum        = excluded.err_sum,
+                                                                rank_corr_sum  = excluded.rank_corr_sum,
+                                                                computed_at    = excluded.computed_at
+            """,
+            [(r['eval_date'], version, *history[r['eval_date']], r['players'], r['games'],
+              r['abs_err_sum'], r['err_sum'], r['rank_corr_sum']) for r in results],
+        )
+        conn.commit()
+
+    cur.execute("""
+        SELECT eval_date, players, games, abs_err_sum, err_sum, rank_corr_sum
+        FROM BacktestResults
+        WHERE model_version = ?
+        ORDER BY eval_date
+    """, (version,))
+    rows = [
+        {'eval_date': d, 'players': n, 'games': g, 'abs_err_sum': ae, 'err_sum': e, 'rank_corr_sum': rc}
+        for d, n, g, ae, e, rc in cur.fetchall() if d in history
+    ]
+    conn.close()
+    print(f"Backtest {version}: {len(dates)} dates, {len(todo)} recomputed, {len(dates) - len(todo)} cached")
+    return rows
+
+
+def summarize(rows: list[dict]) -> dict[str, float]:
+    players = sum(r['players'] for r in rows)
+    games = sum(r['games'] for r in rows)
+    return {
+        'players': players,
+        'games': games,
+        'mae': sum(r['abs_err_sum'] for r in rows) / players if players else float('nan'),
+        'bias': sum(r['err_sum'] for r in rows) / players if players else float('nan'),
+        'rank_corr': sum(r['rank_corr_sum'] for r in rows) / games if games else float('nan'),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the EFF prediction model")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--force", action="store_true", help="recompute cached dates")
+    parser.add_argument("--per-date", action="store_true", help="print metrics for every date")
+    parser.add_argument("--seasons", nargs="+", default=[db.CURRENT_SEASON],
+                        help="seasons to load as history and score (default: %(default)s)")
+    parser.add_argument("--snapshot", help="load history from this snapshot.py export instead of the database")
+    parser.add_argument("--fitted", action="store_true", help="score the coefficients fit.py stored, not the defaults")
+    args = parser.parse_args()
+
+    params = None
+    if args.fitted:
+        conn = db.connect(args.db)
+        migrations.migrate(conn)
+        params = engine.load_params(conn)
+        conn.close()
+    rows = run(args.db, args.workers, params=params, force=args.force, seasons=args.seasons,
+               snapshot_path=args.snapshot)
+    if args.per_date:
+        for r in rows:
+            s = summarize([r])
+            print(f"{r['eval_date']}  players={s['players']:4d}  MAE={s['mae']:6.2f}  "
+                  f"bias={s['bias']:+6.2f}  rank_corr={s['rank_corr']:.3f}")
+    s = summarize(rows)
+    print(f"TOTAL  players={s['players']}  games={s['games']}  MAE={s['mae']:.3f}  "
+          f"bias={s['bias']:+.3f}  rank_corr={s['rank_corr']:.3f}")
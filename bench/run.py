@@ -0,0 +1,227 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import db
+import fetching
+from bench import stub_server, synth
+
+# Times the ingest stages against the stub server and the analytic queries on
+# synthetic databases, and compares the numbers with a stored baseline.
+#
+#   python -m bench.run --scales 1 10 --save-baseline
+#   python -m bench.run --scales 1 10
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ('update_teams', 'update_games', 'update_roster', 'update_boxscores', 'update_fantasy_prices')
+# the --player-pages path (one _next/data page per player), timed on its own copy so it
+# ingests the same season the stages above did; teams and games are its untimed setup
+PAGE_SETUP = ('update_teams', 'update_games')
+PAGE_STAGES = ('update_players',)
+QUERIES = ('predicted_eff.sql', 'undervalued.sql')
+BASELINE = os.path.join(ROOT, 'bench', 'baseline.json')
+TOLERANCE = 0.25    # relative slowdown that counts as a regression
+MIN_DELTA = 0.02    # seconds; smaller differences are noise
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def stub(db_path: str):
+    # separate process so serving does not compete with the stages for the GIL
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, '-m', 'bench.stub_server', db_path, '--port', str(port)],
+                            cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    try:
+        proc.stdout.readline()   # printed once the responses are built and the socket is bound
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def strip_latest_season(db_path: str) -> None:
+    # the state before the newest season was ingested; older seasons stay as history
+    conn = db.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("DELETE FROM Boxscore WHERE game_id IN (SELECT game_id FROM Games WHERE season_code = ?)",
+                (synth.LATEST_SEASON,))
+    cur.execute("DELETE FROM Games WHERE season_code = ?", (synth.LATEST_SEASON,))
+    cur.execute("DELETE FROM RoundSync WHERE season_code = ?", (synth.LATEST_SEASON,))
+    cur.execute("DELETE FROM PlayerIdentity")
+    conn.commit()
+    conn.close()
+
+
+def time_stages(db_path: str, base_url: str, stages: tuple[str, ...] = STAGES,
+                setup: tuple[str, ...] = ()) -> dict[str, float]:
+    for host in stub_server.HOSTS:
+        fetching.set_host_override(host, base_url)
+    fetching.set_cache_mode('live')
+    fetching.limiter = fetching.HostRateLimiter(0)   # the stub is local, don't pace it
+
+    timings = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        import update_data
+        update_data.DB_PATH = db_path
+        conn = db.connect(db_path)
+        cur = conn.cursor()
+        for stage in setup:
+            getattr(update_data, stage)(conn, cur)
+        for stage in stages:
+            t = time.perf_counter()
+            getattr(update_data, stage)(conn, cur)
+            timings[stage] = time.perf_counter() - t
+        conn.close()
+    return timings
+
+
+def query_plan(conn: sqlite3.Connection, sql: str) -> list[str]:
+    depth = {0: -1}
+    lines = []
+    for node, parent, _, detail in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + detail)
+    return lines
+
+
+def time_queries(db_path: str, repeat: int) -> tuple[dict[str, float], dict[str, list[str]]]:
+    conn = sqlite3.connect(db_path)
+    timings, plans = {}, {}
+    for name in QUERIES:
+        with open(os.path.join(ROOT, name)) as f:
+            sql = f.read()
+        plans[name] = query_plan(conn, sql)
+        best = float('inf')
+        for _ in range(repeat):
+            t = time.perf_counter()
+            conn.execute(sql).fetchall()
+            best = min(best, time.perf_counter() - t)
+        timings[name] = best
+    conn.close()
+    return timings, plans
+
+
+def run_scale(scale: int, workdir: str, repeat: int, ingest: bool) -> dict:
+    path = os.path.join(workdir, f'synth_{scale}x.db')
+    with contextlib.redirect_stdout(io.StringIO()):
+        t = time.perf_counter()
+        sizes = synth.generate(path, scale)
+        timings = {'generate': time.perf_counter() - t}
+
+    query_timings, plans = time_queries(path, repeat)
+    timings.update(query_timings)
+
+    if ingest:
+        ingest_path = os.path.join(workdir, f'ingest_{scale}x.db')
+        pages_path = os.path.join(workdir, f'pages_{scale}x.db')
+        for target in (ingest_path, pages_path):
+            shutil.copyfile(path, target)
+            strip_latest_season(target)
+        with stub(path) as base_url:
+            timings.update(time_stages(ingest_path, base_url))
+            timings.update(time_stages(pages_path, base_url, PAGE_STAGES, setup=PAGE_SETUP))
+
+    return {'sizes': sizes, 'timings': timings, 'plans': plans}
+
+
+def compare(report: dict, baseline: dict, tolerance: float = TOLERANCE,
+            min_delta: float = MIN_DELTA) -> tuple[list[str], list[str]]:
+    regressions, plan_changes = [], []
+    for scale, result in report['scales'].items():
+        base = baseline.get('scales', {}).get(scale)
+        if base is None:
+            continue
+        for name, seconds in result['timings'].items():
+            before = base['timings'].get(name)
+            if before is not None and seconds > before * (1 + tolerance) and seconds - before > min_delta:
+                regressions.append(f"{scale}x {name}: {before:.3f}s -> {seconds:.3f}s ({seconds / before - 1:+.0%})")
+        for name, plan in result['plans'].items():
+            if name in base['plans'] and base['plans'][name] != plan:
+                plan_changes.append(f"{scale}x {name}")
+    return regressions, plan_changes
+
+
+def print_report(report: dict, baseline: dict | None) -> None:
+    for scale, result in report['scales'].items():
+        base = (baseline or {}).get('scales', {}).get(scale, {}).get('timings', {})
+        sizes = result['sizes']
+        print(f"\n{scale}x: {sizes['games']:,} games, {sizes['boxscore']:,} box score rows, {sizes['players']:,} players")
+        for name, seconds in result['timings'].items():
+            line = f"  {name:24s} {seconds:9.3f}s"
+            if name in base:
+                line += f"   baseline {base[name]:9.3f}s  {seconds / base[name] - 1:+7.1%}"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark ingest stages and analytic queries on synthetic data")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--repeat", type=int, default=3, help="query runs per scale, the fastest counts")
+    parser.add_argument("--no-ingest", action="store_true", help="skip the update_* stages")
+    parser.add_argument("--workdir", help="where the databases go (default: a temp dir, removed afterwards)")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--out", help="also write the full report, query plans included, to this file")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='fg-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'scales': {},
+    }
+    try:
+        for scale in args.scales:
+            report['scales'][str(scale)] = run_scale(scale, workdir, args.repeat, not args.no_ingest)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    status = 0
+    if baseline is not None:
+        regressions, plan_changes = compare(report, baseline, args.tolerance)
+        for name in plan_changes:
+            print(f"Query plan changed: {name}")
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            status = 1
+        else:
+            print("\nNo regressions against the baseline.")
+    elif not args.save_baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one.")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    sys.exit(status)
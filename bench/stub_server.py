@@ -0,0 +1,240 @@
+import argparse
+import gzip
+import json
+import re
+import sqlite3
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bench import synth
+
+# Local stand-in for the upstream feeds, serving the newest season of a
+# synthetic database in the same shapes update_data.py parses. Point the
+# fetchers at it with fetching.set_host_override / FG_HOST_OVERRIDES.
+
+HOSTS = ('feeds.incrowdsports.com', 'www.euroleaguebasketball.net', 'fantasy.basketnews.com',
+         'api-live.euroleague.net')
+BUILD_ID = 'stub-build'
+FEED_PREFIX = f'/provider/euroleague-feeds/v2/competitions/E/seasons/{synth.LATEST_SEASON}'
+PLAYER_PAGE = re.compile(rf'^/_next/data/{BUILD_ID}/en/euroleague/players/[^/]+/([^/]+)\.json$')
+GAME_STATS = re.compile(rf'^/v3/competitions/E/seasons/{synth.LATEST_SEASON}/games/(\d+)/stats$')
+SITE_PAGE = '/en/euroleague/'
+
+
+def stat_row(*values) -> dict:
+    return {'statSets': [{'value': str(v)} for v in values]}
+
+
+def player_page(rows: list[tuple]) -> dict:
+    if not rows:
+        return {'pageProps': {'data': {'stats': {'currentSeason': None}}}}
+
+    sections = [[] for _ in range(6)]
+    head = []
+    for (date, is_home, opp, minutes, pts, fg2m, fg2a, fg3m, fg3a, ftm, fta, oreb, dreb,
+         ast, stl, fv_blk, ag_blk, fouls_cm, fouls_rv, eff) in rows:
+        seconds = round(minutes * 60)
+        sections[0].append(stat_row(f'{seconds // 60}:{seconds % 60:02d}', pts, f'{fg2m}/{fg2a}',
+                                    f'{fg3m}/{fg3a}', f'{ftm}/{fta}'))
+        sections[1].append(stat_row(oreb, dreb, oreb + dreb))
+        sections[2].append(stat_row(ast, stl, 0))
+        sections[3].append(stat_row(fv_blk, ag_blk))
+        sections[4].append(stat_row(fouls_cm, fouls_rv))
+        sections[5].append(stat_row(eff))
+        head.append({'statSets': [{'value': date}, {'value': opp, 'statType': 'vsType' if is_home else 'atType'}]})
+
+    # the site closes every table with an average and a totals row
+    for label in ('Averages', 'Totals'):
+        for section in sections:
+            section.append(stat_row(*(['-'] * len(section[0]['statSets']))))
+        head.append({'statSets': [{'value': label}]})
+
+    table = {'headSection': {'stats': head}, 'sections': [{'stats': s} for s in sections]}
+    return {'pageProps': {'data': {'stats': {'currentSeason': {'gameStats': [{'table': table}]}}}}}
+
+
+def game_stats(rows: list[tuple]) -> dict:
+    # same field names update_data.BOXSCORE_FIELDS reads
+    sides = {'local': [], 'road': []}
+    for (code, is_home, minutes, pts, fg2m, fg2a, fg3m, fg3a, ftm, fta, oreb, dreb,
+         ast, stl, fv_blk, ag_blk, fouls_cm, fouls_rv, eff) in rows:
+        sides['local' if is_home else 'road'].append({
+            'player': {'person': {'code': code}},
+            'stats': {
+                'timePlayed': round(minutes * 60), 'points': pts,
+                'fieldGoalsMade2': fg2m, 'fieldGoalsAttempted2': fg2a,
+                'fieldGoalsMade3': fg3m, 'fieldGoalsAttempted3': fg3a,
+                'freeThrowsMade': ftm, 'freeThrowsAttempted': fta,
+                'offensiveRebounds': oreb, 'defensiveRebounds': dreb, 'totalRebounds': oreb + dreb,
+                'assistances': ast, 'steals': stl, 'turnovers': 0,
+                'blocksFavour': fv_blk, 'blocksAgainst': ag_blk,
+                'foulsCommited': fouls_cm, 'foulsReceived': fouls_rv, 'valuation': eff,
+            },
+        })
+    return {side: {'players': players} for side, players in sides.items()}
+
+
+def encode(obj) -> bytes:
+    return json.dumps(obj).encode()
+
+
+def build_responses(db_path: str) -> dict:
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+
+    cur.execute("SELECT team_id, team_name, abbreviation FROM Teams ORDER BY team_id")
+    teams = {tid: (name, abbr) for tid, name, abbr in cur.fetchall()}
+    feeds = {'/clubs': {'data': [{'name': name, 'tvCode': abbr} for name, abbr in teams.values()]}}
+
+    cur.execute("""
+        SELECT p.player_code, p.player_name, p.team_id, p.position, p.fantasy_price
+        FROM Players p
+        WHERE p.fantasy_price > 0
+        ORDER BY p.player_name
+    """)
+    active = cur.fetchall()
+    people = []
+    records = defaultdict(list)
+    for code, name, team_id, position, price in active:
+        first, last = name.split(' ', 1)
+        team_name, abbr = teams[team_id]
+        people.append({
+            'person': {'code': code, 'name': f'{last}, {first}'},
+            'club': {'name': team_name, 'tvCode': abbr},
+            'positionName': position,
+        })
+        # every 20th fantasy record carries a typo so the fuzzy matcher has work to do
+        records[position[0]].append({
+            'id': f'bn-{code}',
+            'firstName': first.title(),
+            'middleName': None,
+            'lastName': last.title()[:-1] if int(code) % 20 == 0 else last.title(),
+            'team': {'team': {'abbreviation': abbr}},
+            'fantasyPrice': price,
+            'fantasyPriceChange': 0.0,
+        })
+    feeds['/people'] = {'data': people}
+    # pages per fantasy position filter (update_data.FANTASY_POSITIONS), None for all
+    records[None] = [record for page in list(records.values()) for record in page]
+    graphql = {position: {'data': {'playersSearchRecordsFromClient': {'records': page}}}
+               for position, page in records.items()}
+
+    # games come back round by round
+    cur.execute("""
+        SELECT game_date, home_team, away_team, home_score, away_score, game_code, round_number
+        FROM Games
+        WHERE season_code = ?
+        ORDER BY game_id
+    """, (synth.LATEST_SEASON,))
+    rounds: dict[int, list] = defaultdict(list)
+    for date, home, away, home_score, away_score, code, round_number in cur.fetchall():
+        rounds[round_number].append({
+            'code': code,
+            'date': f'{date}T19:00:00Z',
+            'played': bool(home_score or away_score),
+            'home': {'name': teams[home][0], 'score': home_score},
+            'away': {'name': teams[away][0], 'score': away_score},
+        })
+
+    cur.execute("""
+        SELECT p.player_code, g.game_code, g.game_date,
+               p.team_id = g.home_team,
+               CASE WHEN p.team_id = g.home_team THEN g.away_team ELSE g.home_team END,
+               b.minutes_played, b.pts, b.twofg_made, b.twofg_taken, b.threefg_made, b.threefg_taken,
+               b.ft_made, b.ft_taken, b.oreb, b.dreb, b.ast, b.stl, b.fv_blk, b.ag_blk,
+               b.fouls_cm, b.fouls_rv, b.eff
+        FROM Boxscore b
+        JOIN Games g   ON g.game_id = b.game_id
+        JOIN Players p ON p.player_id = b.player_id
+        WHERE g.season_code = ?
+        ORDER BY g.game_date
+    """, (synth.LATEST_SEASON,))
+    by_player: dict[str, list[tuple]] = defaultdict(list)
+    by_game: dict[int, list[tuple]] = defaultdict(list)
+    for code, game_code, date, is_home, opp, *stats in cur.fetchall():
+        by_player[code].append((date, is_home, teams[opp][1], *stats))
+        by_game[game_code].append((code, is_home, *stats))
+    conn.close()
+
+    site = f'<html><script id="__NEXT_DATA__" type="application/json">{{"buildId":"{BUILD_ID}"}}</script></html>'
+
+    return {
+        'feeds': {path: encode(body) for path, body in feeds.items()},
+        'site': site.encode(),
+        'rounds': {r: encode({'data': games}) for r, games in rounds.items()},
+        'pages': {code: encode(player_page(by_player.get(code, []))) for code, *_ in active},
+        'games': {code: encode(game_stats(rows)) for code, rows in by_game.items()},
+        'graphql': {position: gzip.compress(encode(body)) for position, body in graphql.items()},
+    }
+
+
+def make_handler(db_path: str) -> type[BaseHTTPRequestHandler]:
+    responses = build_responses(db_path)
+    empty_round = encode({'data': []})
+    empty_page = gzip.compress(encode({'data': {'playersSearchRecordsFromClient': {'records': []}}}))
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True   # headers and body go out in separate writes
+
+        def send_json(self, body: bytes | None, content_type: str = 'application/json',
+                      gzipped: bool = False) -> None:
+            if body is None:
+                self.send_error(404)
+                return
+            if gzipped and 'gzip' not in self.headers.get('Accept-Encoding', ''):
+                body = gzip.decompress(body)
+                gzipped = False
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            if gzipped:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            if parts.path.startswith(FEED_PREFIX):
+                endpoint = parts.path[len(FEED_PREFIX):]
+                if endpoint == '/games':
+                    round_number = int(parse_qs(parts.query).get('roundNumber', ['0'])[0])
+                    return self.send_json(responses['rounds'].get(round_number, empty_round))
+                return self.send_json(responses['feeds'].get(endpoint))
+            if parts.path == SITE_PAGE:
+                return self.send_json(responses['site'], 'text/html')
+            match = PLAYER_PAGE.match(parts.path)
+            if match:
+                return self.send_json(responses['pages'].get(match.group(1)))
+            match = GAME_STATS.match(parts.path)
+            self.send_json(responses['games'].get(int(match.group(1))) if match else None)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+            if self.path != '/backend/graphql':
+                return self.send_json(None)
+            position = body.get('variables', {}).get('position')
+            self.send_json(responses['graphql'].get(position, empty_page), gzipped=True)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(db_path: str, host: str = '127.0.0.1', port: int = 8765) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), make_handler(db_path))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the upstream feeds from a synthetic database")
+    parser.add_argument("db")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = serve(args.db, port=args.port)
+    print(f"Serving {args.db} on http://127.0.0.1:{args.port} for {', '.join(HOSTS)}", flush=True)
+    server.serve_forever()
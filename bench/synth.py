@@ -0,0 +1,220 @@
+import argparse
+import datetime as dt
+import os
+import time
+
+import numpy as np
+
+import create_database
+import db
+import features
+
+# Synthetic, schema-valid databases for benchmarking. Scale N means N seasons of a
+# full double round-robin (E2025, E2024, ...); the newest one, like the real data, has
+# only its first PLAYED_ROUNDS rounds played, so predicted_eff.sql and
+# undervalued.sql find the dates they evaluate.
+
+LATEST_SEASON = db.CURRENT_SEASON
+TEAMS = 20
+ROSTER = 14
+TURNOVER = 2                    # roster spots per team handed to new players every season
+PLAYED_ROUNDS = 13
+
+# round 13 / 14 of the newest season fall on the dates the analytic queries evaluate
+ROUND_ANCHORS = {13: dt.date(2025, 11, 25), 14: dt.date(2025, 12, 4)}
+
+POSITIONS = ['Guard', 'Forward', 'Center']
+ROSTER_POSITIONS = [0] * 6 + [1] * 5 + [2] * 3
+
+FIRST_NAMES = [
+    'ALEX', 'BEN', 'CARLOS', 'DARIUS', 'EDGARAS', 'FILIP', 'GIORGOS', 'HUGO', 'IVAN', 'JONAS',
+    'KOSTAS', 'LUKA', 'MARKO', 'NIKOLA', 'OMAR', 'PAULIUS', 'RAUL', 'SERGIO', 'TOMAS', 'VASILIJE',
+]
+SYLLABLES = ['KA', 'RO', 'MI', 'LE', 'VA', 'DU', 'SI', 'NO', 'TE', 'BRA', 'GO', 'ZE', 'PU', 'LIN', 'DA', 'RIS']
+
+# per-minute rates by position: 2pa, 3pa, fta, oreb, dreb, ast, stl, fv_blk, ag_blk, fouls_cm, fouls_rv, tov
+RATES = np.array([
+    [0.20, 0.18, 0.10, 0.02, 0.08, 0.17, 0.04, 0.005, 0.01, 0.09, 0.08, 0.06],
+    [0.22, 0.13, 0.10, 0.05, 0.13, 0.07, 0.03, 0.02, 0.01, 0.10, 0.08, 0.04],
+    [0.30, 0.02, 0.14, 0.10, 0.19, 0.05, 0.02, 0.05, 0.005, 0.13, 0.10, 0.05],
+])
+
+
+def last_name(player_id: int) -> str:
+    # unique per player, so fantasy records can be linked by exact name
+    name = ''
+    n = player_id
+    while True:
+        name += SYLLABLES[n % len(SYLLABLES)]
+        n //= len(SYLLABLES)
+        if n == 0:
+            return name + 'S'
+
+
+def round_dates(n_rounds: int, season_offset: int) -> list[dt.date]:
+    # weekly rounds around the anchors, whole seasons shifted back 52 weeks at a time
+    shift = dt.timedelta(weeks=52 * season_offset)
+    dates = []
+    for r in range(1, n_rounds + 1):
+        if r <= 13:
+            day = ROUND_ANCHORS[13] - dt.timedelta(weeks=13 - r)
+        else:
+            day = ROUND_ANCHORS[14] + dt.timedelta(weeks=r - 14)
+        dates.append(day - shift)
+    return dates
+
+
+def schedule(n_teams: int) -> list[list[tuple[int, int]]]:
+    # double round-robin by the circle method; second half mirrors the first
+    order = list(range(n_teams))
+    first_half = []
+    for r in range(n_teams - 1):
+        pairs = []
+        for i in range(n_teams // 2):
+            a, b = order[i], order[n_teams - 1 - i]
+            pairs.append((a, b) if (r + i) % 2 == 0 else (b, a))
+        first_half.append(pairs)
+        order = [order[0], order[-1]] + order[1:-1]
+    return first_half + [[(b, a) for a, b in pairs] for pairs in first_half]
+
+
+class Players:
+    def __init__(self, rng: np.random.Generator):
+        self.rng = rng
+        self.team: list[int] = []
+        self.position: list[int] = []
+        self.skill: list[float] = []
+        self.base_min: list[float] = []
+
+    def new(self, team: int, position: int) -> int:
+        self.team.append(team)
+        self.position.append(position)
+        self.skill.append(float(np.clip(self.rng.normal(1.0, 0.25), 0.4, 2.0)))
+        self.base_min.append(float(np.clip(self.rng.gamma(6.0, 3.2), 4.0, 34.0)))
+        return len(self.team) - 1
+
+
+def box_stats(rng: np.random.Generator, players: Players, idx: np.ndarray) -> dict[str, np.ndarray]:
+    position = np.asarray(players.position)[idx]
+    skill = np.asarray(players.skill)[idx]
+    base_min = np.asarray(players.base_min)[idx]
+    seconds = np.clip(base_min * 60 * rng.normal(1.0, 0.3, len(idx)), 60, 2400).astype(np.int64)
+    minutes = seconds / 60
+
+    lam = RATES[position] * (minutes * skill)[:, None]
+    fg2a, fg3a, fta, oreb, dreb, ast, stl, fv_blk, ag_blk, fouls_cm, fouls_rv, tov = rng.poisson(lam).T
+    fg2m = rng.binomial(fg2a, np.clip(0.50 + 0.05 * (skill - 1), 0.3, 0.7))
+    fg3m = rng.binomial(fg3a, np.clip(0.35 + 0.05 * (skill - 1), 0.2, 0.5))
+    ftm = rng.binomial(fta, 0.76)
+    pts = 2 * fg2m + 3 * fg3m + ftm
+    eff = (pts + oreb + dreb + ast + stl + fv_blk + fouls_rv
+           - (fg2a - fg2m) - (fg3a - fg3m) - (fta - ftm) - tov - ag_blk - fouls_cm)
+    return {
+        'seconds': seconds, 'pts': pts, 'fg2m': fg2m, 'fg2a': fg2a, 'fg3m': fg3m, 'fg3a': fg3a,
+        'ftm': ftm, 'fta': fta, 'oreb': oreb, 'dreb': dreb, 'ast': ast, 'stl': stl,
+        'fv_blk': fv_blk, 'ag_blk': ag_blk, 'fouls_cm': fouls_cm, 'fouls_rv': fouls_rv, 'eff': eff,
+    }
+
+
+def generate(path: str, scale: int = 1, n_teams: int = TEAMS, seed: int = 0,
+             played_rounds: int = PLAYED_ROUNDS) -> dict[str, int]:
+    if n_teams % 2:
+        raise ValueError("n_teams must be even")
+    if os.path.exists(path):
+        os.remove(path)
+    create_database.create_database(path)
+
+    rng = np.random.default_rng(seed)
+    players = Players(rng)
+    rosters = [[players.new(t, pos) for pos in ROSTER_POSITIONS] for t in range(n_teams)]
+    rounds = schedule(n_teams)
+
+    game_rows = []
+    box_idx = []
+    box_game = []
+    box_home = []
+    round_sync = []
+    for offset in range(scale - 1, -1, -1):
+        season = f'{LATEST_SEASON[0]}{int(LATEST_SEASON[1:]) - offset}'
+        if offset != scale - 1:
+            # off-season: a few players leave every team, new ones take their roster spots
+            for t, roster in enumerate(rosters):
+                for slot in rng.choice(ROSTER, TURNOVER, replace=False):
+                    roster[slot] = players.new(t, ROSTER_POSITIONS[slot])
+
+        for r, (pairs, day) in enumerate(zip(rounds, round_dates(len(rounds), offset)), start=1):
+            played = offset > 0 or r <= played_rounds
+            for i, (home, away) in enumerate(pairs):
+                game_id = len(game_rows) + 1
+                date = day + dt.timedelta(days=int(i >= len(pairs) // 2))
+                game_code = (r - 1) * len(pairs) + i + 1
+                game_rows.append([game_id, season, date.isoformat(), home + 1, away + 1, 0, 0, game_code, r])
+                if not played:
+                    continue
+                for team, is_home in ((home, 1), (away, 0)):
+                    dressed = rng.choice(rosters[team], int(rng.integers(10, 13)), replace=False)
+                    box_idx.extend(dressed)
+                    box_game.extend([game_id] * len(dressed))
+                    box_home.extend([is_home] * len(dressed))
+            round_sync.append((season, r, int(played), len(pairs)))
+
+    box_idx = np.asarray(box_idx, dtype=np.int64)
+    box_game = np.asarray(box_game, dtype=np.int64)
+    box_home = np.asarray(box_home, dtype=bool)
+    stats = box_stats(rng, players, box_idx)
+
+    # final scores are the sums of the box scores
+    home_pts = np.bincount(box_game[box_home], weights=stats['pts'][box_home], minlength=len(game_rows) + 1)
+    away_pts = np.bincount(box_game[~box_home], weights=stats['pts'][~box_home], minlength=len(game_rows) + 1)
+    for row in game_rows:
+        row[5], row[6] = int(home_pts[row[0]]), int(away_pts[row[0]])
+
+    # fantasy prices follow expected output; players without a roster spot are unpriced
+    active = {p for roster in rosters for p in roster}
+    value = np.asarray(players.skill) * np.asarray(players.base_min)
+    pct = value.argsort().argsort() / max(len(value) - 1, 1)
+    player_rows = [
+        (p + 1, f'{p + 1:06d}', f'{FIRST_NAMES[p % len(FIRST_NAMES)]} {last_name(p)}', players.team[p] + 1,
+         POSITIONS[players.position[p]], float(300_000 + round(pct[p] * 2200) * 1000) if p in active else 0.0, 0.0)
+        for p in range(len(players.team))
+    ]
+
+    columns = [box_game, box_idx + 1, stats['seconds'] / 60, stats['pts'], stats['fg2m'], stats['fg2a'],
+               stats['fg3m'], stats['fg3a'], stats['ftm'], stats['fta'], stats['oreb'], stats['dreb'],
+               stats['ast'], stats['stl'], stats['fv_blk'], stats['ag_blk'], stats['fouls_cm'],
+               stats['fouls_rv'], stats['eff']]
+    box_rows = list(zip(*(c.tolist() for c in columns)))
+
+    conn = db.connect(path)
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+    cur.executemany("INSERT INTO Teams VALUES (?, ?, ?)",
+                    [(t + 1, f'Synthetic Club {t + 1:02d}', f'S{t + 1:02d}') for t in range(n_teams)])
+    cur.executemany("INSERT INTO Players VALUES (?, ?, ?, ?, ?, ?, ?)", player_rows)
+    cur.executemany("INSERT INTO Games (game_id, season_code, game_date, home_team, away_team, home_score, away_score, "
+                    "game_code, round_number) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", game_rows)
+    cur.executemany(f"INSERT INTO Boxscore VALUES ({', '.join('?' * 19)})", box_rows)
+    cur.executemany("INSERT INTO RoundSync VALUES (?, ?, ?, ?, datetime('now'))", round_sync)
+    first_round = f"{round_dates(1, 0)[0].isoformat()} 00:00:00"
+    cur.executemany("INSERT INTO PriceHistory VALUES (?, ?, ?, ?)",
+                    [(pid, first_round, price, change) for pid, _, _, _, _, price, change in player_rows if price > 0])
+    features.rebuild(cur)
+    conn.commit()
+    cur.execute("ANALYZE")
+    conn.close()
+
+    return {'teams': n_teams, 'players': len(player_rows), 'games': len(game_rows), 'boxscore': len(box_rows)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic FantasyGenius database")
+    parser.add_argument("path")
+    parser.add_argument("--scale", type=int, default=1, help="number of seasons")
+    parser.add_argument("--teams", type=int, default=TEAMS)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    sizes = generate(args.path, args.scale, args.teams, args.seed)
+    print(f"{args.path}: " + ", ".join(f"{v:,} {k}" for k, v in sizes.items())
+          + f" in {time.perf_counter() - t:.1f}s")
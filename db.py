@@ -0,0 +1,16 @@
+import sqlite3
+
+DB_PATH = "database.db"
+# season ingested and modelled by default: competition code + start year (E = EuroLeague)
+CURRENT_SEASON = "E2025"
+
+
+def connect(path: str = DB_PATH, factory: type[sqlite3.Connection] = sqlite3.Connection,
+            timeout: float = 5.0) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, factory=factory, timeout=timeout)
+    # WAL lets readers keep querying while ingest writes; NORMAL only fsyncs at checkpoints
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA cache_size = -65536")
+    return conn
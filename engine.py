@@ -0,0 +1,380 @@
+import sqlite3
+import sys
+
+import numpy as np
+
+import db
+import snapshot
+
+# Same constants as predicted_eff.sql
+DEFAULT_PARAMS = {
+    'matchup_eff': 0.60,        # weight of opponent-vs-position EFF/min adjustment
+    'fouls_rv': 0.12,           # weight of opponent-vs-position fouls drawn adjustment
+    'ft_eff_scale': 0.9,        # FT attempts -> eff-space scaling
+    'home_away': 0.35,          # weight of the player's home/away split
+    'own_foul_penalty': 0.10,   # minutes lost per foul committed per game
+    'forced_foul_penalty': 0.05,
+    'foul_min_floor': 0.65,
+    'default_ft_pct': 0.75,
+    'recent_step': 0.10,        # weight of the n-th last game is max(recent_floor, 1 - n * recent_step)
+    'recent_floor': 0.20,
+}
+RECENT_WEIGHTS = np.array([1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3, 0.2, 0.2])
+MIN_GAMES = 3
+
+DATE_SPAN = 1 << 20     # days; composite keys are key * DATE_SPAN + date
+
+
+def to_days(dates) -> np.ndarray:
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+
+
+def from_days(days) -> list[str]:
+    return [str(d) for d in np.asarray(days).astype('datetime64[D]')]
+
+
+def recent_weights(params: dict[str, float]) -> np.ndarray:
+    # rounded so the defaults give RECENT_WEIGHTS exactly
+    n = np.arange(len(RECENT_WEIGHTS))
+    return np.maximum(params['recent_floor'], np.round(1.0 - n * params['recent_step'], 9))
+
+
+def load_params(conn: sqlite3.Connection) -> dict[str, float]:
+    # DEFAULT_PARAMS overridden by the coefficients fit.py stored, if any
+    try:
+        stored = dict(conn.execute("SELECT param, value FROM ModelParams").fetchall())
+    except sqlite3.OperationalError:   # not migrated yet
+        stored = {}
+    return {**DEFAULT_PARAMS, **{k: v for k, v in stored.items() if k in DEFAULT_PARAMS}}
+
+
+def per_min(values: np.ndarray, minutes: np.ndarray) -> np.ndarray:
+    # x / NULLIF(minutes, 0); NaN plays the role of NULL
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(minutes != 0, values / np.where(minutes != 0, minutes, 1), np.nan)
+
+
+def divide(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(den != 0, num / np.where(den != 0, den, 1), np.nan)
+
+
+class PrefixSums:
+    # Running sums per key in date order, so "all rows of key before date"
+    # aggregates are two binary searches instead of a scan.
+    def __init__(self, keys: np.ndarray, dates: np.ndarray, values: np.ndarray):
+        order = np.lexsort((dates, keys))
+        self.composite = keys[order].astype(np.int64) * DATE_SPAN + dates[order]
+        values = values[order]
+        present = ~np.isnan(values)
+        zero = np.zeros((1, values.shape[1]))
+        self.sums = np.vstack([zero, np.cumsum(np.where(present, values, 0.0), axis=0)])
+        self.counts = np.vstack([zero, np.cumsum(present, axis=0)])
+
+    def bounds(self, keys: np.ndarray, dates: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        base = keys.astype(np.int64) * DATE_SPAN
+        lo = np.searchsorted(self.composite, base, 'left')
+        hi = np.searchsorted(self.composite, base + dates, 'left')
+        return lo, hi
+
+    def mean_before(self, keys: np.ndarray, dates: np.ndarray) -> np.ndarray:
+        # AVG() over rows with date < dates, ignoring NULLs
+        lo, hi = self.bounds(keys, dates)
+        return divide(self.sums[hi] - self.sums[lo], self.counts[hi] - self.counts[lo])
+
+
+class History:
+    # Boxscore ⋈ Games ⋈ Players of the given seasons (default db.CURRENT_SEASON) loaded once into arrays
+    def __init__(self, conn: sqlite3.Connection, seasons: list[str] | None = None):
+        cur = conn.cursor()
+        self.seasons = list(seasons or [db.CURRENT_SEASON])
+        in_seasons = f"g.season_code IN ({','.join('?' * len(self.seasons))})"
+
+        cur.execute("SELECT team_id, team_name FROM Teams")
+        team_names = dict(cur.fetchall())
+
+        cur.execute("SELECT player_id, player_name, team_id, position FROM Players ORDER BY player_id")
+        players = cur.fetchall()
+
+        cur.execute(f"SELECT game_id, game_date, home_team, away_team FROM Games g WHERE {in_seasons} ORDER BY game_id",
+                    self.seasons)
+        games = cur.fetchall()
+
+        cur.execute(f"""
+            SELECT b.game_id, b.player_id, b.minutes_played, b.eff, b.ft_made, b.ft_taken, b.fouls_rv, b.fouls_cm
+            FROM Boxscore b
+            JOIN Games g ON g.game_id = b.game_id
+            JOIN Players pl ON pl.player_id = b.player_id
+            WHERE {in_seasons}
+        """, self.seasons)
+        box = np.array(cur.fetchall(), dtype=np.float64).reshape(-1, 8)
+
+        self.build(
+            team_names,
+            np.array([p[0] for p in players], dtype=np.int64), [p[1] for p in players],
+            np.array([p[2] for p in players], dtype=np.int64), [p[3] for p in players],
+            np.array([g[0] for g in games], dtype=np.int64), to_days([g[1] for g in games]),
+            np.array([g[2] for g in games], dtype=np.int64), np.array([g[3] for g in games], dtype=np.int64),
+            box.T,
+        )
+
+    @classmethod
+    def from_snapshot(cls, season: snapshot.Season) -> 'History':
+        # same arrays straight from the column files, no SQL and no per-row Python objects
+        hist = cls.__new__(cls)
+        hist.seasons = list(season.seasons)
+        players, games, box = season.players, season.games, season.box
+        hist.build(
+            dict(zip(season.teams['team_id'].tolist(), season.teams['team_name'].tolist())),
+            players['player_id'], players['player_name'].tolist(), players['team_id'], players['position'].tolist(),
+            games['game_id'], games['game_date'].view(np.int64), games['home_team'], games['away_team'],
+            [box[c] for c in ('game_id', 'player_id', 'minutes_played', 'eff', 'ft_made', 'ft_taken',
+                              'fouls_rv', 'fouls_cm')],
+        )
+        return hist
+
+    def build(self, team_names: dict[int, str], player_id: np.ndarray, player_name: list[str],
+              player_team: np.ndarray, player_position: list[str], game_id: np.ndarray, game_date: np.ndarray,
+              game_home: np.ndarray, game_away: np.ndarray, box: list[np.ndarray]) -> None:
+        # box columns: game_id, player_id, minutes, eff, ft_made, ft_taken, fouls_rv, fouls_cm
+        self.team_names = team_names
+        self.positions = sorted(set(player_position))
+        pos_code = {pos: i for i, pos in enumerate(self.positions)}
+        self.player_id = np.asarray(player_id, dtype=np.int64)
+        self.player_name = player_name
+        self.player_team = np.asarray(player_team, dtype=np.int64)
+        self.player_pos = np.array([pos_code[p] for p in player_position], dtype=np.int64)
+
+        self.game_id = np.asarray(game_id, dtype=np.int64)
+        self.game_date = np.asarray(game_date, dtype=np.int64)
+        self.game_home = np.asarray(game_home, dtype=np.int64)
+        self.game_away = np.asarray(game_away, dtype=np.int64)
+
+        box_game, box_player, minutes, eff, ft_made, ft_taken, fouls_rv, fouls_cm = (
+            np.asarray(c, dtype=np.float64) for c in box)
+        game_idx = np.searchsorted(self.game_id, box_game.astype(np.int64))
+        player_idx = np.searchsorted(self.player_id, box_player.astype(np.int64))
+
+        self.box_game = box_game.astype(np.int64)
+        self.box_player = box_player.astype(np.int64)
+        self.box_date = self.game_date[game_idx]
+        self.box_eff = eff
+        self.minutes = minutes
+        self.ft_made = ft_made
+        self.ft_taken = ft_taken
+        team = self.player_team[player_idx]
+        home = self.game_home[game_idx]
+        self.box_is_home = team == home
+        self.box_opp = np.where(self.box_is_home, self.game_away[game_idx], home)
+        self.box_pos = self.player_pos[player_idx]
+
+        eff_pm = per_min(self.box_eff, self.minutes)
+        fta_pm = per_min(self.ft_taken, self.minutes)
+        rv_pm = per_min(fouls_rv, self.minutes)
+        cm_pm = per_min(fouls_cm, self.minutes)
+        rates = np.column_stack([eff_pm, fta_pm, rv_pm, cm_pm])
+
+        # league_pos / opp_pos_allowed
+        self.league = PrefixSums(self.box_pos, self.box_date, rates)
+        self.allowed = PrefixSums(self.box_opp * len(self.positions) + self.box_pos, self.box_date, rates)
+
+        # player_home_away, over all of a player's history
+        split = np.column_stack([np.where(self.box_is_home, eff_pm, np.nan), np.where(self.box_is_home, np.nan, eff_pm)])
+        self.home_away = PrefixSums(self.box_player, self.box_date, split)
+
+        # player_recent: rows sorted by (player, date) so the last N games before a date are a slice
+        self.recent_order = np.lexsort((self.box_date, self.box_player))
+        self.recent_composite = self.box_player[self.recent_order] * DATE_SPAN + self.box_date[self.recent_order]
+        o = self.recent_order
+        self.recent_values = np.column_stack([
+            self.minutes[o], eff_pm[o], fta_pm[o], self.ft_made[o], self.ft_taken[o], rv_pm[o], cm_pm[o],
+        ])
+
+    def player_pool(self, eval_days: np.ndarray) -> dict[str, np.ndarray]:
+        # every (eval_date, game, player) for players on a team playing that day
+        g = np.flatnonzero(np.isin(self.game_date, eval_days))
+        g_rep = np.repeat(g, len(self.player_id))
+        p_rep = np.tile(np.arange(len(self.player_id)), len(g))
+        team = self.player_team[p_rep]
+        keep = (team == self.game_home[g_rep]) | (team == self.game_away[g_rep])
+        g_rep, p_rep = g_rep[keep], p_rep[keep]
+        is_home = self.player_team[p_rep] == self.game_home[g_rep]
+        return {
+            'eval_day': self.game_date[g_rep],
+            'game_id': self.game_id[g_rep],
+            'player_idx': p_rep,
+            'player_id': self.player_id[p_rep],
+            'team_id': self.player_team[p_rep],
+            'opp_team_id': np.where(is_home, self.game_away[g_rep], self.game_home[g_rep]),
+            'is_home': is_home,
+        }
+
+    def recent_form(self, player_ids: np.ndarray, days: np.ndarray,
+                    weights: np.ndarray = RECENT_WEIGHTS) -> dict[str, np.ndarray]:
+        base = player_ids * DATE_SPAN
+        lo = np.searchsorted(self.recent_composite, base, 'left')
+        hi = np.searchsorted(self.recent_composite, base + days, 'left')
+        n = len(weights)
+        back = np.arange(n)
+        valid = back[None, :] < (hi - lo)[:, None]
+        idx = np.where(valid, hi[:, None] - 1 - back[None, :], 0)
+        vals = self.recent_values[idx]                          # (pairs, n, columns)
+        w = np.where(valid, weights[None, :], 0.0)
+
+        def weighted(col):
+            v = vals[:, :, col]
+            present = valid & ~np.isnan(v)
+            total = np.where(present, v * w, 0.0).sum(axis=1)
+            return np.where(present.any(axis=1), divide(total, w.sum(axis=1)), np.nan)
+
+        return {
+            'games_used': valid.sum(axis=1),
+            'avg_min': divide((vals[:, :, 0] * w).sum(axis=1), w.sum(axis=1)),
+            'eff_per_min': weighted(1),
+            'fta_per_min': weighted(2),
+            'ft_pct': divide((vals[:, :, 3] * w).sum(axis=1), (vals[:, :, 4] * w).sum(axis=1)),
+            'fouls_rv_per_min': weighted(5),
+            'fouls_cm_per_min': weighted(6),
+        }
+
+    def matchup(self, opp_team_ids: np.ndarray, positions: np.ndarray, days: np.ndarray) -> np.ndarray:
+        # opp_pos_adj columns: eff, fta, fouls_rv, fouls_cm_forced (NaN when missing)
+        allowed = self.allowed.mean_before(opp_team_ids * len(self.positions) + positions, days)
+        league = self.league.mean_before(positions, days)
+        return allowed - league
+
+    def home_away_adj(self, player_ids: np.ndarray, days: np.ndarray, is_home: np.ndarray) -> np.ndarray:
+        split = self.home_away.mean_before(player_ids, days)
+        diff = np.where(is_home, split[:, 0] - split[:, 1], split[:, 1] - split[:, 0])
+        return np.nan_to_num(diff, nan=0.0)
+
+    def actual_eff(self, game_ids: np.ndarray, player_ids: np.ndarray) -> np.ndarray:
+        key = self.box_game * DATE_SPAN + self.box_player
+        order = np.argsort(key)
+        query = game_ids * DATE_SPAN + player_ids
+        pos = np.clip(np.searchsorted(key[order], query), 0, len(key) - 1)
+        found = key[order][pos] == query if len(key) else np.zeros(len(query), dtype=bool)
+        return np.where(found, self.box_eff[order][pos], np.nan)
+
+
+def features(hist: History, eval_dates: list[str], min_games: int = MIN_GAMES,
+             weights: np.ndarray = RECENT_WEIGHTS) -> dict[str, np.ndarray]:
+    # every input of the projection before the weights in DEFAULT_PARAMS are applied
+    pool = hist.player_pool(to_days(eval_dates))
+    days = pool['eval_day']
+    positions = hist.player_pos[pool['player_idx']]
+
+    form = hist.recent_form(pool['player_id'], days, weights)
+    keep = form['games_used'] >= min_games
+    pool = {k: v[keep] for k, v in pool.items()}
+    form = {k: v[keep] for k, v in form.items()}
+    days, positions = days[keep], positions[keep]
+
+    adj = np.nan_to_num(hist.matchup(pool['opp_team_id'], positions, days), nan=0.0)
+    return {
+        **pool,
+        'position': positions,
+        **form,
+        'eff_adj': adj[:, 0],
+        'fta_adj': adj[:, 1],
+        'rv_adj': adj[:, 2],
+        'cm_adj': adj[:, 3],
+        'home_diff': hist.home_away_adj(pool['player_id'], days, pool['is_home']),
+        'actual_eff': hist.actual_eff(pool['game_id'], pool['player_id']),
+    }
+
+
+def foul_factor(f: dict[str, np.ndarray], params: dict[str, float]) -> np.ndarray:
+    return np.maximum(
+        params['foul_min_floor'],
+        1.0
+        - params['own_foul_penalty'] * (f['fouls_cm_per_min'] * f['avg_min'])
+        - params['forced_foul_penalty'] * (f['cm_adj'] * f['avg_min']),
+    )
+
+
+def predict(hist: History, eval_dates: list[str], min_games: int = MIN_GAMES,
+            params: dict[str, float] | None = None) -> dict[str, np.ndarray]:
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    f = features(hist, eval_dates, min_games, recent_weights(params))
+    home_adj = params['home_away'] * f['home_diff']
+    ft_pct = np.where(np.isnan(f['ft_pct']), params['default_ft_pct'], f['ft_pct'])
+
+    pred_eff_per_min = (
+        f['eff_per_min']
+        + params['matchup_eff'] * f['eff_adj']
+        + params['fouls_rv'] * f['rv_adj']
+        + ft_pct * f['fta_adj'] * params['ft_eff_scale']
+        + home_adj
+    )
+    foul_min_factor = foul_factor(f, params)
+    pred_eff = pred_eff_per_min * (f['avg_min'] * foul_min_factor)
+    actual = f['actual_eff']
+
+    return {
+        **{k: f[k] for k in ('eval_day', 'game_id', 'player_idx', 'player_id', 'team_id', 'opp_team_id', 'is_home')},
+        'position': f['position'],
+        'games_used': f['games_used'],
+        'base_proj_min': f['avg_min'],
+        'base_eff_per_min': f['eff_per_min'],
+        'matchup_eff_adj': f['eff_adj'],
+        'matchup_fta_adj': f['fta_adj'],
+        'matchup_fouls_rv_adj': f['rv_adj'],
+        'matchup_fouls_cm_forced_adj': f['cm_adj'],
+        'home_adj': home_adj,
+        'foul_min_factor': foul_min_factor,
+        'pred_eff_per_min': pred_eff_per_min,
+        'pred_eff': pred_eff,
+        'actual_eff': actual,
+        'error_eff': actual - pred_eff,
+        'pred_rank': rank_within(f['eval_day'], f['game_id'], pred_eff),
+        'actual_rank': rank_within(f['eval_day'], f['game_id'], actual),
+    }
+
+
+def rank_within(days: np.ndarray, game_ids: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # ROW_NUMBER() OVER (PARTITION BY eval_date, game_id ORDER BY value DESC), NULLs last
+    order = np.lexsort((np.nan_to_num(-values, nan=np.inf), game_ids, days))
+    group = np.r_[True, (days[order][1:] != days[order][:-1]) | (game_ids[order][1:] != game_ids[order][:-1])]
+    starts = np.maximum.accumulate(np.where(group, np.arange(len(order)), 0))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(len(order)) - starts + 1
+    return ranks
+
+
+def prediction_rows(hist: History, pred: dict[str, np.ndarray]) -> list[dict]:
+    # the predicted_eff.sql output shape, ordered by eval_date, game_id, pred_rank
+    order = np.lexsort((pred['pred_rank'], pred['game_id'], pred['eval_day']))
+    dates = from_days(pred['eval_day'][order])
+    rows = []
+    for i, date in zip(order, dates):
+        p = pred['player_idx'][i]
+        actual = pred['actual_eff'][i]
+        rows.append({
+            'eval_date': date,
+            'game_id': int(pred['game_id'][i]),
+            'pred_rank': int(pred['pred_rank'][i]),
+            'player_name': hist.player_name[p],
+            'team': hist.team_names[int(pred['team_id'][i])],
+            'opponent': hist.team_names[int(pred['opp_team_id'][i])],
+            'position': hist.positions[pred['position'][i]],
+            'base_proj_min': round(float(pred['base_proj_min'][i]), 1),
+            'pred_eff': round(float(pred['pred_eff'][i]), 2),
+            'pred_eff_per_min': round(float(pred['pred_eff_per_min'][i]), 3),
+            'matchup_eff_adj': round(float(pred['matchup_eff_adj'][i]), 3),
+            'matchup_fta_adj': round(float(pred['matchup_fta_adj'][i]), 3),
+            'matchup_fouls_rv_adj': round(float(pred['matchup_fouls_rv_adj'][i]), 3),
+            'foul_min_factor': round(float(pred['foul_min_factor'][i]), 3),
+            'actual_eff': None if np.isnan(actual) else int(actual),
+            'error_eff': None if np.isnan(actual) else round(float(pred['error_eff'][i]), 2),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    # python engine.py 2025-12-04 2025-12-05
+    conn = db.connect()
+    hist = History(conn)
+    for row in prediction_rows(hist, predict(hist, sys.argv[1:])):
+        print("|".join("" if v is None else str(v) for v in row.values()))
+    conn.close()
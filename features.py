@@ -0,0 +1,185 @@
+import sqlite3
+import sys
+
+import db
+
+# Precomputed, always-current versions of the per-player and per-opponent
+# aggregates the analytic queries used to rebuild from all of Boxscore.
+# Both are built from the games of the seasons in temp.feature_seasons only
+# (db.CURRENT_SEASON unless a caller asks for more).
+
+PLAYER_FORM_SQL = """
+WITH hist AS (
+  SELECT
+    b.player_id,
+    g.game_date,
+    CASE WHEN pl.team_id = g.home_team THEN 1 ELSE 0 END AS is_home,
+    b.minutes_played, b.eff, b.ft_made, b.ft_taken, b.fouls_rv, b.fouls_cm,
+    b.oreb, b.dreb, b.ast, b.stl, b.fv_blk, b.ag_blk,
+    ROW_NUMBER() OVER (PARTITION BY b.player_id ORDER BY g.game_date DESC) AS rn
+  FROM Boxscore b
+  JOIN Games g    ON g.game_id = b.game_id
+  JOIN Players pl ON pl.player_id = b.player_id
+  WHERE b.player_id IN (SELECT player_id FROM temp.feature_players)
+    AND g.season_code IN (SELECT season_code FROM temp.feature_seasons)
+),
+weighted AS (
+  SELECT
+    *,
+    CASE rn
+      WHEN 1 THEN 1.00
+      WHEN 2 THEN 0.90
+      WHEN 3 THEN 0.80
+      WHEN 4 THEN 0.70
+      WHEN 5 THEN 0.60
+      WHEN 6 THEN 0.50
+      WHEN 7 THEN 0.40
+      WHEN 8 THEN 0.30
+      ELSE 0.20
+    END AS w
+  FROM hist
+  WHERE rn <= 10
+),
+form AS (
+  SELECT
+    player_id,
+    COUNT(*) AS form_games,
+    SUM(minutes_played * w) / NULLIF(SUM(w), 0) AS form_avg_min,
+    SUM((eff * 1.0 / NULLIF(minutes_played,0)) * w) / NULLIF(SUM(w), 0) AS form_eff_per_min,
+    SUM((ft_taken * 1.0 / NULLIF(minutes_played,0)) * w) / NULLIF(SUM(w), 0) AS form_fta_per_min,
+    SUM(ft_made * w) / NULLIF(SUM(ft_taken * w), 0) AS form_ft_pct,
+    SUM((fouls_rv * 1.0 / NULLIF(minutes_played,0)) * w) / NULLIF(SUM(w), 0) AS form_fouls_rv_per_min,
+    SUM((fouls_cm * 1.0 / NULLIF(minutes_played,0)) * w) / NULLIF(SUM(w), 0) AS form_fouls_cm_per_min,
+    SUM(((oreb + dreb) * 1.0 / NULLIF(minutes_played,0)) * w) / NULLIF(SUM(w), 0) AS form_reb_per_min,
+    SUM((ast * 1.0 / NULLIF(minutes_played,0)) * w) / NULLIF(SUM(w), 0) AS form_ast_per_min,
+    SUM((stl * 1.0 / NULLIF(minutes_played,0)) * w) / NULLIF(SUM(w), 0) AS form_stl_per_min,
+    SUM(((fv_blk + ag_blk) * 1.0 / NULLIF(minutes_played,0)) * w) / NULLIF(SUM(w), 0) AS form_blk_per_min
+  FROM weighted
+  GROUP BY player_id
+),
+recent8 AS (
+  SELECT
+    player_id,
+    COUNT(*) AS recent8_games,
+    AVG(minutes_played) AS recent8_avg_min,
+    AVG(eff * 1.0 / NULLIF(minutes_played,0)) AS recent8_eff_per_min,
+    AVG(fouls_rv * 1.0 / NULLIF(minutes_played,0)) AS recent8_fouls_rv_per_min,
+    AVG(fouls_cm * 1.0 / NULLIF(minutes_played,0)) AS recent8_fouls_cm_per_min
+  FROM hist
+  WHERE rn <= 8
+  GROUP BY player_id
+),
+totals AS (
+  SELECT
+    player_id,
+    COUNT(*) AS games_played,
+    MAX(game_date) AS last_game_date,
+    AVG(CASE WHEN is_home=1 THEN eff*1.0/NULLIF(minutes_played,0) END) AS home_eff_per_min,
+    AVG(CASE WHEN is_home=0 THEN eff*1.0/NULLIF(minutes_played,0) END) AS away_eff_per_min
+  FROM hist
+  GROUP BY player_id
+)
+INSERT INTO PlayerForm
+SELECT
+  t.player_id, t.games_played, t.last_game_date,
+  f.form_games, f.form_avg_min, f.form_eff_per_min, f.form_fta_per_min, f.form_ft_pct,
+  f.form_fouls_rv_per_min, f.form_fouls_cm_per_min,
+  f.form_reb_per_min, f.form_ast_per_min, f.form_stl_per_min, f.form_blk_per_min,
+  r.recent8_games, r.recent8_avg_min, r.recent8_eff_per_min, r.recent8_fouls_rv_per_min, r.recent8_fouls_cm_per_min,
+  t.home_eff_per_min, t.away_eff_per_min
+FROM totals t
+JOIN form f    ON f.player_id = t.player_id
+JOIN recent8 r ON r.player_id = t.player_id
+"""
+
+POSITION_ALLOWED_SQL = """
+INSERT INTO PositionAllowed
+SELECT
+  def_team_id,
+  position,
+  COUNT(*)                                     AS games,
+  COUNT(eff * 1.0 / NULLIF(minutes_played,0))  AS rated_games,
+  TOTAL(eff * 1.0 / NULLIF(minutes_played,0))      AS eff_per_min_sum,
+  TOTAL(ft_taken * 1.0 / NULLIF(minutes_played,0)) AS fta_per_min_sum,
+  TOTAL(fouls_rv * 1.0 / NULLIF(minutes_played,0)) AS fouls_rv_per_min_sum,
+  TOTAL(fouls_cm * 1.0 / NULLIF(minutes_played,0)) AS fouls_cm_per_min_sum
+FROM (
+  SELECT
+    CASE WHEN pl.team_id = g.home_team THEN g.away_team ELSE g.home_team END AS def_team_id,
+    pl.position,
+    b.minutes_played, b.eff, b.ft_taken, b.fouls_rv, b.fouls_cm
+  FROM Games g
+  JOIN Boxscore b ON b.game_id = g.game_id
+  JOIN Players pl ON pl.player_id = b.player_id
+  WHERE g.season_code IN (SELECT season_code FROM temp.feature_seasons)
+    AND (g.home_team IN (SELECT team_id FROM temp.feature_teams)
+         OR g.away_team IN (SELECT team_id FROM temp.feature_teams))
+)
+WHERE def_team_id IN (SELECT team_id FROM temp.feature_teams)
+GROUP BY def_team_id, position
+"""
+
+
+def refresh(cur: sqlite3.Cursor, player_ids: set[int], team_ids: set[int], seasons: list[str] | None = None) -> None:
+    # Recompute PlayerForm rows for player_ids and PositionAllowed rows for the
+    # defending teams in team_ids. Runs inside the caller's transaction.
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS feature_players (player_id INTEGER PRIMARY KEY)")
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS feature_teams (team_id INTEGER PRIMARY KEY)")
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS feature_seasons (season_code TEXT PRIMARY KEY)")
+    cur.execute("DELETE FROM temp.feature_players")
+    cur.execute("DELETE FROM temp.feature_teams")
+    cur.execute("DELETE FROM temp.feature_seasons")
+    cur.executemany("INSERT INTO temp.feature_players VALUES (?)", [(pid,) for pid in player_ids])
+    cur.executemany("INSERT INTO temp.feature_teams VALUES (?)", [(tid,) for tid in team_ids])
+    cur.executemany("INSERT INTO temp.feature_seasons VALUES (?)", [(s,) for s in seasons or [db.CURRENT_SEASON]])
+
+    cur.execute("DELETE FROM PlayerForm WHERE player_id IN (SELECT player_id FROM temp.feature_players)")
+    cur.execute(PLAYER_FORM_SQL)
+    cur.execute("DELETE FROM PositionAllowed WHERE def_team_id IN (SELECT team_id FROM temp.feature_teams)")
+    cur.execute(POSITION_ALLOWED_SQL)
+
+
+def teams_of_games(cur: sqlite3.Cursor, game_ids: set[int]) -> set[int]:
+    # both sides of every game
+    game_ids = sorted(game_ids)
+    team_ids: set[int] = set()
+    for i in range(0, len(game_ids), 500):
+        chunk = game_ids[i:i + 500]
+        cur.execute(
+            f"SELECT home_team, away_team FROM Games WHERE game_id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
+        for home_team, away_team in cur.fetchall():
+            team_ids.update((home_team, away_team))
+    return team_ids
+
+
+def refresh_for_boxscore(cur: sqlite3.Cursor, rows: list[tuple], seasons: list[str] | None = None) -> None:
+    # rows are Boxscore tuples as written by update_boxscore: (game_id, player_id, ...)
+    refresh(cur, {row[1] for row in rows}, teams_of_games(cur, {row[0] for row in rows}), seasons)
+
+
+def rebuild(cur: sqlite3.Cursor, seasons: list[str] | None = None) -> None:
+    cur.execute("SELECT player_id FROM Players")
+    player_ids = {row[0] for row in cur.fetchall()}
+    cur.execute("SELECT team_id FROM Teams")
+    team_ids = {row[0] for row in cur.fetchall()}
+    refresh(cur, player_ids, team_ids, seasons)
+
+
+def fill(cur: sqlite3.Cursor) -> bool:
+    # rebuild when the tables are empty but there are box scores to build them from,
+    # as after migrating an existing database; True if it did
+    cur.execute("SELECT EXISTS (SELECT 1 FROM PlayerForm) OR NOT EXISTS (SELECT 1 FROM Boxscore)")
+    if cur.fetchone()[0]:
+        return False
+    rebuild(cur)
+    return True
+
+
+if __name__ == "__main__":
+    # features.py [database] [season ...]
+    conn = db.connect(sys.argv[1] if len(sys.argv) > 1 else db.DB_PATH)
+    rebuild(conn.cursor(), sys.argv[2:] or None)
+    conn.commit()
+    conn.close()
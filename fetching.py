@@ -0,0 +1,261 @@
+import contextvars
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests as r
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+import instrument
+
+MAX_WORKERS = 8             # concurrent requests for bulk fetches
+REQUESTS_PER_SECOND = 10.0  # per host, 0 disables the limiter
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5          # seconds, doubled on every retry
+TIMEOUT = 30
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# live:   always hit the network, no cache
+# cache:  serve fresh entries from disk, revalidate stale ones with ETag / Last-Modified
+# record: always hit the network and store every response
+# replay: serve only from disk, never touch the network
+CACHE_MODE = os.environ.get('FG_HTTP_MODE', 'cache')
+CACHE_DIR = os.environ.get('FG_HTTP_CACHE', '.http_cache')
+DEFAULT_TTL = 0.0           # seconds an entry is served without revalidation
+CACHE_MODES = ('live', 'cache', 'record', 'replay')
+
+# host -> base url the request is sent to instead, e.g. a local stub server:
+# FG_HOST_OVERRIDES="feeds.incrowdsports.com=http://127.0.0.1:8765,..."
+# cache keys keep the original url
+HOST_OVERRIDES = dict(
+    item.split('=', 1) for item in os.environ.get('FG_HOST_OVERRIDES', '').split(',') if '=' in item
+)
+
+_session: r.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> r.Session:
+    # one keep-alive connection pool shared by every fetch in the process
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = r.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(MAX_WORKERS, 10))
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+    return _session
+
+
+class HostRateLimiter:
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_slot: dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, 0.0))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+limiter = HostRateLimiter(REQUESTS_PER_SECOND)
+
+
+def backoff_delay(attempt: int, resp: r.Response | None = None) -> float:
+    if resp is not None:
+        retry_after = resp.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return float(retry_after)
+    return BACKOFF_BASE * (2 ** attempt) * (1 + random.random() / 2)
+
+
+def set_host_override(host: str, base_url: str | None) -> None:
+    if base_url is None:
+        HOST_OVERRIDES.pop(host, None)
+    else:
+        HOST_OVERRIDES[host] = base_url
+
+
+def rewrite_url(url: str) -> str:
+    parts = urlsplit(url)
+    base_url = HOST_OVERRIDES.get(parts.netloc)
+    if base_url is None:
+        return url
+    return base_url.rstrip('/') + url[len(f'{parts.scheme}://{parts.netloc}'):]
+
+
+def request(method: str, url: str, **kwargs) -> r.Response:
+    original_url = url
+    url = rewrite_url(url)
+    host = urlsplit(url).netloc
+    kwargs.setdefault('timeout', TIMEOUT)
+    session = get_session()
+
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.wait(host)
+        started = time.perf_counter()
+        try:
+            resp = session.request(method, url, **kwargs)
+        except (r.ConnectionError, r.Timeout):
+            instrument.record_http(original_url, time.perf_counter() - started, 'error')
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        instrument.record_http(original_url, time.perf_counter() - started, resp.status_code)
+
+        if resp.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+            time.sleep(backoff_delay(attempt, resp))
+            continue
+        return resp
+
+
+class CacheMiss(Exception):
+    pass
+
+
+def set_cache_mode(mode: str, cache_dir: str | None = None) -> None:
+    global CACHE_MODE, CACHE_DIR
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown cache mode: {mode} (expected one of {', '.join(CACHE_MODES)})")
+    CACHE_MODE = mode
+    if cache_dir is not None:
+        CACHE_DIR = cache_dir
+
+
+def cache_key(method: str, url: str, kwargs: dict) -> str:
+    if kwargs.get('json') is not None:
+        body = json.dumps(kwargs['json'], sort_keys=True, separators=(',', ':'))
+    else:
+        body = kwargs.get('data') or ''
+    if isinstance(body, str):
+        body = body.encode()
+    return hashlib.sha256(method.encode() + b' ' + url.encode() + b'\n' + body).hexdigest()
+
+
+def load_cached(key: str) -> tuple[dict, bytes] | None:
+    path = os.path.join(CACHE_DIR, key)
+    try:
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        with open(path + '.body', 'rb') as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None
+    return meta, body
+
+
+def store_cached(key: str, method: str, url: str, resp: r.Response) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, key)
+    meta = {
+        'method': method,
+        'url': url,
+        'status_code': resp.status_code,
+        'headers': dict(resp.headers),
+        'encoding': resp.encoding,
+        'stored_at': time.time(),
+    }
+    # write to temp files first so concurrent readers never see half an entry
+    with open(path + '.body.tmp', 'wb') as f:
+        f.write(resp.content)
+    with open(path + '.json.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(path + '.body.tmp', path + '.body')
+    os.replace(path + '.json.tmp', path + '.json')
+
+
+def touch_cached(key: str, meta: dict) -> None:
+    meta['stored_at'] = time.time()
+    path = os.path.join(CACHE_DIR, key)
+    with open(path + '.json.tmp', 'w') as f:
+        json.dump(meta, f)
+    os.replace(path + '.json.tmp', path + '.json')
+
+
+def cached_response(meta: dict, body: bytes) -> r.Response:
+    resp = r.Response()
+    resp.status_code = meta['status_code']
+    resp.headers = CaseInsensitiveDict(meta['headers'])
+    resp.encoding = meta.get('encoding')
+    resp.url = meta['url']
+    resp._content = body
+    return resp
+
+
+def cached_request(method: str, url: str, ttl: float | None = None, **kwargs) -> r.Response:
+    if CACHE_MODE == 'live':
+        return request(method, url, **kwargs)
+
+    key = cache_key(method, url, kwargs)
+    cached = load_cached(key) if CACHE_MODE != 'record' else None
+
+    if CACHE_MODE == 'replay':
+        if cached is None:
+            raise CacheMiss(f"No recorded response for {method} {url}")
+        instrument.record_http(url, 0.0, 'cache')
+        return cached_response(*cached)
+
+    if cached is not None:
+        meta, body = cached
+        ttl = DEFAULT_TTL if ttl is None else ttl
+        if time.time() - meta['stored_at'] < ttl:
+            instrument.record_http(url, 0.0, 'cache')
+            return cached_response(meta, body)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        stored_headers = CaseInsensitiveDict(meta['headers'])
+        if 'ETag' in stored_headers:
+            headers['If-None-Match'] = stored_headers['ETag']
+        if 'Last-Modified' in stored_headers:
+            headers['If-Modified-Since'] = stored_headers['Last-Modified']
+        resp = request(method, url, headers=headers, **kwargs)
+        if resp.status_code == 304:
+            touch_cached(key, meta)
+            return cached_response(meta, body)
+    else:
+        resp = request(method, url, **kwargs)
+
+    if 200 <= resp.status_code < 300:
+        store_cached(key, method, url, resp)
+    return resp
+
+
+def get(url: str, **kwargs) -> r.Response:
+    return cached_request('GET', url, **kwargs)
+
+
+def post(url: str, **kwargs) -> r.Response:
+    return cached_request('POST', url, **kwargs)
+
+
+def map_in_context(fn, items: list, workers: int) -> list:
+    # results in input order; every call runs in a copy of the caller's context,
+    # so its requests are counted toward the caller's instrument stage
+    if workers <= 1:
+        return [fn(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [f.result() for f in futures]
+
+
+def get_many(urls: list[str], workers: int = MAX_WORKERS) -> list[r.Response]:
+    # responses come back in the same order as urls
+    return map_in_context(get, urls, workers)
+
+
+def post_many(url: str, payloads: list[dict], workers: int = MAX_WORKERS, **kwargs) -> list[r.Response]:
+    # one JSON POST per payload, responses in the same order as payloads
+    return map_in_context(lambda payload: post(url, json=payload, **kwargs), payloads, workers)
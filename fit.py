@@ -0,0 +1,169 @@
+import argparse
+import itertools
+import json
+import sqlite3
+import time
+
+import numpy as np
+
+import db
+import engine
+import migrations
+import snapshot
+
+# Fits the projection weights of engine.DEFAULT_PARAMS to past box scores and stores
+# them in ModelParams, where engine.load_params picks them up.
+#
+#   pred_eff = (eff_per_min + a*eff_adj + b*rv_adj + c*ft_pct*fta_adj + d*home_diff) * minutes
+#   minutes  = avg_min * max(floor, 1 - own*fouls_cm*avg_min - forced*cm_adj*avg_min)
+#
+# With the recency weights and foul penalties fixed, pred_eff is linear in a..d, so the
+# search is a small grid over those and one ridge solve per grid point, pulled towards
+# the hand-picked values. Walk-forward folds over dates pick the grid point and ridge
+# strength: each fold trains on every date before the ones it scores.
+#
+#   python fit.py                 # fit and store
+#   python fit.py --dry-run       # report only
+
+LINEAR = ('matchup_eff', 'fouls_rv', 'ft_eff_scale', 'home_away')
+GRID = {
+    'recent_step': (0.05, 0.10, 0.15, 0.20),
+    'recent_floor': (0.1, 0.2, 0.4),
+    'own_foul_penalty': (0.0, 0.05, 0.10, 0.15),
+    'forced_foul_penalty': (0.0, 0.05, 0.10),
+}
+ALPHAS = (0.01, 0.1, 1.0, 10.0)     # ridge strength per training row
+FOLDS = 5
+
+
+def design(f: dict[str, np.ndarray], params: dict[str, float]) -> tuple[np.ndarray, np.ndarray]:
+    # X @ [a, b, c, d] + offset = pred_eff for the scored rows of engine.features
+    ft_pct = np.where(np.isnan(f['ft_pct']), params['default_ft_pct'], f['ft_pct'])
+    minutes = f['avg_min'] * engine.foul_factor(f, params)
+    X = np.column_stack([f['eff_adj'], f['rv_adj'], ft_pct * f['fta_adj'], f['home_diff']]) * minutes[:, None]
+    return X, f['eff_per_min'] * minutes
+
+
+def date_blocks(days: np.ndarray, folds: int) -> np.ndarray:
+    # contiguous date blocks 0..folds, about equal in dates
+    unique = np.unique(days)
+    edges = unique[np.linspace(0, len(unique), folds + 2).astype(int)[1:-1]]
+    return np.searchsorted(edges, days, 'right')
+
+
+def ridge(G: np.ndarray, r: np.ndarray, n: int, alpha: float, prior: np.ndarray) -> np.ndarray:
+    lam = alpha * n
+    return np.linalg.solve(G + lam * np.eye(len(prior)), r + lam * prior)
+
+
+def fit(hist: engine.History, dates: list[str], folds: int = FOLDS) -> dict:
+    defaults = engine.DEFAULT_PARAMS
+    prior = np.array([defaults[k] for k in LINEAR])
+    best = None
+    baseline = None
+
+    for step, floor in itertools.product(GRID['recent_step'], GRID['recent_floor']):
+        f = engine.features(hist, dates, weights=engine.recent_weights({'recent_step': step, 'recent_floor': floor}))
+        scored = ~np.isnan(f['actual_eff']) & ~np.isnan(f['eff_per_min'])
+        f = {k: v[scored] for k, v in f.items()}
+        y = f['actual_eff']
+        block = date_blocks(f['eval_day'], folds)
+        masks = [block == b for b in range(folds + 1)]
+        val_rows = sum(m.sum() for m in masks[1:])
+
+        for own, forced in itertools.product(GRID['own_foul_penalty'], GRID['forced_foul_penalty']):
+            params = {**defaults, 'recent_step': step, 'recent_floor': floor,
+                      'own_foul_penalty': own, 'forced_foul_penalty': forced}
+            X, offset = design(f, params)
+            target = y - offset
+            # per-block normal equations; a fold's training set is a prefix of blocks
+            G = np.cumsum([X[m].T @ X[m] for m in masks], axis=0)
+            r = np.cumsum([X[m].T @ target[m] for m in masks], axis=0)
+            n = np.cumsum([m.sum() for m in masks])
+
+            if all(params[k] == defaults[k] for k in GRID):
+                err = sum(np.abs(target[m] - X[m] @ prior).sum() for m in masks[1:])
+                baseline = err / val_rows
+
+            for alpha in ALPHAS:
+                err = 0.0
+                for k in range(folds):
+                    beta = ridge(G[k], r[k], n[k], alpha, prior)
+                    m = masks[k + 1]
+                    err += np.abs(target[m] - X[m] @ beta).sum()
+                cv_mae = err / val_rows
+                if best is None or cv_mae < best['cv_mae']:
+                    beta = ridge(G[-1], r[-1], n[-1], alpha, prior)
+                    best = {
+                        'cv_mae': cv_mae,
+                        'alpha': alpha,
+                        'rows': int(n[-1]),
+                        'params': {**{k: params[k] for k in GRID},
+                                   **{k: float(v) for k, v in zip(LINEAR, beta)}},
+                    }
+    return {**best, 'default_cv_mae': baseline}
+
+
+def save(conn: sqlite3.Connection, result: dict, seasons: list[str]) -> str:
+    cur = conn.cursor()
+    cur.execute("SELECT datetime('now')")
+    fitted_at = cur.fetchone()[0]
+    cur.executemany("INSERT OR REPLACE INTO ModelParams (param, value, fitted_at) VALUES (?, ?, ?)",
+                    [(k, v, fitted_at) for k, v in result['params'].items()])
+    cur.execute(
+        """
+        INSERT OR REPLACE INTO ModelFits (fitted_at, seasons, rows, cv_mae, default_cv_mae, params)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (fitted_at, ','.join(seasons), result['rows'], result['cv_mae'], result['default_cv_mae'],
+         json.dumps(result['params'], sort_keys=True)),
+    )
+    conn.commit()
+    return fitted_at
+
+
+def scored_dates(cur: sqlite3.Cursor, seasons: list[str]) -> list[str]:
+    cur.execute(f"""
+        SELECT DISTINCT g.game_date
+        FROM Games g
+        WHERE g.season_code IN ({','.join('?' * len(seasons))})
+          AND EXISTS (SELECT 1 FROM Boxscore b WHERE b.game_id = g.game_id)
+        ORDER BY g.game_date
+    """, seasons)
+    return [row[0] for row in cur.fetchall()]
+
+
+def refit(conn: sqlite3.Connection, seasons: list[str] | None = None, snapshot_path: str | None = None,
+          dry_run: bool = False) -> dict:
+    seasons = list(seasons or [db.CURRENT_SEASON])
+    hist = engine.History.from_snapshot(snapshot.Season(snapshot_path)) if snapshot_path else engine.History(conn, seasons)
+    dates = scored_dates(conn.cursor(), seasons)
+    if len(dates) < FOLDS + 1:
+        raise ValueError(f"{len(dates)} dates with box scores, need at least {FOLDS + 1} to fit")
+    result = fit(hist, dates)
+    if not dry_run:
+        result['fitted_at'] = save(conn, result, seasons)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the EFF projection weights and store them in ModelParams")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--seasons", nargs="+", default=[db.CURRENT_SEASON])
+    parser.add_argument("--snapshot", help="load history from this snapshot.py export instead of the database")
+    parser.add_argument("--dry-run", action="store_true", help="report the fit without storing it")
+    args = parser.parse_args()
+
+    conn = db.connect(args.db)
+    migrations.migrate(conn)
+    t = time.perf_counter()
+    result = refit(conn, args.seasons, args.snapshot, args.dry_run)
+    elapsed = time.perf_counter() - t
+    conn.close()
+
+    print(f"Fitted on {result['rows']:,} scored rows in {elapsed:.2f}s (ridge alpha {result['alpha']})")
+    print(f"Walk-forward MAE: default {result['default_cv_mae']:.3f} -> fitted {result['cv_mae']:.3f}")
+    for name, value in result['params'].items():
+        print(f"  {name:22s} {engine.DEFAULT_PARAMS[name]:7.3f} -> {value:7.3f}")
+    if not args.dry_run:
+        print(f"Stored in ModelParams at {result['fitted_at']}")
@@ -0,0 +1,107 @@
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+
+import db
+import engine
+import migrations
+
+# Projected EFF over the next rounds, for transfer planning. Every game in the horizon
+# goes through one engine.predict pass: form is as of the last box score, and each game
+# gets its own opponent's allowed-by-position adjustment and the home/away split. The
+# games are then summed into a players x rounds matrix, so a team with two games in a
+# round (a rescheduled one) counts both.
+#
+#   python horizon.py --rounds 10
+#   python horizon.py --rounds 5 --from-round 20 --position Guard
+
+
+def horizon_games(cur: sqlite3.Cursor, n_rounds: int, from_round: int | None = None,
+                  season: str = db.CURRENT_SEASON) -> tuple[list[int], np.ndarray, np.ndarray, list[str]]:
+    # (rounds, game_ids, each game's round, dates) of rounds from_round .. from_round + n_rounds - 1;
+    # by default from the first round with a game still to play
+    if from_round is None:
+        cur.execute("""
+            SELECT MIN(round_number), COUNT(*) - COUNT(round_number)
+            FROM Games
+            WHERE season_code = ? AND home_score = 0 AND away_score = 0
+        """, (season,))
+        from_round, unnumbered = cur.fetchone()
+        if unnumbered:
+            raise ValueError(f"{unnumbered} upcoming games have no round number; run update_data.py --stages games")
+        if from_round is None:
+            raise ValueError(f"No games left to play in {season}")
+
+    cur.execute("""
+        SELECT game_id, round_number, game_date
+        FROM Games
+        WHERE season_code = ? AND round_number >= ? AND round_number < ?
+        ORDER BY game_id
+    """, (season, from_round, from_round + n_rounds))
+    rows = cur.fetchall()
+    game_ids = np.array([r[0] for r in rows], dtype=np.int64)
+    game_rounds = np.array([r[1] for r in rows], dtype=np.int64)
+    return sorted(set(game_rounds.tolist())), game_ids, game_rounds, sorted({r[2] for r in rows})
+
+
+def project(hist: engine.History, rounds: list[int], game_ids: np.ndarray, game_rounds: np.ndarray,
+            dates: list[str], params: dict[str, float] | None = None) -> dict[str, np.ndarray]:
+    # matrix[p, r]: projected EFF of hist player p in rounds[r]; games[p, r]: how many games that is
+    pred = engine.predict(hist, dates, params=params)
+    pos = np.clip(np.searchsorted(game_ids, pred['game_id']), 0, max(len(game_ids) - 1, 0))
+    keep = (game_ids[pos] == pred['game_id']) if len(game_ids) else np.zeros(len(pos), dtype=bool)
+    col = np.searchsorted(rounds, game_rounds[pos[keep]])
+    rows = pred['player_idx'][keep]
+
+    shape = (len(hist.player_id), len(rounds))
+    matrix = np.zeros(shape)
+    games = np.zeros(shape, dtype=np.int64)
+    np.add.at(matrix, (rows, col), np.nan_to_num(pred['pred_eff'][keep]))
+    np.add.at(games, (rows, col), 1)
+    return {
+        'rounds': np.asarray(rounds),
+        'matrix': matrix,
+        'games': games,
+        'total': matrix.sum(axis=1),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Project EFF per player over the next rounds")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--season", default=db.CURRENT_SEASON)
+    parser.add_argument("--rounds", type=int, default=5, help="rounds in the horizon (default: %(default)s)")
+    parser.add_argument("--from-round", type=int, help="first round (default: the next one with games to play)")
+    parser.add_argument("--position", help="only players at this position")
+    parser.add_argument("--top", type=int, default=30, help="players to print, by horizon total")
+    args = parser.parse_args()
+
+    conn = db.connect(args.db)
+    migrations.migrate(conn)
+    cur = conn.cursor()
+    t = time.perf_counter()
+    hist = engine.History(conn, [args.season])
+    rounds, game_ids, game_rounds, dates = horizon_games(cur, args.rounds, args.from_round, args.season)
+    result = project(hist, rounds, game_ids, game_rounds, dates, engine.load_params(conn))
+    elapsed = time.perf_counter() - t
+    cur.execute("SELECT player_id, fantasy_price FROM Players")
+    prices = dict(cur.fetchall())
+    conn.close()
+
+    print(f"Rounds {rounds[0]}-{rounds[-1]}: {len(game_ids)} games, {int((result['games'].sum(axis=1) > 0).sum())} "
+          f"players projected in {elapsed * 1000:.0f}ms")
+    show = result['games'].sum(axis=1) > 0
+    if args.position:
+        show &= np.array([hist.positions[p] == args.position for p in hist.player_pos])
+    header = ''.join(f"{'R' + str(r):>6s} " for r in rounds)
+    print(f"\n{'player':25s} {'team':22s} {'price':>9s} {'total':>7s}{header}")
+    for p in [p for p in np.argsort(-result['total']) if show[p]][:args.top]:
+        cells = ''.join(
+            f"{v:6.1f}" + ('*' if g > 1 else ' ') if g else f"{'-':>6s} "
+            for v, g in zip(result['matrix'][p], result['games'][p])
+        )
+        print(f"{hist.player_name[p]:25s} {hist.team_names[int(hist.player_team[p])][:22]:22s} "
+              f"{prices.get(int(hist.player_id[p]), 0):9,.0f} {result['total'][p]:7.1f} {cells}")
+    print("\n* two games in the round")
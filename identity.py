@@ -0,0 +1,66 @@
+import sqlite3
+import sys
+
+import db
+
+FANTASY_SOURCE = 'basketnews'
+
+
+def load_identities(cur: sqlite3.Cursor, source: str) -> dict[str, int | None]:
+    # external id -> player_id; None means we looked before and found no confident match
+    cur.execute("SELECT external_id, player_id FROM PlayerIdentity WHERE source = ?", (source,))
+    return dict(cur.fetchall())
+
+
+def save_identities(cur: sqlite3.Cursor, source: str, rows: list[tuple[str, int | None, float]]) -> None:
+    # rows are (external_id, player_id or None, match score); manual overrides are never replaced
+    cur.executemany(
+        """
+        INSERT INTO PlayerIdentity (source, external_id, player_id, match_score, is_override, updated_at)
+        VALUES (?, ?, ?, ?, 0, datetime('now'))
+        ON CONFLICT(source, external_id) DO UPDATE SET player_id   = excluded.player_id,
+                                                       match_score = excluded.match_score,
+                                                       updated_at  = excluded.updated_at
+            WHERE PlayerIdentity.is_override = 0
+        """,
+        [(source, external_id, player_id, score) for external_id, player_id, score in rows],
+    )
+
+
+def set_override(cur: sqlite3.Cursor, source: str, external_id: str, player_code: str) -> None:
+    cur.execute("SELECT player_id FROM Players WHERE player_code = ?", (player_code,))
+    row = cur.fetchone()
+    if row is None:
+        raise ValueError(f"Player not found in Players table: {player_code}")
+
+    cur.execute(
+        """
+        INSERT INTO PlayerIdentity (source, external_id, player_id, match_score, is_override, updated_at)
+        VALUES (?, ?, ?, NULL, 1, datetime('now'))
+        ON CONFLICT(source, external_id) DO UPDATE SET player_id   = excluded.player_id,
+                                                       match_score = NULL,
+                                                       is_override = 1,
+                                                       updated_at  = excluded.updated_at
+        """,
+        (source, external_id, row[0]),
+    )
+
+
+def clear_identity(cur: sqlite3.Cursor, source: str, external_id: str) -> None:
+    cur.execute("DELETE FROM PlayerIdentity WHERE source = ? AND external_id = ?", (source, external_id))
+
+
+if __name__ == "__main__":
+    # python identity.py link <external_id> <player_code> [source]
+    # python identity.py unlink <external_id> [source]
+    conn = db.connect()
+    cur = conn.cursor()
+    match sys.argv[1:]:
+        case ['link', external_id, player_code, *rest]:
+            set_override(cur, rest[0] if rest else FANTASY_SOURCE, external_id, player_code)
+        case ['unlink', external_id, *rest]:
+            clear_identity(cur, rest[0] if rest else FANTASY_SOURCE, external_id)
+        case _:
+            sys.exit("usage: identity.py link <external_id> <player_code> [source] | unlink <external_id> [source]")
+    conn.commit()
+    conn.close()
@@ -0,0 +1,278 @@
+import cProfile
+import contextvars
+import json
+import os
+import pstats
+import re
+import sqlite3
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:     # not available on Windows; peak RSS is then left out
+    resource = None
+
+# Per-stage counters for update_data runs: wall/CPU time, HTTP calls per endpoint,
+# SQL statements, rows written and memory. Every hook is a no-op unless a run was
+# started with start(), so the fetch and db code can call them unconditionally.
+# The current stage is a context variable: stages running in parallel threads keep
+# separate counters, and pools that copy the caller's context (fetching) count
+# toward the caller's stage.
+
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+TOP_STATEMENTS = 15
+DIGITS = re.compile(r'\d')
+
+
+def endpoint(url: str) -> str:
+    # group urls that only differ by ids: player pages collapse to one entry,
+    # path segments with digits (season codes, build ids) become '*'
+    parts = urlsplit(url)
+    segments = parts.path.strip('/').split('/')
+    if parts.path.endswith('.json') and 'players' in segments:
+        segments = segments[:segments.index('players') + 1] + ['*']
+    return parts.netloc + '/' + '/'.join('*' if DIGITS.search(s) else s for s in segments)
+
+
+class Stage:
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.http: dict[str, dict] = {}
+        self.sql: dict[str, list] = {}     # statement -> [calls, seconds, rows]
+        self.rows: dict[str, dict[str, int]] = {}
+        self.peak_rss_kb: int | None = None
+        self.peak_traced_kb: int | None = None
+
+    def report(self) -> dict:
+        statements = sorted(self.sql.items(), key=lambda item: -item[1][1])
+        return {
+            'name': self.name,
+            'wall_s': round(self.wall, 4),
+            'cpu_s': round(self.cpu, 4),
+            'peak_rss_kb': self.peak_rss_kb,
+            'peak_traced_kb': self.peak_traced_kb,
+            'http': self.http,
+            'sql': {
+                'statements': sum(calls for calls, _, _ in self.sql.values()),
+                'seconds': round(sum(seconds for _, seconds, _ in self.sql.values()), 4),
+                'rows': sum(rows for _, _, rows in self.sql.values()),
+                'top': [
+                    {'sql': sql, 'calls': calls, 'seconds': round(seconds, 4), 'rows': rows}
+                    for sql, (calls, seconds, rows) in statements[:TOP_STATEMENTS]
+                ],
+            },
+            'rows': self.rows,
+        }
+
+
+class Run:
+    def __init__(self, trace_memory: bool = False):
+        self.started_at = time.strftime('%Y-%m-%dT%H:%M:%S')
+        self.trace_memory = trace_memory
+        self.stages: list[Stage] = []
+        self.current: contextvars.ContextVar[Stage | None] = contextvars.ContextVar('stage', default=None)
+        self.outside: Stage | None = None
+        self.lock = threading.Lock()
+        if trace_memory:
+            tracemalloc.start()
+
+    def stage_stats(self) -> Stage:
+        # work outside any stage (imports, setup) still gets counted somewhere
+        current = self.current.get()
+        if current is not None:
+            return current
+        if self.outside is None:
+            self.outside = Stage('(outside stages)')
+            self.stages.append(self.outside)
+        return self.outside
+
+    @contextmanager
+    def stage(self, name: str):
+        stats = Stage(name)
+        with self.lock:
+            self.stages.append(stats)
+        token = self.current.set(stats)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield stats
+        finally:
+            stats.wall = time.perf_counter() - wall
+            stats.cpu = time.process_time() - cpu
+            if resource is not None:
+                stats.peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if self.trace_memory:
+                stats.peak_traced_kb = tracemalloc.get_traced_memory()[1] // 1024
+            self.current.reset(token)
+
+    def record_http(self, url: str, seconds: float, status: int | str) -> None:
+        with self.lock:
+            stats = self.stage_stats()
+            entry = stats.http.setdefault(endpoint(url), {
+                'requests': 0, 'cache_hits': 0, 'errors': 0, 'seconds': 0.0, 'max_s': 0.0,
+                'statuses': {}, 'latency_ms': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            })
+            if status == 'cache':
+                entry['cache_hits'] += 1
+                return
+            entry['requests'] += 1
+            entry['seconds'] += seconds
+            entry['max_s'] = max(entry['max_s'], seconds)
+            entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+            if status == 'error' or (isinstance(status, int) and status >= 400):
+                entry['errors'] += 1
+            ms = seconds * 1000
+            entry['latency_ms'][sum(ms > bound for bound in LATENCY_BUCKETS_MS)] += 1
+
+    def record_sql(self, sql: str, seconds: float, rows: int, calls: int = 1) -> None:
+        with self.lock:
+            entry = self.stage_stats().sql.setdefault(' '.join(sql.split())[:200], [0, 0.0, 0])
+            entry[0] += calls
+            entry[1] += seconds
+            entry[2] += max(rows, 0)
+
+    def record_rows(self, table: str, inserted: int = 0, updated: int = 0, unchanged: int = 0) -> None:
+        with self.lock:
+            entry = self.stage_stats().rows.setdefault(table, {'inserted': 0, 'updated': 0, 'unchanged': 0})
+            entry['inserted'] += inserted
+            entry['updated'] += updated
+            entry['unchanged'] += unchanged
+
+    def report(self) -> dict:
+        return {
+            'started_at': self.started_at,
+            'latency_buckets_ms': list(LATENCY_BUCKETS_MS),
+            'total_wall_s': round(sum(s.wall for s in self.stages), 4),
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None,
+            'stages': [s.report() for s in self.stages],
+        }
+
+    def write(self, path: str) -> None:
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def print_summary(self) -> None:
+        print(f"\n{'stage':24s} {'wall s':>8s} {'cpu s':>8s} {'http':>6s} {'http s':>8s} {'sql':>7s} {'sql s':>8s}")
+        for s in self.stages:
+            http_calls = sum(e['requests'] for e in s.http.values())
+            http_time = sum(e['seconds'] for e in s.http.values())
+            sql_calls = sum(calls for calls, _, _ in s.sql.values())
+            sql_time = sum(seconds for _, seconds, _ in s.sql.values())
+            print(f"{s.name:24s} {s.wall:8.2f} {s.cpu:8.2f} {http_calls:6d} {http_time:8.2f} {sql_calls:7d} {sql_time:8.2f}")
+            for table, counts in s.rows.items():
+                print(f"  {table}: {counts['inserted']} inserted, {counts['updated']} updated, "
+                      f"{counts['unchanged']} unchanged")
+
+
+_run: Run | None = None
+
+
+def start(trace_memory: bool = False) -> Run:
+    global _run
+    _run = Run(trace_memory)
+    return _run
+
+
+def stop() -> Run | None:
+    global _run
+    run, _run = _run, None
+    if run is not None and run.trace_memory:
+        tracemalloc.stop()
+    return run
+
+
+@contextmanager
+def stage(name: str):
+    if _run is None:
+        yield None
+        return
+    with _run.stage(name) as stats:
+        yield stats
+
+
+def record_http(url: str, seconds: float, status: int | str) -> None:
+    if _run is not None:
+        _run.record_http(url, seconds, status)
+
+
+def record_sql(sql: str, seconds: float, rows: int, calls: int = 1) -> None:
+    if _run is not None:
+        _run.record_sql(sql, seconds, rows, calls)
+
+
+def record_rows(table: str, inserted: int = 0, updated: int = 0, unchanged: int = 0) -> None:
+    if _run is not None:
+        _run.record_rows(table, inserted, updated, unchanged)
+
+
+class TimedCursor(sqlite3.Cursor):
+    # execute time plus the time spent fetching its results
+    def execute(self, sql, parameters=()):
+        self._sql = sql
+        t = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_sql(sql, time.perf_counter() - t, self.rowcount)
+
+    def executemany(self, sql, seq_of_parameters):
+        self._sql = sql
+        t = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_sql(sql, time.perf_counter() - t, self.rowcount)
+
+    def fetchall(self):
+        t = time.perf_counter()
+        rows = super().fetchall()
+        self.record_fetch(time.perf_counter() - t, len(rows))
+        return rows
+
+    def fetchone(self):
+        t = time.perf_counter()
+        row = super().fetchone()
+        self.record_fetch(time.perf_counter() - t, row is not None)
+        return row
+
+    def record_fetch(self, seconds: float, rows: int) -> None:
+        if getattr(self, '_sql', None):
+            record_sql(self._sql, seconds, rows, calls=0)
+
+
+class TimedConnection(sqlite3.Connection):
+    # pass as db.connect(path, factory=TimedConnection)
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+@contextmanager
+def profile(path: str | None, top: int = 25):
+    # cProfile the block, dump the stats to path and print the hottest functions
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        stats = pstats.Stats(profiler)
+        stats.sort_stats('cumulative').print_stats(top)
@@ -0,0 +1,425 @@
+import argparse
+import functools
+import itertools
+import math
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import db
+import engine
+
+# Lineup rules of the fantasy game; override per call or from the command line
+DEFAULT_RULES = {
+    'budget': 10_000_000,
+    'slots': {'Guard': 4, 'Forward': 4, 'Center': 2},
+    'max_per_team': 3,
+}
+PRICE_UNIT = 1000   # prices are charged in whole units (rounded up) for the budget DP
+SCENARIO_BATCH = 256    # scenarios bounded together in optimize_scenarios
+MULTIPLIERS = 32        # budget multipliers tried per scenario for the Lagrangian bound
+MAX_SWAPS = 20          # improving swaps per scenario incumbent
+MAX_SUBSETS = 20_000    # k-subsets per position enumerated directly; more go to the bucket DP
+TIGHTEN_SUBSETS = 1000  # a scenario core wider than this is first solved on a tighter one
+MAX_TIGHTEN = 2         # tighter cores tried per scenario
+
+
+def prune_dominated(values: np.ndarray, costs: np.ndarray, idx: np.ndarray, k: int) -> np.ndarray:
+    # without team limits a player with k others at least as good and no more expensive is never needed
+    v, c = values[idx], costs[idx]
+    order = np.arange(len(idx))
+    dominates = (c[:, None] <= c[None, :]) & (v[:, None] >= v[None, :]) & (
+        (c[:, None] < c[None, :]) | (v[:, None] > v[None, :]) | (order[:, None] < order[None, :])
+    )
+    return idx[dominates.sum(axis=0) < k]
+
+
+def position_table(values: np.ndarray, costs: np.ndarray, idx: np.ndarray, k: int, budget: int):
+    # best[b] = max value of exactly k players from idx costing <= b, plus choice flags to rebuild it
+    dp = np.full((k + 1, budget + 1), -np.inf)
+    dp[0] = 0.0
+    take = np.zeros((len(idx), k + 1, budget + 1), dtype=bool)
+    for i, p in enumerate(idx):
+        c, v = costs[p], values[p]
+        if c > budget:
+            continue
+        for j in range(min(k, i + 1), 0, -1):
+            cand = dp[j - 1, :budget + 1 - c] + v
+            row = dp[j, c:]
+            np.greater(cand, row, out=take[i, j, c:])
+            np.maximum(row, cand, out=row)
+    return dp[k], take
+
+
+def rebuild_position(idx: np.ndarray, costs: np.ndarray, take: np.ndarray, k: int, b: int) -> list[int]:
+    chosen = []
+    for i in range(len(idx) - 1, -1, -1):
+        if k and take[i, k, b]:
+            chosen.append(int(idx[i]))
+            k -= 1
+            b -= costs[idx[i]]
+    return chosen
+
+
+@functools.lru_cache(maxsize=64)
+def combinations(n: int, k: int) -> np.ndarray:
+    return np.array(list(itertools.combinations(range(n), k)), dtype=np.int64).reshape(-1, k)
+
+
+def frontier(cost: np.ndarray, value: np.ndarray, members: np.ndarray, budget: int):
+    # entries within budget that beat every cheaper one, by cost; equal costs may keep more
+    # than one, the last of them the best, which is all the searches on it need
+    fits = cost <= budget
+    cost, value, members = cost[fits], value[fits], members[fits]
+    order = np.argsort(cost)
+    cost, value, members = cost[order], value[order], members[order]
+    keep = value > np.r_[-np.inf, np.maximum.accumulate(value)[:-1]]
+    return cost[keep], value[keep], members[keep]
+
+
+def solve_enumerated(values, costs, tables, budget):
+    # tables are (idx, k) per position, small enough to enumerate every k-subset. The smaller
+    # frontiers are merged pairwise; the largest is only searched, at what the rest leave of the budget
+    fronts = []
+    for idx, k in tables:
+        members = idx[combinations(len(idx), k)]
+        fronts.append(frontier(costs[members].sum(axis=1), values[members].sum(axis=1), members, budget))
+        if len(fronts[-1][0]) == 0:
+            return -np.inf, []
+    fronts.sort(key=lambda f: len(f[0]))
+
+    m_cost, m_value, m_members = fronts[0]
+    for cost, value, members in fronts[1:-1]:
+        a, b = np.divmod(np.arange(len(m_cost) * len(cost)), len(cost))
+        m_cost, m_value, m_members = frontier(m_cost[a] + cost[b], m_value[a] + value[b],
+                                              np.hstack([m_members[a], members[b]]), budget)
+    if len(fronts) == 1:
+        return float(m_value[-1]), sorted(int(p) for p in m_members[-1])
+
+    # a frontier is increasing in value, so the most expensive entry that fits is the best one
+    cost, value, members = fronts[-1]
+    fit = np.searchsorted(cost, budget - m_cost, 'right') - 1
+    ok = np.flatnonzero(fit >= 0)
+    if len(ok) == 0:
+        return -np.inf, []
+    totals = m_value[ok] + value[fit[ok]]
+    pick = int(totals.argmax())
+    return float(totals[pick]), sorted(int(p) for p in (*m_members[ok[pick]], *members[fit[ok[pick]]]))
+
+
+def solve_relaxed(values, costs, pos_codes, slots, budget, allowed):
+    # exact optimum under budget and position slots, ignoring the per-team limit
+    pools = []
+    for code, k in enumerate(slots):
+        idx = np.flatnonzero(allowed & (pos_codes == code))
+        if len(idx) < k:
+            return -np.inf, []
+        pools.append((prune_dominated(values, costs, idx, k), k))
+    if all(math.comb(len(idx), k) <= MAX_SUBSETS for idx, k in pools):
+        return solve_enumerated(values, costs, pools, budget)
+
+    tables = []
+    for idx, k in pools:
+        best, take = position_table(values, costs, idx, k, budget)
+        tables.append((idx, best, take))
+
+    # merge positions one at a time; merged[b] = best value of positions so far costing <= b.
+    # The last merge only needs the full budget, so it is a single max over breakpoints.
+    merged = tables[0][1]
+    choices = []
+    for n, (idx, best, take) in enumerate(tables[1:], start=2):
+        prev = np.r_[-np.inf, best[:-1]]
+        steps = np.flatnonzero((best > prev) & np.isfinite(best))   # breakpoints of this position
+        if len(steps) == 0:
+            return -np.inf, []
+        if n == len(tables):
+            totals = best[steps] + merged[budget - steps]
+            pick = int(totals.argmax())
+            merged = np.full(budget + 1, -np.inf)
+            merged[budget] = totals[pick]
+            choices.append(np.full(budget + 1, steps[pick]))
+            break
+        cand = np.full((len(steps), budget + 1), -np.inf)
+        for r, c in enumerate(steps):
+            cand[r, c:] = best[c] + merged[:budget + 1 - c]
+        pick = cand.argmax(axis=0)
+        merged = cand[pick, np.arange(budget + 1)]
+        choices.append(steps[pick])
+
+    if not np.isfinite(merged[budget]):
+        return -np.inf, []
+
+    # walk the merges backwards to recover each position's spend, then its players
+    spend = []
+    b = budget
+    for step_cost in reversed(choices):
+        c = int(step_cost[b])
+        spend.append(c)
+        b -= c
+    spend.append(b)
+    spend.reverse()
+
+    lineup = []
+    for (idx, best, take), k, b in zip(tables, slots, spend):
+        lineup += rebuild_position(idx, costs, take, k, b)
+    return float(merged[budget]), sorted(lineup)
+
+
+def solve(values: np.ndarray, costs: np.ndarray, pos_codes: np.ndarray, teams: np.ndarray,
+          slots: list[int], budget: int, max_per_team: int | None, allowed: np.ndarray | None = None,
+          incumbent: np.ndarray | None = None) -> tuple[float, list[int]]:
+    # branch and bound on team-limit violations; each branch bans one player of the
+    # over-represented team, and every feasible lineup survives in at least one branch.
+    # A feasible incumbent lineup, if given, is returned unless something beats it.
+    best_value, best_lineup = -np.inf, []
+    if incumbent is not None:
+        best_value, best_lineup = float(values[incumbent].sum()), sorted(int(p) for p in incumbent)
+    stack = [np.ones(len(values), dtype=bool) if allowed is None else allowed.copy()]
+    while stack:
+        allowed = stack.pop()
+        value, lineup = solve_relaxed(values, costs, pos_codes, slots, budget, allowed)
+        if value <= best_value:
+            continue
+        if max_per_team is None:
+            return value, lineup
+        team_ids, counts = np.unique(teams[lineup], return_counts=True)
+        over = team_ids[counts > max_per_team]
+        if len(over) == 0:
+            best_value, best_lineup = value, lineup
+            continue
+        for p in lineup:
+            if teams[p] == over[0]:
+                child = allowed.copy()
+                child[p] = False
+                stack.append(child)
+    return best_value, best_lineup
+
+
+def load_pool(conn: sqlite3.Connection, dates: list[str], seasons: list[str] | None = None) -> dict:
+    # projected EFF summed over the given dates, for every priced player with a projection
+    hist = engine.History(conn, seasons)
+    pred = engine.predict(hist, dates, params=engine.load_params(conn))
+    ok = ~np.isnan(pred['pred_eff'])
+    player_idx = pred['player_idx'][ok]
+    projection = np.bincount(player_idx, weights=pred['pred_eff'][ok], minlength=len(hist.player_id))
+    has_games = np.bincount(player_idx, minlength=len(hist.player_id)) > 0
+
+    cur = conn.cursor()
+    cur.execute("SELECT player_id, fantasy_price FROM Players")
+    prices = dict(cur.fetchall())
+    price = np.array([prices[pid] for pid in hist.player_id], dtype=np.float64)
+    keep = has_games & (price > 0)
+
+    return {
+        'player_id': hist.player_id[keep],
+        'name': [n for n, k in zip(hist.player_name, keep) if k],
+        'position': [hist.positions[c] for c in hist.player_pos[keep]],
+        'team': hist.player_team[keep],
+        'price': price[keep],
+        'projection': projection[keep],
+        'team_names': hist.team_names,
+    }
+
+
+def problem(pool: dict, rules: dict | None = None) -> tuple:
+    # (position codes, costs in price units, budget in units, slot counts, team limit)
+    rules = {**DEFAULT_RULES, **(rules or {})}
+    positions = list(rules['slots'])
+    pos_codes = np.array([positions.index(p) if p in positions else -1 for p in pool['position']])
+    costs = np.ceil(pool['price'] / PRICE_UNIT).astype(np.int64)
+    budget = int(rules['budget'] // PRICE_UNIT)
+    return pos_codes, costs, budget, list(rules['slots'].values()), rules['max_per_team']
+
+
+def optimize(pool: dict, projections: np.ndarray | None = None, rules: dict | None = None) -> tuple[float, list[int]]:
+    pos_codes, costs, budget, slots, max_per_team = problem(pool, rules)
+    values = pool['projection'] if projections is None else projections
+    return solve(values, costs, pos_codes, pool['team'], slots, budget, max_per_team)
+
+
+def team_ok(teams: np.ndarray, lineups: np.ndarray, max_per_team: int | None) -> np.ndarray:
+    # lineups (..., n) of player indexes -> no team more than max_per_team times
+    if max_per_team is None or max_per_team >= lineups.shape[-1]:
+        return np.ones(lineups.shape[:-1], dtype=bool)
+    if max_per_team <= 0:
+        return np.zeros(lineups.shape[:-1], dtype=bool)
+    t = np.sort(teams[lineups], axis=-1)
+    return (t[..., max_per_team:] != t[..., :-max_per_team]).all(axis=-1)
+
+
+def lagrangian(values: np.ndarray, costs: np.ndarray, groups: list[np.ndarray], slots: list[int], budget: int):
+    # values (S, P). For a multiplier lam >= 0 on the budget, lam * budget plus every position's
+    # top k of values - lam * costs bounds each lineup from above (the team limit is dropped too).
+    # Returns the bounds (S, m), each position's k-th best reduced value (S, m, positions), the
+    # reduced values (S, m, P) and the top-k picks of each multiplier (S, m, players in a lineup).
+    ratio = np.clip((values / costs).max(axis=1), 0, None)
+    lam = ratio[:, None] * np.linspace(0, 1, MULTIPLIERS)
+    reduced = values[:, None, :] - lam[:, :, None] * costs
+    bound = lam * budget
+    kth = np.empty((*lam.shape, len(slots)))
+    picks = []
+    for q, (idx, k) in enumerate(zip(groups, slots)):
+        part = np.argpartition(-reduced[:, :, idx], k - 1, axis=2)[:, :, :k]
+        best = np.take_along_axis(reduced[:, :, idx], part, axis=2)
+        bound += best.sum(axis=2)
+        kth[:, :, q] = best.min(axis=2)
+        picks.append(idx[part])
+    return bound, kth, reduced, np.concatenate(picks, axis=2)
+
+
+def improve(values: np.ndarray, costs: np.ndarray, pos_codes: np.ndarray, teams: np.ndarray, lineups: np.ndarray,
+            budget: int, max_per_team: int | None) -> np.ndarray:
+    # best single same-position swap per scenario until none helps; feasible lineups (S, n) stay feasible
+    n_players = values.shape[1]
+    active = np.arange(len(lineups))
+    for _ in range(MAX_SWAPS):
+        if len(active) == 0:
+            break
+        current, v = lineups[active], values[active]
+        rows = np.arange(len(active))
+        inside = np.zeros(v.shape, dtype=bool)
+        inside[rows[:, None], current] = True
+        spare = budget - costs[current].sum(axis=1)
+        ok = (pos_codes[current][:, :, None] == pos_codes) & ~inside[:, None, :]
+        ok &= costs - costs[current][:, :, None] <= spare[:, None, None]
+        if max_per_team is not None:
+            count = np.zeros((len(active), teams.max() + 1), dtype=np.int64)
+            np.add.at(count, (rows[:, None], teams[current]), 1)
+            ok &= count[:, teams][:, None, :] + (teams != teams[current][:, :, None]) <= max_per_team
+        gain = np.where(ok, v[:, None, :] - v[rows[:, None], current][:, :, None], 0.0).reshape(len(active), -1)
+        flat = gain.argmax(axis=1)
+        better = gain[rows, flat] > 1e-9
+        if not better.any():
+            break
+        out, into = np.divmod(flat[better], n_players)
+        active = active[better]
+        lineups[active, out] = into
+    return lineups
+
+
+def scenario_bounds(values: np.ndarray, costs: np.ndarray, pos_codes: np.ndarray, teams: np.ndarray,
+                    slots: list[int], budget: int, max_per_team: int | None) -> dict[str, np.ndarray]:
+    # for a batch of scenarios (S, P): the Lagrangian bounds, and a feasible incumbent lineup
+    # per scenario from the best multiplier pick that fits, improved by swaps (has[s] False if none fit)
+    groups = [np.flatnonzero(pos_codes == q) for q in range(len(slots))]
+    bound, kth, reduced, picks = lagrangian(values, costs, groups, slots, budget)
+    rows = np.arange(len(values))
+    feasible = (costs[picks].sum(axis=2) <= budget) & team_ok(teams, picks, max_per_team)
+    worth = np.where(feasible, values[rows[:, None, None], picks].sum(axis=2), -np.inf)
+    has = feasible.any(axis=1)
+    incumbents = picks[rows, worth.argmax(axis=1)]
+    incumbents[has] = improve(values[has], costs, pos_codes, teams, incumbents[has], budget, max_per_team)
+    return {'bound': bound, 'kth': kth[:, :, np.maximum(pos_codes, 0)], 'reduced': reduced,
+            'incumbents': incumbents, 'has': has}
+
+
+def core(bounds: dict[str, np.ndarray], s: int, pos_codes: np.ndarray, threshold: float) -> np.ndarray:
+    # Players of scenario s that can be in a lineup worth at least threshold. Under every multiplier
+    # a lineup with player p is worth at most bound - (kth of p's position - p's reduced value).
+    slack = bounds['bound'][s] - threshold + 1e-9
+    return (bounds['reduced'][s] >= bounds['kth'][s] - slack[:, None]).all(axis=0) & (pos_codes >= 0)
+
+
+def subsets(allowed: np.ndarray, pos_codes: np.ndarray, slots: list[int]) -> int:
+    # k-subsets of the allowed players in the largest position
+    return max(math.comb(int((allowed & (pos_codes == q)).sum()), k) for q, k in enumerate(slots))
+
+
+def solve_scenario(values: np.ndarray, bounds: dict[str, np.ndarray], s: int, costs: np.ndarray,
+                   pos_codes: np.ndarray, teams: np.ndarray, slots: list[int], budget: int,
+                   max_per_team: int | None) -> tuple[float, list[int]]:
+    # exact solve of scenario s of a scenario_bounds batch
+    if not bounds['has'][s]:
+        return solve(values, costs, pos_codes, teams, slots, budget, max_per_team)
+    incumbent = bounds['incumbents'][s]
+    floor, upper = float(values[incumbent].sum()), float(bounds['bound'][s].min())
+    # While the players that can beat the incumbent are too many, bisect between it and the
+    # bound: a lineup reaching the midpoint is optimal, as any better one would be made of
+    # the players that can reach it too; otherwise the optimum lies below the midpoint.
+    for _ in range(MAX_TIGHTEN):
+        if subsets(core(bounds, s, pos_codes, floor), pos_codes, slots) <= TIGHTEN_SUBSETS:
+            break
+        target = (floor + upper) / 2
+        value, lineup = solve(values, costs, pos_codes, teams, slots, budget, max_per_team,
+                              core(bounds, s, pos_codes, target), incumbent)
+        if value >= target:
+            return value, lineup
+        incumbent, floor, upper = np.array(lineup), value, target
+    return solve(values, costs, pos_codes, teams, slots, budget, max_per_team,
+                 core(bounds, s, pos_codes, floor), incumbent)
+
+
+def scenario_shard(args: tuple) -> tuple[np.ndarray, np.ndarray]:
+    # (lineup value per scenario, times each player was picked) for rows of scenario values
+    values, costs, pos_codes, teams, slots, budget, max_per_team = args
+    picks = np.zeros(values.shape[1])
+    totals = np.full(len(values), -np.inf)
+    for start in range(0, len(values), SCENARIO_BATCH):
+        batch = values[start:start + SCENARIO_BATCH]
+        bounds = scenario_bounds(batch, costs, pos_codes, teams, slots, budget, max_per_team)
+        for s, v in enumerate(batch):
+            totals[start + s], lineup = solve_scenario(v, bounds, s, costs, pos_codes, teams, slots, budget,
+                                                       max_per_team)
+            picks[lineup] += 1
+    return totals, picks
+
+
+def optimize_scenarios(pool: dict, n_scenarios: int, noise: float = 0.25, rules: dict | None = None,
+                       seed: int | None = None, workers: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    # re-solve under multiplicative noise on the projections; returns per-player pick rate and lineup values.
+    # Scenarios are bounded a batch at a time, so each exact solve only sees the players that
+    # can beat a good incumbent, usually few enough per position to enumerate outright.
+    pos_codes, costs, budget, slots, max_per_team = problem(pool, rules)
+    rng = np.random.default_rng(seed)
+    base = pool['projection']
+    values = base * (1 + noise * rng.standard_normal((n_scenarios, len(base))))
+    if any((pos_codes == q).sum() < k for q, k in enumerate(slots)):
+        return np.zeros(len(base)), np.full(n_scenarios, -np.inf)
+
+    shards = max(1, min(workers, -(-n_scenarios // SCENARIO_BATCH)))
+    jobs = [(part, costs, pos_codes, pool['team'], slots, budget, max_per_team)
+            for part in np.array_split(values, shards)]
+    if shards == 1:
+        parts = [scenario_shard(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=shards) as executor:
+            parts = list(executor.map(scenario_shard, jobs))
+    return sum(p[1] for p in parts) / n_scenarios, np.concatenate([p[0] for p in parts])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Best fantasy lineup under budget, position and team limits")
+    parser.add_argument("dates", nargs="+", help="game dates making up the round")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--budget", type=float, default=DEFAULT_RULES['budget'])
+    parser.add_argument("--max-per-team", type=int, default=DEFAULT_RULES['max_per_team'])
+    parser.add_argument("--scenarios", type=int, default=0, help="also solve N perturbed-projection scenarios")
+    parser.add_argument("--noise", type=float, default=0.25, help="relative projection noise for scenarios")
+    parser.add_argument("--workers", type=int, default=4, help="processes solving scenarios")
+    parser.add_argument("--seasons", nargs="+", default=[db.CURRENT_SEASON],
+                        help="seasons to load as history (default: %(default)s)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    pool = load_pool(conn, args.dates, args.seasons)
+    conn.close()
+    rules = {'budget': args.budget, 'max_per_team': args.max_per_team}
+
+    value, lineup = optimize(pool, rules=rules)
+    if not lineup:
+        raise SystemExit("No lineup fits the budget and slots")
+    print(f"Projected EFF {value:.2f}, cost {pool['price'][lineup].sum():,.0f}")
+    for p in sorted(lineup, key=lambda p: (pool['position'][p], -pool['projection'][p])):
+        print(f"  {pool['position'][p]:8s} {pool['name'][p]:25s} {pool['team_names'][int(pool['team'][p])]:35s} "
+              f"{pool['price'][p]:>10,.0f}  {pool['projection'][p]:6.2f}")
+
+    if args.scenarios:
+        t = time.perf_counter()
+        rate, totals = optimize_scenarios(pool, args.scenarios, args.noise, rules, workers=args.workers)
+        elapsed = time.perf_counter() - t
+        print(f"\n{args.scenarios} scenarios in {elapsed:.2f}s ({args.scenarios / elapsed:.0f}/s), "
+              f"lineup EFF p10={np.percentile(totals, 10):.1f} p50={np.median(totals):.1f} p90={np.percentile(totals, 90):.1f}")
+        for p in np.argsort(-rate)[:15]:
+            print(f"  {rate[p]:6.1%}  {pool['name'][p]:25s} {pool['position'][p]}")
@@ -0,0 +1,158 @@
+import re
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from unidecode import unidecode
+
+NON_LETTERS = re.compile(r"[^A-Z\s]")
+WHITESPACE = re.compile(r"\s+")
+
+LAST_WEIGHT = 0.7
+FULL_WEIGHT = 0.3
+
+
+def normalize_name(name: str) -> str:
+    if not name:
+        return ""
+    name = unidecode(name)        # removes accents (Ąžuolas -> Azuolas)
+    name = name.upper()
+    name = NON_LETTERS.sub("", name)   # keep only letters + spaces
+    name = WHITESPACE.sub(" ", name).strip()
+    return name
+
+
+def extract_last(name: str) -> str:
+    parts = normalize_name(name).split()
+    return parts[-1] if parts else ""
+
+
+def assign(scores: np.ndarray) -> list[tuple[int, int]]:
+    # Hungarian algorithm (maximising); every row gets a column while columns last
+    n_rows, n_cols = scores.shape
+    if n_rows == 0 or n_cols == 0:
+        return []
+    if n_rows > n_cols:
+        return [(row, col) for col, row in assign(scores.T)]
+
+    cost = -scores.astype(np.float64)
+    u = np.zeros(n_rows + 1)
+    v = np.zeros(n_cols + 1)
+    owner = np.zeros(n_cols + 1, dtype=np.int64)   # owner[col] = row (1-based), 0 = free
+    way = np.zeros(n_cols + 1, dtype=np.int64)
+
+    for row in range(1, n_rows + 1):
+        owner[0] = row
+        col0 = 0
+        min_v = np.full(n_cols + 1, np.inf)
+        used = np.zeros(n_cols + 1, dtype=bool)
+        while True:
+            used[col0] = True
+            row0 = owner[col0]
+            cur = cost[row0 - 1] - u[row0] - v[1:]
+            free = ~used[1:]
+            better = free & (cur < min_v[1:])
+            min_v[1:][better] = cur[better]
+            way[1:][better] = col0
+            candidates = np.where(free, min_v[1:], np.inf)
+            col1 = int(np.argmin(candidates)) + 1
+            delta = candidates[col1 - 1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            min_v[1:][free] -= delta
+            col0 = col1
+            if owner[col0] == 0:
+                break
+        while col0:
+            col1 = way[col0]
+            owner[col0] = owner[col1]
+            col0 = col1
+
+    return [(int(owner[col]) - 1, col - 1) for col in range(1, n_cols + 1) if owner[col]]
+
+
+class RosterMatcher:
+    def __init__(self, players_by_team: dict[str, list[dict]]):
+        self.players_by_team = players_by_team
+        # a normalized name shared by two players of one team can't tell them apart:
+        # neither gets matched automatically, they are left to identity.py link
+        seen = set()
+        self.ambiguous = set()
+        for team_abbr, candidates in players_by_team.items():
+            for cand in candidates:
+                key = (team_abbr, cand["norm_name"])
+                (self.ambiguous if key in seen else seen).add(key)
+        self.exact = {
+            (team_abbr, cand["norm_name"]): idx
+            for team_abbr, candidates in players_by_team.items()
+            for idx, cand in enumerate(candidates)
+            if (team_abbr, cand["norm_name"]) not in self.ambiguous
+        }
+
+    def match_all(self, records: list[tuple[str, str]], threshold: float = 65.5, debug: bool = True,
+                  quiet: set[int] = frozenset()) -> list[tuple[dict | None, float]]:
+        # records are (full name, team abbreviation); results come back in the same order.
+        # indexes in quiet never print the low-score candidate listing
+        results: list[tuple[dict | None, float]] = [(None, -1)] * len(records)
+
+        by_team: dict[str, list[int]] = {}
+        for i, (_, team_abbr) in enumerate(records):
+            by_team.setdefault(team_abbr, []).append(i)
+
+        for team_abbr, idxs in by_team.items():
+            candidates = self.players_by_team.get(team_abbr, [])
+            if not candidates:
+                continue
+
+            taken = set()
+            fuzzy = []
+            for i in idxs:
+                hit = self.exact.get((team_abbr, normalize_name(records[i][0])))
+                if hit is not None and hit not in taken:
+                    taken.add(hit)
+                    results[i] = (candidates[hit], 100.0)
+                else:
+                    fuzzy.append(i)
+            if not fuzzy:
+                continue
+
+            free = [c for c in range(len(candidates))
+                    if c not in taken and (team_abbr, candidates[c]["norm_name"]) not in self.ambiguous]
+            shared = sorted({cand["name"] for cand in candidates if (team_abbr, cand["norm_name"]) in self.ambiguous})
+            if debug and shared:
+                print(f"\n⚠️  {team_abbr}: several roster players named {', '.join(shared)}; link them with identity.py")
+            if not free:
+                for i in fuzzy:
+                    results[i] = (None, -1)
+                continue
+            full_norm = [normalize_name(records[i][0]) for i in fuzzy]
+            last_norm = [name.split()[-1] if name else "" for name in full_norm]
+            last_scores = process.cdist(last_norm, [candidates[c]["last_norm"] for c in free], scorer=fuzz.ratio)
+            full_scores = process.cdist(full_norm, [candidates[c]["norm_name"] for c in free], scorer=fuzz.token_sort_ratio)
+            scores = LAST_WEIGHT * last_scores + FULL_WEIGHT * full_scores
+
+            # one-to-one: two fantasy records can never claim the same roster player. Pairs
+            # under the threshold count for nothing, so a record with no real counterpart
+            # can't pull a confident pair apart to raise the total
+            assigned = dict(assign(np.where(scores >= threshold, scores, 0.0)))
+            for row, i in enumerate(fuzzy):
+                col = assigned.get(row)
+                if col is not None and scores[row, col] >= threshold:
+                    results[i] = (candidates[free[col]], float(scores[row, col]))
+                else:
+                    score = float(scores[row].max())
+                    results[i] = (None, score)
+                    if debug and i not in quiet:
+                        self.print_candidates(records[i][0], team_abbr, score, [candidates[c] for c in free],
+                                              scores[row], last_scores[row], full_scores[row])
+
+        return results
+
+    @staticmethod
+    def print_candidates(full_name_raw, team_abbr, best_score, candidates, combined, score_last, score_full):
+        print("\n⚠️  LOW SCORE MATCH ATTEMPT")
+        print(f"Fantasy name: {full_name_raw}")
+        print(f"Team: {team_abbr}")
+        print(f"Best score: {best_score:.1f}")
+        print("\nCandidates:")
+        for c in np.argsort(-combined, kind="stable"):
+            print(f"  - {candidates[c]['name']:25s} | combined={combined[c]:.1f} | last={score_last[c]:.1f} | full={score_full[c]:.1f}")
@@ -0,0 +1,325 @@
+import sqlite3
+import sys
+
+import db
+
+
+def round_sync(cur: sqlite3.Cursor):
+    # Tracks which schedule rounds are fully played so update_games can skip them
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS RoundSync (
+        round_number INTEGER PRIMARY KEY,
+        completed    INTEGER NOT NULL,
+        games        INTEGER NOT NULL,
+        synced_at    TEXT NOT NULL
+    );
+    """)
+
+
+def analytic_indexes(cur: sqlite3.Cursor):
+    # eval-date joins and "history before date" range scans
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_games_date ON Games (game_date, home_team, away_team)")
+    # boxscore ingest resolves games by team pair
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_games_teams ON Games (home_team, away_team, game_date)")
+
+
+def boxscore_without_rowid(cur: sqlite3.Cursor):
+    # Boxscore is always reached through (game_id, player_id), so cluster the rows on it
+    cur.execute("""
+    CREATE TABLE Boxscore_new (
+        game_id        INTEGER NOT NULL,
+        player_id      INTEGER NOT NULL,
+        minutes_played REAL NOT NULL,
+        pts            INTEGER NOT NULL,
+        twofg_made     INTEGER NOT NULL,
+        twofg_taken    INTEGER NOT NULL,
+        threefg_made   INTEGER NOT NULL,
+        threefg_taken  INTEGER NOT NULL,
+        ft_made        INTEGER NOT NULL,
+        ft_taken       INTEGER NOT NULL,
+        oreb           INTEGER NOT NULL,
+        dreb           INTEGER NOT NULL,
+        ast            INTEGER NOT NULL,
+        stl            INTEGER NOT NULL,
+        fv_blk         INTEGER NOT NULL,
+        ag_blk         INTEGER NOT NULL,
+        fouls_cm       INTEGER NOT NULL,
+        fouls_rv       INTEGER NOT NULL,
+        eff            INTEGER NOT NULL,
+        PRIMARY KEY (game_id, player_id),
+        FOREIGN KEY (game_id) REFERENCES Games(game_id),
+        FOREIGN KEY (player_id) REFERENCES Players(player_id)
+    ) STRICT, WITHOUT ROWID;
+    """)
+    cur.execute("INSERT INTO Boxscore_new SELECT * FROM Boxscore")
+    cur.execute("DROP TABLE Boxscore")
+    cur.execute("ALTER TABLE Boxscore_new RENAME TO Boxscore")
+    # per-player history scans (recent form, home/away splits)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_boxscore_player ON Boxscore (player_id, game_id)")
+
+
+def analyze(cur: sqlite3.Cursor):
+    cur.execute("ANALYZE")
+
+
+def player_identity(cur: sqlite3.Cursor):
+    # Crosswalk from other sources' player ids to Players; player_id NULL records a failed match
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS PlayerIdentity (
+        source       TEXT NOT NULL,
+        external_id  TEXT NOT NULL,
+        player_id    INTEGER,
+        match_score  REAL,
+        is_override  INTEGER NOT NULL DEFAULT 0,
+        updated_at   TEXT NOT NULL,
+        PRIMARY KEY (source, external_id),
+        FOREIGN KEY (player_id) REFERENCES Players(player_id)
+    ) WITHOUT ROWID;
+    """)
+
+
+def feature_tables(cur: sqlite3.Cursor):
+    # Materialized features, kept current by update_players through features.refresh
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS PlayerForm (
+        player_id                INTEGER PRIMARY KEY,
+        games_played             INTEGER NOT NULL,
+        last_game_date           TEXT NOT NULL,
+        form_games               INTEGER NOT NULL,   -- weighted last-10 window (predicted_eff.sql)
+        form_avg_min             REAL,
+        form_eff_per_min         REAL,
+        form_fta_per_min         REAL,
+        form_ft_pct              REAL,
+        form_fouls_rv_per_min    REAL,
+        form_fouls_cm_per_min    REAL,
+        form_reb_per_min         REAL,
+        form_ast_per_min         REAL,
+        form_stl_per_min         REAL,
+        form_blk_per_min         REAL,
+        recent8_games            INTEGER NOT NULL,   -- plain last-8 window (undervalued.sql)
+        recent8_avg_min          REAL,
+        recent8_eff_per_min      REAL,
+        recent8_fouls_rv_per_min REAL,
+        recent8_fouls_cm_per_min REAL,
+        home_eff_per_min         REAL,
+        away_eff_per_min         REAL,
+        FOREIGN KEY (player_id) REFERENCES Players(player_id)
+    );
+    """)
+    # sums rather than averages so league-wide position averages can be rolled up from them
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS PositionAllowed (
+        def_team_id          INTEGER NOT NULL,
+        position             TEXT NOT NULL,
+        games                INTEGER NOT NULL,
+        rated_games          INTEGER NOT NULL,   -- games with minutes > 0
+        eff_per_min_sum      REAL NOT NULL,
+        fta_per_min_sum      REAL NOT NULL,
+        fouls_rv_per_min_sum REAL NOT NULL,
+        fouls_cm_per_min_sum REAL NOT NULL,
+        PRIMARY KEY (def_team_id, position),
+        FOREIGN KEY (def_team_id) REFERENCES Teams(team_id)
+    ) WITHOUT ROWID;
+    """)
+    # migrations only shape the schema; update_data fills these on its first run (features.fill)
+
+
+def backtest_results(cur: sqlite3.Cursor):
+    # Per-date walk-forward metrics; sums so totals can be rolled up across dates
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS BacktestResults (
+        eval_date     TEXT NOT NULL,
+        model_version TEXT NOT NULL,
+        history_rows  INTEGER NOT NULL,   -- Boxscore rows up to eval_date when computed
+        players       INTEGER NOT NULL,
+        games         INTEGER NOT NULL,
+        abs_err_sum   REAL NOT NULL,
+        err_sum       REAL NOT NULL,
+        rank_corr_sum REAL NOT NULL,
+        computed_at   TEXT NOT NULL,
+        PRIMARY KEY (eval_date, model_version)
+    ) WITHOUT ROWID;
+    """)
+
+
+def game_codes(cur: sqlite3.Cursor):
+    # the feed's game number within the season; box scores are fetched per game by it
+    cur.execute("ALTER TABLE Games ADD COLUMN game_code INTEGER")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_games_code ON Games (game_code)")
+
+
+def season_keys(cur: sqlite3.Cursor):
+    # Every game belongs to a season (competition code + start year). The season leads
+    # every Games index, so a query for one season never reads another season's rows;
+    # Boxscore and the features are reached through Games. Existing rows are E2025.
+    cur.execute("ALTER TABLE Games ADD COLUMN season_code TEXT NOT NULL DEFAULT 'E2025'")
+    cur.execute("DROP INDEX IF EXISTS idx_games_date")
+    cur.execute("DROP INDEX IF EXISTS idx_games_teams")
+    cur.execute("DROP INDEX IF EXISTS idx_games_code")
+    cur.execute("CREATE INDEX idx_games_date ON Games (season_code, game_date, home_team, away_team)")
+    cur.execute("CREATE INDEX idx_games_teams ON Games (season_code, home_team, away_team, game_date)")
+    cur.execute("CREATE UNIQUE INDEX idx_games_code ON Games (season_code, game_code)")
+
+    # round numbers restart every season
+    cur.execute("""
+    CREATE TABLE RoundSync_new (
+        season_code  TEXT NOT NULL,
+        round_number INTEGER NOT NULL,
+        completed    INTEGER NOT NULL,
+        games        INTEGER NOT NULL,
+        synced_at    TEXT NOT NULL,
+        PRIMARY KEY (season_code, round_number)
+    ) WITHOUT ROWID;
+    """)
+    cur.execute("INSERT INTO RoundSync_new SELECT 'E2025', round_number, completed, games, synced_at FROM RoundSync")
+    cur.execute("DROP TABLE RoundSync")
+    cur.execute("ALTER TABLE RoundSync_new RENAME TO RoundSync")
+
+
+def price_history(cur: sqlite3.Cursor):
+    # Append-only fantasy prices: a row whenever a player's price changes, so the price
+    # in effect on any past date can be looked up (prices.py). Players keeps the latest.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS PriceHistory (
+        player_id            INTEGER NOT NULL,
+        valid_from           TEXT NOT NULL,   -- UTC 'YYYY-MM-DD HH:MM:SS' the price was first seen
+        fantasy_price        REAL NOT NULL,
+        fantasy_price_change REAL NOT NULL,
+        PRIMARY KEY (player_id, valid_from),
+        FOREIGN KEY (player_id) REFERENCES Players(player_id)
+    ) WITHOUT ROWID;
+    """)
+    # each row's validity interval, for range joins from SQL
+    cur.execute("""
+    CREATE VIEW IF NOT EXISTS PriceIntervals AS
+    SELECT player_id,
+           valid_from,
+           LEAD(valid_from, 1, '9999-12-31') OVER (PARTITION BY player_id ORDER BY valid_from) AS valid_to,
+           fantasy_price,
+           fantasy_price_change
+    FROM PriceHistory
+    """)
+    # history starts with the prices we hold now
+    cur.execute("""
+    INSERT OR IGNORE INTO PriceHistory (player_id, valid_from, fantasy_price, fantasy_price_change)
+    SELECT player_id, datetime('now'), fantasy_price, fantasy_price_change
+    FROM Players
+    WHERE fantasy_price > 0
+    """)
+
+
+def model_params(cur: sqlite3.Cursor):
+    # Coefficients fitted by fit.py; engine.load_params overlays them on DEFAULT_PARAMS.
+    # ModelFits keeps one row per fit so a refit can be compared with the last.
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ModelParams (
+        param     TEXT PRIMARY KEY,
+        value     REAL NOT NULL,
+        fitted_at TEXT NOT NULL
+    ) WITHOUT ROWID;
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS ModelFits (
+        fitted_at      TEXT PRIMARY KEY,
+        seasons        TEXT NOT NULL,
+        rows           INTEGER NOT NULL,   -- scored (date, player) pairs
+        cv_mae         REAL NOT NULL,      -- time-series CV error of the fitted params
+        default_cv_mae REAL NOT NULL,      -- same folds with DEFAULT_PARAMS
+        params         TEXT NOT NULL       -- JSON
+    ) WITHOUT ROWID;
+    """)
+
+
+def game_rounds(cur: sqlite3.Cursor):
+    # The feed's round number, so "the next N rounds" can be read from Games (horizon.py).
+    # Rows from before this step get it from their game code: codes run round by round,
+    # so a game's round is where its code falls in the running total of RoundSync.games.
+    # Games without a code (every game stored before game_codes) keep NULL here;
+    # update_data.py adds its games stage while any are left, and that re-reads every round.
+    cur.execute("ALTER TABLE Games ADD COLUMN round_number INTEGER")
+    cur.execute("CREATE INDEX idx_games_round ON Games (season_code, round_number)")
+    cur.execute("""
+    UPDATE Games
+    SET round_number = (
+        SELECT MIN(r.round_number)
+        FROM (
+            SELECT season_code,
+                   round_number,
+                   SUM(games) OVER (PARTITION BY season_code ORDER BY round_number) AS last_code
+            FROM RoundSync
+        ) r
+        WHERE r.season_code = Games.season_code
+          AND Games.game_code <= r.last_code
+    )
+    WHERE game_code IS NOT NULL
+    """)
+
+
+def backtest_digests(cur: sqlite3.Cursor):
+    # BacktestResults were reused while history_rows matched, but an upserted stat line
+    # keeps the count; the digest of the history up to eval_date changes with it. Rows
+    # from before this step have none, so backtest.py recomputes them once.
+    cur.execute("ALTER TABLE BacktestResults ADD COLUMN history_digest TEXT")
+
+
+# Append new steps at the end; never reorder or edit a step that has shipped.
+MIGRATIONS = [
+    round_sync,
+    analytic_indexes,
+    boxscore_without_rowid,
+    analyze,
+    player_identity,
+    feature_tables,
+    backtest_results,
+    game_codes,
+    season_keys,
+    price_history,
+    model_params,
+    game_rounds,
+    backtest_digests,
+]
+
+
+def schema_version(cur: sqlite3.Cursor) -> int:
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS SchemaVersion (
+        version    INTEGER PRIMARY KEY,
+        name       TEXT NOT NULL,
+        applied_at TEXT NOT NULL
+    );
+    """)
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM SchemaVersion")
+    return cur.fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    cur = conn.cursor()
+    if conn.in_transaction:
+        conn.commit()
+    current = schema_version(cur)
+    conn.commit()
+
+    for version, step in enumerate(MIGRATIONS, start=1):
+        if version <= current:
+            continue
+        cur.execute("BEGIN")
+        try:
+            step(cur)
+            cur.execute(
+                "INSERT INTO SchemaVersion (version, name, applied_at) VALUES (?, ?, datetime('now'))",
+                (version, step.__name__),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Applied migration {version}: {step.__name__}")
+        current = version
+
+    return current
+
+
+if __name__ == "__main__":
+    conn = db.connect(sys.argv[1] if len(sys.argv) > 1 else db.DB_PATH)
+    print("Schema version:", migrate(conn))
+    conn.close()
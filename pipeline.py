@@ -0,0 +1,156 @@
+import contextvars
+import queue
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable
+
+import fetching
+
+# Streaming ingest: fetcher threads -> one parse thread -> the writer, joined by
+# bounded queues. The writer is the calling thread, so the stage's connection stays
+# the only one and is never shared; it commits every BATCH_ROWS rows or
+# BATCH_SECONDS, whichever comes first. A full queue blocks the stage in front of
+# it, so memory holds at most a few queues' worth of items whatever the input size,
+# and throughput is set by the slowest stage.
+
+QUEUE_SIZE = 32         # items waiting between two stages
+BATCH_ROWS = 2000       # rows per write transaction
+BATCH_SECONDS = 2.0     # longest a parsed row waits for its commit
+POLL = 0.1              # seconds between checks for a failed stage while blocked on a queue
+
+DONE = object()
+
+
+class Stopped(Exception):
+    pass
+
+
+def put(q: queue.Queue, item, stop: threading.Event) -> None:
+    while True:
+        if stop.is_set():
+            raise Stopped
+        try:
+            q.put(item, timeout=POLL)
+            return
+        except queue.Full:
+            pass
+
+
+def get(q: queue.Queue, stop: threading.Event):
+    while True:
+        if stop.is_set():
+            raise Stopped
+        try:
+            return q.get(timeout=POLL)
+        except queue.Empty:
+            pass
+
+
+def run(conn: sqlite3.Connection, items: Iterable, fetch: Callable, parse: Callable, write: Callable,
+        workers: int = fetching.MAX_WORKERS, batch_rows: int = BATCH_ROWS,
+        batch_seconds: float = BATCH_SECONDS) -> dict:
+    # fetch(item) -> response runs in the fetcher threads, parse(item, response) -> rows in
+    # the parse thread and write(cur, rows) here, one call per batch followed by a commit.
+    # The first exception in any stage stops the others and is re-raised here. The
+    # returned busy share is each stage's working time over the run's wall time times
+    # its thread count (workers for fetch), so the stage nearest 1.0 is the bottleneck;
+    # fetch time includes the rate limiter's waits, which are that stage's limit too.
+    todo: queue.Queue = queue.Queue(QUEUE_SIZE)
+    fetched: queue.Queue = queue.Queue(QUEUE_SIZE)
+    parsed: queue.Queue = queue.Queue(QUEUE_SIZE)
+    stop = threading.Event()
+    errors: list[BaseException] = []
+    busy = {'fetch': 0.0, 'parse': 0.0, 'write': 0.0}
+    lock = threading.Lock()
+
+    def guarded(fn):
+        def body():
+            try:
+                fn()
+            except Stopped:
+                pass
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+        return body
+
+    def feed():
+        for item in items:
+            put(todo, item, stop)
+        for _ in range(workers):
+            put(todo, DONE, stop)
+
+    def fetcher():
+        while (item := get(todo, stop)) is not DONE:
+            t = time.perf_counter()
+            resp = fetch(item)
+            with lock:
+                busy['fetch'] += time.perf_counter() - t
+            put(fetched, (item, resp), stop)
+        put(fetched, DONE, stop)
+
+    def parser():
+        remaining = workers
+        while remaining:
+            entry = get(fetched, stop)
+            if entry is DONE:
+                remaining -= 1
+                continue
+            t = time.perf_counter()
+            rows = parse(*entry)
+            busy['parse'] += time.perf_counter() - t
+            put(parsed, rows, stop)
+        put(parsed, DONE, stop)
+
+    # every thread runs in a copy of the caller's context, so requests count toward its stage
+    threads = [threading.Thread(target=contextvars.copy_context().run, args=(guarded(fn),), daemon=True)
+               for fn in (feed, parser, *[fetcher] * workers)]
+    for thread in threads:
+        thread.start()
+
+    cur = conn.cursor()
+    stats = {'items': 0, 'rows': 0, 'batches': 0}
+    batch: list[tuple] = []
+    started = run_started = time.perf_counter()
+
+    def flush():
+        t = time.perf_counter()
+        write(cur, batch)
+        conn.commit()
+        busy['write'] += time.perf_counter() - t
+        stats['rows'] += len(batch)
+        stats['batches'] += 1
+        batch.clear()
+
+    try:
+        while True:
+            try:
+                rows = parsed.get(timeout=POLL)
+            except queue.Empty:
+                rows = None
+                if stop.is_set():
+                    break
+            if rows is DONE:
+                break
+            if rows is not None:
+                batch.extend(rows)
+                stats['items'] += 1
+            if len(batch) >= batch_rows or (batch and time.perf_counter() - started >= batch_seconds):
+                flush()
+                started = time.perf_counter()
+        if not errors and batch:
+            flush()
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    wall = time.perf_counter() - run_started
+    threads = {'fetch': workers, 'parse': 1, 'write': 1}
+    share = {k: round(v / (wall * threads[k]), 2) if wall else 0.0 for k, v in busy.items()}
+    return {**stats, 'wall_s': round(wall, 3), 'busy': share}
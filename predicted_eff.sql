@@ -10,6 +10,11 @@ params(eval_date) AS (
     ('2025-12-05')
 ),
 
+/* seasons to read games and history from */
+seasons(season_code) AS (
+  VALUES ('E2025')
+),
+
 /* games we are evaluating (backtest + future prediction) */
 games_on_date AS (
   SELECT
@@ -20,7 +25,8 @@ games_on_date AS (
     g.away_team
   FROM params p
   JOIN Games  g
-    ON g.game_date = p.eval_date
+    ON g.season_code IN (SELECT season_code FROM seasons)
+   AND g.game_date = p.eval_date
 ),
 
 /* all players who will appear in those games (candidate pool) */
@@ -67,7 +73,8 @@ hist_all AS (
     b.fouls_cm, b.fouls_rv
   FROM params p
   JOIN Games g
-    ON g.game_date < p.eval_date          -- key: only data BEFORE eval_date
+    ON g.season_code IN (SELECT season_code FROM seasons)
+   AND g.game_date < p.eval_date          -- key: only data BEFORE eval_date
   JOIN Boxscore b
     ON b.game_id = g.game_id
   JOIN Players pl
@@ -336,7 +343,8 @@ actuals AS (
     b.eff AS actual_eff
   FROM params p
   JOIN Games g
-    ON g.game_date = p.eval_date
+    ON g.season_code IN (SELECT season_code FROM seasons)
+   AND g.game_date = p.eval_date
   JOIN Boxscore b
     ON b.game_id = g.game_id
 ),
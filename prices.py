@@ -0,0 +1,119 @@
+import sqlite3
+import sys
+
+import numpy as np
+
+import db
+
+# Fantasy prices as of a point in time, from the append-only PriceHistory table.
+# A bare date means the start of that day: the price a lineup for that date's
+# games was bought at, before any change recorded later the same day.
+
+TIME_SPAN = 1 << 33     # seconds; composite keys are player_id * TIME_SPAN + epoch seconds
+
+
+def record_prices(cur: sqlite3.Cursor, rows: list[tuple[float, float, int]]) -> None:
+    # rows are (price, change, player_id), already filtered to prices that changed. Rows
+    # are never rewritten: a second change within the same second keeps the first one
+    cur.executemany(
+        """
+        INSERT INTO PriceHistory (player_id, valid_from, fantasy_price, fantasy_price_change)
+        VALUES (?, datetime('now'), ?, ?)
+        ON CONFLICT(player_id, valid_from) DO NOTHING
+        """,
+        [(player_id, price, change) for price, change, player_id in rows],
+    )
+
+
+def price_on(cur: sqlite3.Cursor, player_id: int, when: str) -> float | None:
+    # one seek on the (player_id, valid_from) key
+    cur.execute("""
+        SELECT fantasy_price
+        FROM PriceHistory
+        WHERE player_id = ? AND valid_from <= ?
+        ORDER BY valid_from DESC
+        LIMIT 1
+    """, (player_id, when))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def to_seconds(values) -> np.ndarray:
+    # 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS' -> epoch seconds
+    return np.array([v.replace(' ', 'T') for v in values], dtype='datetime64[s]').astype(np.int64)
+
+
+class PriceBook:
+    # PriceHistory loaded once, sorted by (player_id, valid_from), so as-of lookups for
+    # any number of (player, time) pairs are one vectorized binary search
+    def __init__(self, conn: sqlite3.Connection):
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT player_id, valid_from, fantasy_price, fantasy_price_change
+            FROM PriceHistory
+            ORDER BY player_id, valid_from
+        """)
+        rows = cur.fetchall()
+        self.player_id = np.array([r[0] for r in rows], dtype=np.int64)
+        self.valid_from = to_seconds([r[1] for r in rows])
+        self.price = np.array([r[2] for r in rows], dtype=np.float64)
+        self.change = np.array([r[3] for r in rows], dtype=np.float64)
+        self.composite = self.player_id * TIME_SPAN + self.valid_from
+
+    def __len__(self) -> int:
+        return len(self.player_id)
+
+    def index_as_of(self, player_ids, when) -> np.ndarray:
+        # row in effect for each pair, -1 where the player had no price yet
+        player_ids = np.asarray(player_ids, dtype=np.int64)
+        if len(self) == 0:
+            return np.full(player_ids.shape, -1)
+        seconds = to_seconds([when] * len(player_ids) if isinstance(when, str) else when)
+        idx = np.searchsorted(self.composite, player_ids * TIME_SPAN + seconds, 'right') - 1
+        found = (idx >= 0) & (self.player_id[idx] == player_ids)
+        return np.where(found, idx, -1)
+
+    def as_of(self, player_ids, when) -> np.ndarray:
+        # price per pair, NaN where unknown; when is one time or one per player
+        idx = self.index_as_of(player_ids, when)
+        if len(self) == 0:
+            return np.full(idx.shape, np.nan)
+        return np.where(idx >= 0, self.price[idx], np.nan)
+
+
+def prices_as_of(cur: sqlite3.Cursor, pairs: list[tuple[int, str]]) -> dict[tuple[int, str], float]:
+    # bulk as-of join in SQL: every (player_id, time) pair against PriceIntervals in one pass
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS price_pairs (player_id INTEGER NOT NULL, at TEXT NOT NULL)")
+    cur.execute("DELETE FROM temp.price_pairs")
+    cur.executemany("INSERT INTO temp.price_pairs VALUES (?, ?)", pairs)
+    cur.execute("""
+        SELECT q.player_id, q.at, pi.fantasy_price
+        FROM temp.price_pairs q
+        JOIN PriceIntervals pi
+          ON pi.player_id = q.player_id
+         AND pi.valid_from <= q.at
+         AND q.at < pi.valid_to
+    """)
+    return {(player_id, at): price for player_id, at, price in cur.fetchall()}
+
+
+if __name__ == "__main__":
+    # python prices.py <player_code> [date]
+    conn = db.connect()
+    cur = conn.cursor()
+    match sys.argv[1:]:
+        case [player_code, *rest]:
+            cur.execute("SELECT player_id, player_name FROM Players WHERE player_code = ?", (player_code,))
+            row = cur.fetchone()
+            if row is None:
+                sys.exit(f"Player not found in Players table: {player_code}")
+            if rest:
+                print(f"{row[1]} on {rest[0]}: {price_on(cur, row[0], rest[0])}")
+            else:
+                cur.execute("SELECT valid_from, fantasy_price, fantasy_price_change FROM PriceHistory "
+                            "WHERE player_id = ? ORDER BY valid_from", (row[0],))
+                for valid_from, price, change in cur.fetchall():
+                    print(f"{valid_from}  {price:>12,.0f}  {change:+,.0f}")
+        case _:
+            sys.exit("usage: prices.py <player_code> [date]")
+    conn.close()
@@ -0,0 +1,246 @@
+import argparse
+import datetime as dt
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import db
+import similar
+
+# Local query service for the SQL reports. The .sql files stay as they are for
+# use in a SQLite client; here their hard-coded dates, seasons, minimum games and
+# LIMIT become bound parameters, so each report is one fixed statement that the
+# warm connection's statement cache keeps prepared. Results are cached per
+# parameters until PRAGMA data_version says another connection (ingest) committed.
+#
+#   python service.py --port 8766
+#   curl 'localhost:8766/predicted_eff?dates=2025-12-04,2025-12-05&min_games=3&limit=50'
+#   curl 'localhost:8766/undervalued?dates=2025-12-04,2025-12-05'
+#   curl 'localhost:8766/similar?player=011196&k=5&max_price=1500000'
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CACHE_SIZE = 256    # result sets kept per data version
+MIN_GAMES = 3       # the reports' own default
+
+VALUES_LIST = r"\(\s*VALUES\s*(?:\('[^']*'\)\s*,?\s*)+\)"
+REPORTS = {
+    'predicted_eff': {
+        'file': 'predicted_eff.sql',
+        'limit': 200,
+        'rewrites': [
+            (rf"params\(eval_date\) AS {VALUES_LIST}",
+             "params(eval_date) AS (SELECT value FROM json_each(:dates))"),
+            (rf"seasons\(season_code\) AS {VALUES_LIST}",
+             "seasons(season_code) AS (SELECT value FROM json_each(:seasons))"),
+            (r"WHERE pr\.games_used >= \d+", "WHERE pr.games_used >= :min_games"),
+            # every requested date is shown, not only the ones the file picks out
+            (r"WHERE eval_date IN \([^)]*\)[^\n]*", ""),
+            (r"LIMIT \d+;?\s*$", "LIMIT :limit"),
+        ],
+    },
+    'undervalued': {
+        'file': 'undervalued.sql',
+        'limit': 50,
+        'rewrites': [
+            # PlayerForm / PositionAllowed are kept for the current season only
+            (r"season_code = '[^']*'", "season_code = :season"),
+            (r"game_date IN \([^)]*\)", "game_date IN (SELECT value FROM json_each(:dates))"),
+            (r"pm\.games_used >= \d+", "pm.games_used >= :min_games"),
+            (r"LIMIT \d+;?\s*$", "LIMIT :limit"),
+        ],
+    },
+}
+
+
+def load_report(name: str) -> str:
+    spec = REPORTS[name]
+    with open(os.path.join(ROOT, spec['file'])) as f:
+        sql = f.read()
+    for pattern, replacement in spec['rewrites']:
+        sql, n = re.subn(pattern, lambda _: replacement, sql)
+        if n != 1:
+            raise ValueError(f"{spec['file']}: expected one match for {pattern!r}, found {n}")
+    return sql
+
+
+def parse_dates(dates: list[str]) -> list[str]:
+    if not dates:
+        raise ValueError("at least one date is required")
+    try:
+        return sorted({dt.date.fromisoformat(d).isoformat() for d in dates})
+    except ValueError:
+        raise ValueError(f"dates must be YYYY-MM-DD, got {', '.join(dates)}") from None
+
+
+class Service:
+    def __init__(self, path: str = db.DB_PATH, cache_size: int = CACHE_SIZE):
+        self.conn = db.connect(path)
+        self.sql = {name: load_report(name) for name in REPORTS}
+        self.cache: OrderedDict[tuple, dict] = OrderedDict()
+        self.cache_size = cache_size
+        self.version: int | None = None
+        self.hits = 0
+        self.misses = 0
+        self.index = similar.SimilarityIndex(self.conn)
+
+    def data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def query(self, report: str, dates: list[str], min_games: int = MIN_GAMES, limit: int | None = None,
+              seasons: list[str] | None = None) -> dict:
+        if report not in REPORTS:
+            raise KeyError(report)
+        params = {
+            'dates': parse_dates(dates),
+            'min_games': int(min_games),
+            'limit': int(REPORTS[report]['limit'] if limit is None else limit),
+        }
+        if report == 'predicted_eff':
+            params['seasons'] = sorted(set(seasons or [db.CURRENT_SEASON]))
+
+        version = self.data_version()
+        if version != self.version:
+            self.cache.clear()
+            self.version = version
+        key = (report, json.dumps(params, sort_keys=True))
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return {**self.cache[key], 'cached': True}
+
+        self.misses += 1
+        bound = {k: json.dumps(v) if isinstance(v, list) else v for k, v in params.items()}
+        if report == 'undervalued':
+            bound['season'] = db.CURRENT_SEASON
+        t = time.perf_counter()
+        cur = self.conn.execute(self.sql[report], bound)
+        result = {
+            'report': report,
+            'params': params,
+            'data_version': version,
+            'columns': [d[0] for d in cur.description],
+            'rows': cur.fetchall(),
+            'query_ms': round((time.perf_counter() - t) * 1000, 1),
+        }
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return {**result, 'cached': False}
+
+    def similar(self, player_code: str, k: int = 10, position: str | None = None,
+                max_price: float | None = None, min_minutes: float = similar.MIN_MINUTES) -> dict:
+        # position defaults to the player's own; 'any' lifts the filter
+        t = time.perf_counter()
+        refreshed = self.index.refresh()
+        player_id = self.index.by_code(player_code)
+        player = self.index.describe(self.index.index_of(player_id))
+        if position is None:
+            position = player['position']
+        elif position == 'any':
+            position = None
+        return {
+            'player': player,
+            'params': {'k': k, 'position': position, 'max_price': max_price, 'min_minutes': min_minutes},
+            'matches': self.index.nearest(player_id, k, position, max_price, min_minutes),
+            'refreshed_players': refreshed,
+            'query_ms': round((time.perf_counter() - t) * 1000, 2),
+        }
+
+    def status(self) -> dict:
+        return {
+            'data_version': self.data_version(),
+            'cached_results': len(self.cache),
+            'hits': self.hits,
+            'misses': self.misses,
+            'reports': sorted(REPORTS),
+            'similarity_profiles': len(self.index.player_id),
+        }
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def make_handler(service: Service) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def send_json(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            name = parts.path.strip('/')
+            if name == 'status':
+                return self.send_json(200, service.status())
+            if name == 'similar':
+                return self.similar(parse_qs(parts.query))
+            if name not in REPORTS:
+                return self.send_json(404, {'error': f"unknown report {name!r}", 'reports': sorted(REPORTS)})
+
+            # lists come as dates=a,b or dates=a&dates=b
+            query = {k: [x for v in vs for x in v.split(',') if x] for k, vs in parse_qs(parts.query).items()}
+            t = time.perf_counter()
+            try:
+                result = service.query(
+                    name,
+                    query.get('dates', []),
+                    min_games=int(query.get('min_games', [MIN_GAMES])[0]),
+                    limit=int(query['limit'][0]) if 'limit' in query else None,
+                    seasons=query.get('seasons'),
+                )
+            except ValueError as e:
+                return self.send_json(400, {'error': str(e)})
+            result['elapsed_ms'] = round((time.perf_counter() - t) * 1000, 2)
+            self.send_json(200, result)
+
+        def similar(self, query: dict[str, list[str]]) -> None:
+            if 'player' not in query:
+                return self.send_json(400, {'error': "player=<player_code> is required"})
+            try:
+                result = service.similar(
+                    query['player'][0],
+                    k=int(query.get('k', [10])[0]),
+                    position=query.get('position', [None])[0],
+                    max_price=float(query['max_price'][0]) if 'max_price' in query else None,
+                    min_minutes=float(query.get('min_minutes', [similar.MIN_MINUTES])[0]),
+                )
+            except KeyError:
+                return self.send_json(404, {'error': f"no profile for player {query['player'][0]!r}"})
+            except ValueError as e:
+                return self.send_json(400, {'error': str(e)})
+            self.send_json(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the SQL reports with parameters and result caching")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    service = Service(args.db)
+    # one thread: the warm connection and the cache are never shared between requests
+    server = HTTPServer((args.host, args.port), make_handler(service))
+    print(f"Serving {', '.join(sorted(REPORTS))} and similar from {args.db} on http://{args.host}:{args.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
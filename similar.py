@@ -0,0 +1,177 @@
+import argparse
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+import db
+
+# Nearest players by per-minute profile, for finding a comparable (cheaper) replacement.
+# Profiles are PlayerForm's weighted last-10 window, the same as predicted_eff.sql's
+# player_recent, which features.refresh keeps current on every ingest. Each column is
+# z-scored over the players with enough games, so no single stat dominates. With a few
+# hundred players an exact vectorized scan under the filter mask takes well under a
+# millisecond, so there is no tree to keep balanced.
+#
+#   python similar.py 011196                    # same position by default
+#   python similar.py 011196 --max-price 1500000 --position any -k 5
+
+PROFILE = (
+    'form_eff_per_min', 'form_reb_per_min', 'form_ast_per_min', 'form_stl_per_min',
+    'form_blk_per_min', 'form_fta_per_min', 'form_fouls_cm_per_min', 'form_fouls_rv_per_min',
+)
+MIN_GAMES = 3       # fewer games than this and the profile is noise; such players are never returned
+MIN_MINUTES = 10.0  # default floor on form_avg_min for candidates
+
+
+class SimilarityIndex:
+    # Profiles of every player in PlayerForm, with their listing from Players. refresh()
+    # re-reads both only after another connection committed (PRAGMA data_version), and
+    # re-derives the rows of players whose profile or listing changed.
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.version: int | None = None
+        self.rows: dict[int, tuple] = {}
+        self.resize([])
+        self.refresh(force=True)
+
+    def resize(self, player_ids: list[int]) -> None:
+        # empty arrays for player_ids, filled row by row in refresh
+        n = len(player_ids)
+        self.player_id = np.array(player_ids, dtype=np.int64)
+        self.raw = np.full((n, len(PROFILE)), np.nan)
+        self.games = np.zeros(n, dtype=np.int64)
+        self.minutes = np.zeros(n)
+        self.price = np.zeros(n)
+        self.code, self.name, self.team, self.position = ([None] * n for _ in range(4))
+        self.normalize()
+
+    def load(self) -> dict[int, tuple]:
+        cur = self.conn.execute(f"""
+            SELECT pf.player_id, pl.player_code, pl.player_name, t.team_name, pl.position,
+                   pl.fantasy_price, pf.form_games, pf.form_avg_min, {', '.join('pf.' + c for c in PROFILE)}
+            FROM PlayerForm pf
+            JOIN Players pl ON pl.player_id = pf.player_id
+            LEFT JOIN Teams t ON t.team_id = pl.team_id
+            ORDER BY pf.player_id
+        """)
+        return {row[0]: row for row in cur.fetchall()}
+
+    def refresh(self, force: bool = False) -> int:
+        # number of players whose row changed
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if not force and version == self.version:
+            return 0
+        self.version = version
+        rows = self.load()
+        changed = [pid for pid, row in rows.items() if self.rows.get(pid) != row]
+        changed += [pid for pid in self.rows if pid not in rows]
+        if not changed:
+            return 0
+
+        if list(rows) != self.player_id.tolist():
+            # players added or dropped: rebuild the arrays
+            self.resize(list(rows))
+            update = list(rows.values())
+        else:
+            update = [rows[pid] for pid in changed if pid in rows]
+
+        idx = np.searchsorted(self.player_id, [row[0] for row in update]).tolist()
+        for i, row in zip(idx, update):
+            _, self.code[i], self.name[i], self.team[i], self.position[i], price, games, minutes, *profile = row
+            self.price[i] = price or 0.0
+            self.games[i] = games
+            self.minutes[i] = minutes or 0.0
+            self.raw[i] = [np.nan if v is None else v for v in profile]
+        self.rows = rows
+        self.normalize()
+        return len(changed)
+
+    def normalize(self) -> None:
+        # z-scores against the players with enough games; missing stats sit at the mean
+        ref = self.raw[self.games >= MIN_GAMES]
+        self.mean = np.nanmean(ref, axis=0) if len(ref) else np.zeros(len(PROFILE))
+        std = np.nanstd(ref, axis=0) if len(ref) else np.ones(len(PROFILE))
+        self.std = np.where(std > 0, std, 1.0)
+        self.vectors = np.nan_to_num((self.raw - self.mean) / self.std)
+
+    def index_of(self, player_id: int) -> int:
+        i = int(np.searchsorted(self.player_id, player_id))
+        if i >= len(self.player_id) or self.player_id[i] != player_id:
+            raise KeyError(player_id)
+        return i
+
+    def by_code(self, player_code: str) -> int:
+        try:
+            return int(self.player_id[self.code.index(player_code)])
+        except ValueError:
+            raise KeyError(player_code) from None
+
+    def nearest(self, player_id: int, k: int = 10, position: str | None = None, max_price: float | None = None,
+                min_minutes: float = MIN_MINUTES) -> list[dict]:
+        # the k closest other players passing the filters, closest first
+        q = self.index_of(player_id)
+        mask = self.games >= MIN_GAMES
+        mask &= self.minutes >= min_minutes
+        mask[q] = False
+        if position is not None:
+            mask &= np.array([p == position for p in self.position])
+        if max_price is not None:
+            mask &= (self.price > 0) & (self.price <= max_price)
+
+        candidates = np.flatnonzero(mask)
+        dist = np.sqrt(((self.vectors[candidates] - self.vectors[q]) ** 2).sum(axis=1))
+        top = np.argsort(dist)[:k] if len(dist) <= k else np.argpartition(dist, k)[:k]
+        top = top[np.argsort(dist[top])]
+        return [self.describe(int(candidates[j]), float(dist[j])) for j in top]
+
+    def describe(self, i: int, distance: float | None = None) -> dict:
+        return {
+            'player_id': int(self.player_id[i]),
+            'player_code': self.code[i],
+            'player_name': self.name[i],
+            'team': self.team[i],
+            'position': self.position[i],
+            'fantasy_price': float(self.price[i]),
+            'games': int(self.games[i]),
+            'avg_min': round(float(self.minutes[i]), 1),
+            'distance': None if distance is None else round(distance, 3),
+            **{c.removeprefix('form_'): None if np.isnan(v) else round(float(v), 3) for c, v in zip(PROFILE, self.raw[i])},
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Players with the most similar per-minute profile")
+    parser.add_argument("player_code")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--position", help="candidates' position (default: the player's own; 'any' for all)")
+    parser.add_argument("--max-price", type=float)
+    parser.add_argument("--min-minutes", type=float, default=MIN_MINUTES)
+    args = parser.parse_args()
+
+    conn = db.connect(args.db)
+    t = time.perf_counter()
+    index = SimilarityIndex(conn)
+    built = time.perf_counter() - t
+    try:
+        player_id = index.by_code(args.player_code)
+    except KeyError:
+        sys.exit(f"Player not found in PlayerForm: {args.player_code}")
+    me = index.describe(index.index_of(player_id))
+    position = me['position'] if args.position is None else None if args.position == 'any' else args.position
+
+    t = time.perf_counter()
+    matches = index.nearest(player_id, args.k, position, args.max_price, args.min_minutes)
+    elapsed = time.perf_counter() - t
+    conn.close()
+
+    stats = [c.removeprefix('form_').removesuffix('_per_min') for c in PROFILE]
+    print(f"{len(index.player_id)} profiles indexed in {built * 1000:.1f}ms, query {elapsed * 1000:.2f}ms\n")
+    print(f"{'player':25s} {'position':9s} {'price':>10s} {'min':>5s} {'dist':>6s} " + ' '.join(f"{s:>8s}" for s in stats))
+    for row in [me, *matches]:
+        dist = '' if row['distance'] is None else f"{row['distance']:.2f}"
+        values = ' '.join(f"{row[c.removeprefix('form_')] or 0:8.3f}" for c in PROFILE)
+        print(f"{row['player_name'][:25]:25s} {row['position'][:9]:9s} {row['fantasy_price']:10,.0f} "
+              f"{row['avg_min']:5.1f} {dist:>6s} {values}")
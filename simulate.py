@@ -0,0 +1,255 @@
+import argparse
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import db
+import engine
+
+# Monte Carlo of fantasy EFF around engine.predict's point estimates. Per (player, game):
+#   plays   ~ Bernoulli(p_play)          share of the team's recent games the player appeared in
+#   minutes ~ Normal(base_proj_min * foul_min_factor, sd_min), clipped to [0, MAX_MINUTES]
+#   eff     ~ Normal(pred_eff_per_min * minutes, sd_eff * sqrt(minutes))
+# Spreads come from the player's last WINDOW games, shrunk towards the position's pool.
+# Players are drawn independently; a round is the sum over a player's games on the dates.
+# Shards return histograms and sums, so quantiles never need every draw in one place.
+
+WINDOW = 10             # recent games the spreads are fitted on
+SHRINK_GAMES = 5        # pseudo-games of the position pool mixed into each player's spread
+MAX_MINUTES = 40.0
+BATCH = 5000            # simulations drawn per numpy batch
+EFF_BINS = (-40.0, 120.0, 0.1)      # per-player histogram range and width
+TOTAL_BINS = (-100.0, 700.0, 0.25)  # lineup totals
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+
+def recent_window(hist: engine.History, player_ids: np.ndarray, days: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # rows into hist.recent_values of each player's last WINDOW games before day, and a validity mask
+    base = player_ids * engine.DATE_SPAN
+    lo = np.searchsorted(hist.recent_composite, base, 'left')
+    hi = np.searchsorted(hist.recent_composite, base + days, 'left')
+    back = np.arange(WINDOW)
+    valid = back[None, :] < np.minimum(hi - lo, WINDOW)[:, None]
+    return np.where(valid, hi[:, None] - 1 - back[None, :], 0), valid
+
+
+def appearance_rate(hist: engine.History, player_ids: np.ndarray, team_ids: np.ndarray,
+                    days: np.ndarray) -> np.ndarray:
+    # games with minutes among the team's last WINDOW games before day, with one pseudo-appearance
+    side_team = np.r_[hist.game_home, hist.game_away]
+    side_game = np.r_[np.arange(len(hist.game_id)), np.arange(len(hist.game_id))]
+    order = np.lexsort((hist.game_date[side_game], side_team))
+    composite = side_team[order] * engine.DATE_SPAN + hist.game_date[side_game[order]]
+    team_game = side_game[order]
+
+    lo = np.searchsorted(composite, team_ids * engine.DATE_SPAN, 'left')
+    hi = np.searchsorted(composite, team_ids * engine.DATE_SPAN + days, 'left')
+    back = np.arange(WINDOW)
+    valid = back[None, :] < np.minimum(hi - lo, WINDOW)[:, None]
+    games = hist.game_id[team_game[np.where(valid, hi[:, None] - 1 - back[None, :], 0)]]
+
+    played = hist.minutes > 0
+    keys = np.sort(hist.box_game[played] * engine.DATE_SPAN + hist.box_player[played])
+    query = games * engine.DATE_SPAN + player_ids[:, None]
+    pos = np.clip(np.searchsorted(keys, query), 0, max(len(keys) - 1, 0))
+    appeared = valid & (keys[pos] == query) if len(keys) else np.zeros(valid.shape, dtype=bool)
+    return (appeared.sum(axis=1) + 1) / (valid.sum(axis=1) + 1)
+
+
+def shrink(values: np.ndarray, n: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    # towards the position's median, SHRINK_GAMES pseudo-games strong
+    pool = np.zeros(positions.max() + 1 if len(positions) else 0)
+    for p in np.unique(positions):
+        at = (positions == p) & ~np.isnan(values)
+        pool[p] = np.median(values[at]) if at.any() else 0.0
+    prior = pool[positions]
+    return (np.nan_to_num(values) * n + prior * SHRINK_GAMES) / (n + SHRINK_GAMES)
+
+
+def fit(hist: engine.History, eval_dates: list[str], params: dict[str, float] | None = None) -> dict[str, np.ndarray]:
+    # one row per (player, game) on the dates, the same pool and projection as engine.predict
+    pred = engine.predict(hist, eval_dates, params=params)
+    ok = ~np.isnan(pred['pred_eff'])
+    pred = {k: v[ok] for k, v in pred.items()}
+    player_ids, days = pred['player_id'], pred['eval_day']
+
+    idx, valid = recent_window(hist, player_ids, days)
+    n = valid.sum(axis=1)
+    minutes = np.where(valid, hist.recent_values[idx, 0], np.nan)
+    eff_pm = np.where(valid, hist.recent_values[idx, 1], np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sd_min = np.nanstd(minutes, axis=1, ddof=1)
+        # EFF residual around the projected rate, per sqrt-minute so short stints are not over-penalised
+        resid = (eff_pm - pred['base_eff_per_min'][:, None]) * np.sqrt(minutes)
+        sd_eff = np.sqrt(np.nanmean(np.where(minutes > 0, resid, np.nan) ** 2, axis=1))
+
+    return {
+        'player_id': player_ids,
+        'player_idx': pred['player_idx'],
+        'game_id': pred['game_id'],
+        'eval_day': days,
+        'position': pred['position'],
+        'pred_eff': pred['pred_eff'],
+        'mean_min': pred['base_proj_min'] * pred['foul_min_factor'],
+        'sd_min': shrink(sd_min, n, pred['position']),
+        'eff_per_min': pred['pred_eff_per_min'],
+        'sd_eff': shrink(sd_eff, n, pred['position']),
+        'p_play': appearance_rate(hist, player_ids, pred['team_id'], days),
+    }
+
+
+def bin_index(values: np.ndarray, bins: tuple[float, float, float]) -> np.ndarray:
+    lo, hi, width = bins
+    n = int(round((hi - lo) / width))
+    return np.clip(((values - lo) / width).astype(np.int64), 0, n - 1)
+
+
+def n_bins(bins: tuple[float, float, float]) -> int:
+    lo, hi, width = bins
+    return int(round((hi - lo) / width))
+
+
+def simulate_shard(args: tuple) -> dict[str, np.ndarray]:
+    dist, owner, n_players, lineups, thresholds, n_sims, seed = args
+    rng = np.random.default_rng(seed)
+    k = n_bins(EFF_BINS)
+    out = {
+        'sum': np.zeros(n_players),
+        'hist': np.zeros(n_players * k, dtype=np.int64),
+        'over': np.zeros((len(thresholds), n_players), dtype=np.int64),
+        'lineup_sum': np.zeros(len(lineups)),
+        'lineup_hist': np.zeros((len(lineups), n_bins(TOTAL_BINS)), dtype=np.int64),
+        'lineup_top': [np.zeros(len(members), dtype=np.int64) for members in lineups],
+    }
+    rows = len(dist['mean_min'])
+    starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])   # rows are sorted by owner
+    done = 0
+    while done < n_sims:
+        b = min(BATCH, n_sims - done)
+        plays = rng.random((b, rows)) < dist['p_play']
+        minutes = np.clip(dist['mean_min'] + dist['sd_min'] * rng.standard_normal((b, rows)), 0.0, MAX_MINUTES)
+        minutes *= plays
+        eff = dist['eff_per_min'] * minutes + dist['sd_eff'] * np.sqrt(minutes) * rng.standard_normal((b, rows))
+        totals = np.add.reduceat(eff, starts, axis=1)                 # (b, players): sum over a player's games
+
+        out['sum'] += totals.sum(axis=0)
+        out['hist'] += np.bincount((bin_index(totals, EFF_BINS) + np.arange(n_players) * k).ravel(),
+                                   minlength=n_players * k)
+        for i, t in enumerate(thresholds):
+            out['over'][i] += (totals > t).sum(axis=0)
+        for j, members in enumerate(lineups):
+            picked = totals[:, members]
+            lineup_total = picked.sum(axis=1)
+            out['lineup_sum'][j] += lineup_total.sum()
+            out['lineup_hist'][j] += np.bincount(bin_index(lineup_total, TOTAL_BINS), minlength=n_bins(TOTAL_BINS))
+            out['lineup_top'][j] += np.bincount(picked.argmax(axis=1), minlength=len(members))
+        done += b
+    return out
+
+
+def hist_quantiles(counts: np.ndarray, bins: tuple[float, float, float], qs=QUANTILES) -> np.ndarray:
+    # (..., bins) counts -> (..., len(qs)) values at bin centres
+    lo, _, width = bins
+    cdf = np.cumsum(counts, axis=-1) / np.maximum(counts.sum(axis=-1, keepdims=True), 1)
+    idx = np.stack([(cdf < q).sum(axis=-1) for q in qs], axis=-1)
+    return lo + (idx + 0.5) * width
+
+
+def simulate(dist: dict[str, np.ndarray], n_sims: int, lineups: list[list[int]] | None = None,
+             thresholds: tuple[float, ...] = (), workers: int = 4, seed: int | None = None) -> dict:
+    # lineups are lists of player_ids; every draw of a player is shared by the lineups holding them
+    order = np.argsort(dist['player_id'], kind='stable')
+    dist = {k: v[order] for k, v in dist.items()}
+    players, owner = np.unique(dist['player_id'], return_inverse=True)
+    member_idx = [np.searchsorted(players, members).tolist() for members in lineups or []]
+    for members, idx in zip(lineups or [], member_idx):
+        missing = [p for p, i in zip(members, idx) if i >= len(players) or players[i] != p]
+        if missing:
+            raise ValueError(f"Lineup players without a projection on these dates: {missing}")
+
+    params = {k: dist[k] for k in ('mean_min', 'sd_min', 'eff_per_min', 'sd_eff', 'p_play')}
+    shards = max(1, min(workers, -(-n_sims // BATCH)))
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+    sizes = [n_sims // shards + (i < n_sims % shards) for i in range(shards)]
+    jobs = [(params, owner, len(players), member_idx, tuple(thresholds), size, s) for size, s in zip(sizes, seeds)]
+    if shards == 1:
+        parts = [simulate_shard(jobs[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=shards) as pool:
+            parts = list(pool.map(simulate_shard, jobs))
+
+    merged = {k: sum(p[k] for p in parts) for k in ('sum', 'hist', 'over', 'lineup_sum', 'lineup_hist')}
+    top = [sum(p['lineup_top'][j] for p in parts) for j in range(len(member_idx))]
+    player_hist = merged['hist'].reshape(len(players), n_bins(EFF_BINS))
+    return {
+        'n_sims': n_sims,
+        'player_id': players,
+        'player_idx': dist['player_idx'][np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])],
+        'games': np.bincount(owner, minlength=len(players)),
+        'pred_eff': np.bincount(owner, weights=dist['pred_eff'], minlength=len(players)),
+        'mean': merged['sum'] / n_sims,
+        'quantiles': hist_quantiles(player_hist, EFF_BINS),
+        'p_over': {t: merged['over'][i] / n_sims for i, t in enumerate(thresholds)},
+        'lineups': [
+            {
+                'player_id': list(members),
+                'mean': float(merged['lineup_sum'][j] / n_sims),
+                'quantiles': hist_quantiles(merged['lineup_hist'][j], TOTAL_BINS),
+                'p_top': top[j] / n_sims,     # share of simulations each member scores the lineup's most
+            }
+            for j, members in enumerate(lineups or [])
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate fantasy EFF distributions for a round")
+    parser.add_argument("dates", nargs="+", help="game dates making up the round")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--sims", type=int, default=100_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--threshold", type=float, nargs="*", default=[15.0, 25.0],
+                        help="report P(EFF > threshold) for each")
+    parser.add_argument("--lineup", action="store_true", help="also simulate the best lineup from lineup.py")
+    parser.add_argument("--top", type=int, default=25, help="players to print, by simulated mean")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    hist = engine.History(conn)
+    params = engine.load_params(conn)
+    lineups = []
+    if args.lineup:
+        import lineup
+        pool = lineup.load_pool(conn, args.dates)
+        _, picked = lineup.optimize(pool)
+        lineups.append(pool['player_id'][picked].tolist())
+    conn.close()
+
+    t = time.perf_counter()
+    dist = fit(hist, args.dates, params)
+    fitted = time.perf_counter() - t
+    t = time.perf_counter()
+    result = simulate(dist, args.sims, lineups, tuple(args.threshold), args.workers, args.seed)
+    elapsed = time.perf_counter() - t
+    print(f"{len(result['player_id'])} players, {args.sims:,} simulations: fit {fitted:.2f}s, "
+          f"simulate {elapsed:.2f}s ({args.sims / elapsed:,.0f}/s)")
+
+    over = ''.join(f" {'P>' + format(t, 'g'):>6s}" for t in args.threshold)
+    print(f"\n{'player':25s} {'pos':8s} {'pred':>6s} {'mean':>6s} {'p10':>6s} {'p50':>6s} {'p90':>6s}{over}")
+    for i in np.argsort(-result['mean'])[:args.top]:
+        p = result['player_idx'][i]
+        q = result['quantiles'][i]
+        probs = ''.join(f" {result['p_over'][t][i]:6.1%}" for t in args.threshold)
+        print(f"{hist.player_name[p]:25s} {hist.positions[hist.player_pos[p]]:8s} {result['pred_eff'][i]:6.1f} "
+              f"{result['mean'][i]:6.1f} {q[0]:6.1f} {q[2]:6.1f} {q[4]:6.1f}{probs}")
+
+    names = dict(zip(hist.player_id.tolist(), hist.player_name))
+    for res in result['lineups']:
+        q = res['quantiles']
+        print(f"\nLineup EFF mean {res['mean']:.1f}  p10 {q[0]:.1f}  p50 {q[2]:.1f}  p90 {q[4]:.1f}; "
+              f"captain by P(top scorer):")
+        for pid, share in sorted(zip(res['player_id'], res['p_top']), key=lambda x: -x[1]):
+            print(f"  {share:6.1%}  {names[pid]}")
@@ -0,0 +1,214 @@
+import argparse
+import datetime as dt
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+import numpy as np
+
+import db
+
+# Columnar snapshot of Teams/Players/Games/Boxscore for model work: one .npy file
+# per column, written once by export() and memory-mapped by Season, so opening is
+# a few header reads and worker processes share the page cache instead of copies.
+#
+#   python snapshot.py                      # snapshots/E2025
+#   python snapshot.py --seasons E2024 E2025
+
+FORMAT = 1
+SNAPSHOT_DIR = "snapshots"
+
+TEAM_COLUMNS = {'team_id': np.int64, 'team_name': str, 'abbreviation': str}
+PLAYER_COLUMNS = {
+    'player_id': np.int64, 'player_code': str, 'player_name': str, 'team_id': np.int64, 'position': str,
+    'fantasy_price': np.float64, 'fantasy_price_change': np.float64,
+}
+GAME_COLUMNS = {
+    'game_id': np.int64, 'season_code': str, 'game_code': np.int64, 'game_date': 'datetime64[D]',
+    'home_team': np.int64, 'away_team': np.int64, 'home_score': np.int64, 'away_score': np.int64,
+}
+BOX_COLUMNS = {
+    'game_id': np.int64, 'player_id': np.int64, 'minutes_played': np.float64, 'pts': np.int64,
+    'twofg_made': np.int64, 'twofg_taken': np.int64, 'threefg_made': np.int64, 'threefg_taken': np.int64,
+    'ft_made': np.int64, 'ft_taken': np.int64, 'oreb': np.int64, 'dreb': np.int64, 'ast': np.int64,
+    'stl': np.int64, 'fv_blk': np.int64, 'ag_blk': np.int64, 'fouls_cm': np.int64, 'fouls_rv': np.int64,
+    'eff': np.int64,
+}
+
+
+def default_path(seasons: list[str]) -> str:
+    return os.path.join(SNAPSHOT_DIR, '+'.join(sorted(seasons)))
+
+
+def columns(rows: list[tuple], spec: dict) -> dict[str, np.ndarray]:
+    values = list(zip(*rows)) if rows else [()] * len(spec)
+    return {name: np.array(col, dtype=dtype) for (name, dtype), col in zip(spec.items(), values)}
+
+
+def offsets(idx: np.ndarray, n: int) -> np.ndarray:
+    # CSR offsets: rows of key i are [start[i], start[i + 1]) once rows are sorted by idx
+    return np.r_[0, np.cumsum(np.bincount(idx, minlength=n))].astype(np.int64)
+
+
+def source_rows(cur: sqlite3.Cursor, seasons: list[str]) -> dict[str, list[tuple]]:
+    in_seasons = f"g.season_code IN ({','.join('?' * len(seasons))})"
+    cur.execute(f"SELECT {', '.join(TEAM_COLUMNS)} FROM Teams ORDER BY team_id")
+    teams = cur.fetchall()
+    cur.execute(f"SELECT {', '.join(PLAYER_COLUMNS)} FROM Players ORDER BY player_id")
+    players = cur.fetchall()
+    cur.execute(f"""
+        SELECT game_id, season_code, COALESCE(game_code, 0), game_date, home_team, away_team, home_score, away_score
+        FROM Games g
+        WHERE {in_seasons}
+        ORDER BY game_id
+    """, seasons)
+    games = cur.fetchall()
+    # box rows by player, then date: a player's history is one contiguous, date-ordered range
+    cur.execute(f"""
+        SELECT {', '.join('b.' + c for c in BOX_COLUMNS)}
+        FROM Boxscore b
+        JOIN Games g   ON g.game_id = b.game_id
+        JOIN Players p ON p.player_id = b.player_id
+        WHERE {in_seasons}
+        ORDER BY b.player_id, g.game_date, b.game_id
+    """, seasons)
+    return {'teams': teams, 'players': players, 'games': games, 'box': cur.fetchall()}
+
+
+def source_digest(rows: dict[str, list[tuple]]) -> dict[str, str | int]:
+    # what a snapshot was cut from: any changed value (an upserted stat line, a moved
+    # game, a player's new team), not just a changed row count, makes it out of date
+    digest = hashlib.sha1()
+    for table, table_rows in rows.items():
+        digest.update(f"{table}:{table_rows!r}".encode())
+    return {**{table: len(table_rows) for table, table_rows in rows.items()}, 'sha1': digest.hexdigest()}
+
+
+def export(conn: sqlite3.Connection, path: str | None = None, seasons: list[str] | None = None) -> str:
+    seasons = list(seasons or [db.CURRENT_SEASON])
+    path = path or default_path(seasons)
+    rows = source_rows(conn.cursor(), seasons)
+    teams = columns(rows['teams'], TEAM_COLUMNS)
+    players = columns(rows['players'], PLAYER_COLUMNS)
+    games = columns(rows['games'], GAME_COLUMNS)
+    box = columns(rows['box'], BOX_COLUMNS)
+    source = source_digest(rows)
+
+    box['player_idx'] = np.searchsorted(players['player_id'], box['player_id'])
+    box['game_idx'] = np.searchsorted(games['game_id'], box['game_id'])
+    players['box_start'] = offsets(box['player_idx'], len(players['player_id']))
+    games['box_rows'] = np.argsort(box['game_idx'], kind='stable')
+    games['box_start'] = offsets(box['game_idx'], len(games['game_id']))
+
+    # every game twice, once per side, grouped by team in date order
+    side_game = np.r_[np.arange(len(games['game_id'])), np.arange(len(games['game_id']))]
+    side_team = np.searchsorted(teams['team_id'], np.r_[games['home_team'], games['away_team']])
+    order = np.lexsort((games['game_date'][side_game], side_team))
+    teams['game_rows'] = side_game[order]
+    teams['game_start'] = offsets(side_team, len(teams['team_id']))
+
+    # write next to the target and swap it in, so readers never see half a snapshot
+    tmp = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for table, cols in (('teams', teams), ('players', players), ('games', games), ('box', box)):
+        for name, values in cols.items():
+            np.save(os.path.join(tmp, f'{table}.{name}.npy'), values)
+    meta = {
+        'format': FORMAT,
+        'seasons': seasons,
+        'created_at': dt.datetime.now().isoformat(timespec='seconds'),
+        'source': source,
+    }
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    old = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+    return path
+
+
+def index_of(keys: np.ndarray, ids) -> np.ndarray:
+    # positions of ids in the sorted keys, -1 where missing
+    ids = np.asarray(ids, dtype=np.int64)
+    idx = np.clip(np.searchsorted(keys, ids), 0, max(len(keys) - 1, 0))
+    found = keys[idx] == ids if len(keys) else np.zeros(ids.shape, dtype=bool)
+    return np.where(found, idx, -1)
+
+
+class Season:
+    # A snapshot opened read-only. teams/players/games/box map column name -> array;
+    # box rows are sorted by (player, date) and carry player_idx/game_idx into the
+    # other tables. Lookups go through the prebuilt CSR offsets.
+    def __init__(self, path: str, mmap: bool = True):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+        if self.meta['format'] != FORMAT:
+            raise ValueError(f"{path}: snapshot format {self.meta['format']}, expected {FORMAT}; export it again")
+        self.seasons: list[str] = self.meta['seasons']
+
+        tables = {'teams': {}, 'players': {}, 'games': {}, 'box': {}}
+        for filename in os.listdir(path):
+            if filename.endswith('.npy'):
+                table, name, _ = filename.split('.')
+                tables[table][name] = np.load(os.path.join(path, filename), mmap_mode='r' if mmap else None)
+        self.teams = tables['teams']
+        self.players = tables['players']
+        self.games = tables['games']
+        self.box = tables['box']
+
+    def __len__(self) -> int:
+        return len(self.box['player_id'])
+
+    def is_current(self, conn: sqlite3.Connection) -> bool:
+        # re-reads the exported rows, without the array building and file writes of export()
+        return source_digest(source_rows(conn.cursor(), self.seasons)) == self.meta['source']
+
+    def player_rows(self, player_id: int) -> slice:
+        # box rows of one player, oldest game first
+        i = int(index_of(self.players['player_id'], player_id))
+        if i < 0:
+            return slice(0, 0)
+        return slice(int(self.players['box_start'][i]), int(self.players['box_start'][i + 1]))
+
+    def game_rows(self, game_id: int) -> np.ndarray:
+        i = int(index_of(self.games['game_id'], game_id))
+        if i < 0:
+            return np.empty(0, dtype=np.int64)
+        start = self.games['box_start']
+        return self.games['box_rows'][start[i]:start[i + 1]]
+
+    def team_games(self, team_id: int) -> np.ndarray:
+        # rows into games, home and away, in date order
+        i = int(index_of(self.teams['team_id'], team_id))
+        if i < 0:
+            return np.empty(0, dtype=np.int64)
+        start = self.teams['game_start']
+        return self.teams['game_rows'][start[i]:start[i + 1]]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the core tables as memory-mapped column files")
+    parser.add_argument("--db", default=db.DB_PATH)
+    parser.add_argument("--seasons", nargs="+", default=[db.CURRENT_SEASON])
+    parser.add_argument("--out", help="snapshot directory (default: snapshots/<seasons>)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    t = time.perf_counter()
+    path = export(conn, args.out, args.seasons)
+    elapsed = time.perf_counter() - t
+    conn.close()
+
+    t = time.perf_counter()
+    season = Season(path)
+    print(f"{path}: {len(season):,} box score rows, {len(season.games['game_id']):,} games, "
+          f"{len(season.players['player_id']):,} players; exported in {elapsed:.2f}s, "
+          f"opened in {(time.perf_counter() - t) * 1000:.1f}ms")
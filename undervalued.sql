@@ -2,7 +2,8 @@ WITH
 future_games AS (
   SELECT game_id, game_date, home_team, away_team
   FROM Games
-  WHERE game_date IN ('2025-12-04','2025-12-05')
+  WHERE season_code = 'E2025'
+    AND game_date IN ('2025-12-04','2025-12-05')
 ),
 player_pool AS (
   SELECT
@@ -19,63 +20,31 @@ player_pool AS (
   JOIN Players p
     ON p.team_id IN (fg.home_team, fg.away_team)
 ),
-hist_ext AS (
-  SELECT
-    g.game_date,
-    b.player_id,
-    pl.position,
-    pl.team_id,
-    CASE WHEN pl.team_id = g.home_team THEN g.away_team ELSE g.home_team END AS opp_team_id,
-    b.minutes_played,
-    b.eff,
-    b.ft_taken,
-    b.fouls_rv,
-    b.fouls_cm
-  FROM Boxscore b
-  JOIN Games g ON g.game_id = b.game_id
-  JOIN Players pl ON pl.player_id = b.player_id
-),
-hist_ranked AS (
-  SELECT
-    h.*,
-    ROW_NUMBER() OVER (PARTITION BY h.player_id ORDER BY h.game_date DESC) AS rn
-  FROM hist_ext h
-),
-recent_hist AS (
-  SELECT * FROM hist_ranked WHERE rn <= 8
-),
+/* recent form and opponent-vs-position aggregates are kept current by
+   update_data.py (see features.py), so nothing here rescans Boxscore */
 player_model AS (
   SELECT
-    rh.player_id,
-    COUNT(*) AS games_used,
-    AVG(rh.minutes_played) AS avg_minutes,
-    AVG(rh.eff * 1.0 / NULLIF(rh.minutes_played,0))  AS eff_per_min,
-    AVG(rh.fouls_rv * 1.0 / NULLIF(rh.minutes_played,0)) AS fouls_rv_per_min,
-    AVG(rh.fouls_cm * 1.0 / NULLIF(rh.minutes_played,0)) AS fouls_cm_per_min
-  FROM recent_hist rh
-  GROUP BY rh.player_id
+    pf.player_id,
+    pf.recent8_games            AS games_used,
+    pf.recent8_avg_min          AS avg_minutes,
+    pf.recent8_eff_per_min      AS eff_per_min,
+    pf.recent8_fouls_rv_per_min AS fouls_rv_per_min,
+    pf.recent8_fouls_cm_per_min AS fouls_cm_per_min
+  FROM PlayerForm pf
 ),
 league_pos AS (
   SELECT
     position,
-    AVG(eff * 1.0 / NULLIF(minutes_played,0)) AS league_eff_per_min_pos
-  FROM hist_ext
+    SUM(eff_per_min_sum) / NULLIF(SUM(rated_games), 0) AS league_eff_per_min_pos
+  FROM PositionAllowed
   GROUP BY position
 ),
-opp_pos_allowed AS (
-  SELECT
-    opp_team_id,
-    position,
-    AVG(eff * 1.0 / NULLIF(minutes_played,0)) AS eff_per_min_allowed
-  FROM hist_ext
-  GROUP BY opp_team_id, position
-),
 opp_pos_adj AS (
   SELECT
-    o.opp_team_id,
+    o.def_team_id AS opp_team_id,
     o.position,
-    (o.eff_per_min_allowed - lp.league_eff_per_min_pos) AS matchup_eff_adj
-  FROM opp_pos_allowed o
+    (o.eff_per_min_sum / NULLIF(o.rated_games, 0) - lp.league_eff_per_min_pos) AS matchup_eff_adj
+  FROM PositionAllowed o
   JOIN league_pos lp ON lp.position = o.position
 ),
 base_preds AS (
@@ -1,17 +1,51 @@
-from unittest import case
-
-import requests as r
+import argparse
+import re
 import sqlite3
+import time
+import db
+import features
+import fetching
+import identity
+import instrument
+import migrations
+import pipeline
 import json
 from collections import defaultdict
-from rapidfuzz import fuzz
-from unidecode import unidecode
-import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 DB_PATH = "database.db"
 
-resp = r.get('https://feeds.incrowdsports.com/provider/euroleague-feeds/v2/competitions/E/seasons/E2025/clubs')
-clubs = []
+FEEDS_URL = 'https://feeds.incrowdsports.com/provider/euroleague-feeds/v2/competitions/{competition}/seasons/{season}'
+FANTASY_URL = 'https://fantasy.basketnews.com/backend/graphql'
+FANTASY_LEAGUE_ID = "68c43c76151aef80fbfdb894"
+FANTASY_POSITIONS = ('G', 'F', 'C')     # the fantasy game's position filter values, one page each when split
+
+# Price refresh reads names, team and price only; the full query below adds photos,
+# jerseys, every team's games, stats and points, and is only worth it when those are wanted.
+FANTASY_PRICE_QUERY = """
+query playersSearchRecordsFromClient($leagueId: String!, $fantasyRound: Int, $position: String, $teamId: String) {
+  playersSearchRecordsFromClient(
+    leagueId: $leagueId
+    position: $position
+    teamId: $teamId
+    fantasyRound: $fantasyRound
+  ) {
+    records {
+      id
+      firstName
+      middleName
+      lastName
+      team(leagueId: $leagueId, fantasyRound: $fantasyRound) {
+        team {
+          abbreviation
+        }
+      }
+      fantasyPrice(leagueId: $leagueId, fantasyRound: $fantasyRound)
+      fantasyPriceChange(leagueId: $leagueId, fantasyRound: $fantasyRound)
+    }
+  }
+}
+"""
 FANTASY_QUERY = """
 query playersSearchRecordsFromClient($locale: String, $leagueId: String!, $fantasyRound: Int, $position: String, $teamId: String, $search: String, $teamGamesCurrentRound: Boolean, $pointCalcSystem: String) {
   playersSearchRecordsFromClient(
@@ -159,6 +193,7 @@ fragment partialSumPlayerStats on SumPlayerStats {
 
 
 def load_players_by_team(cur: sqlite3.Cursor) -> dict[str, list[dict[str, str]]]:
+    import matching
     cur.execute("""
         SELECT p.player_id, p.player_name, t.abbreviation
         FROM Players p
@@ -167,8 +202,8 @@ def load_players_by_team(cur: sqlite3.Cursor) -> dict[str, list[dict[str, str]]]
     players_by_team: dict[str, list[dict[str, str]]] = {}
 
     for player_id, player_name, team_abbr in cur.fetchall():
-        norm_name = normalize_name(player_name)
-        last_norm = extract_last(player_name)
+        norm_name = matching.normalize_name(player_name)
+        last_norm = matching.extract_last(player_name)
         players_by_team.setdefault(team_abbr, []).append(
             {
                 "player_id": player_id,
@@ -181,140 +216,120 @@ def load_players_by_team(cur: sqlite3.Cursor) -> dict[str, list[dict[str, str]]]
     return players_by_team
 
 
-def normalize_name(name: str) -> str:
-    if not name:
-        return ""
-    name = unidecode(name)        # removes accents (Ąžuolas -> Azuolas)
-    name = name.upper()
-    name = re.sub(r"[^A-Z\s]", "", name)   # keep only letters + spaces
-    name = re.sub(r"\s+", " ", name).strip()
-    return name
-
-
-def extract_last(name: str) -> str:
-    n = normalize_name(name)
-    parts = n.split()
-    return parts[-1] if parts else ""
-
-
-def debug_candidates(fantasy_full_norm, fantasy_last_norm, candidates):
-    rows = []
-    for cand in candidates:
-        cand_full = cand["norm_name"]
-        cand_last = cand["last_norm"]
-
-        score_last = fuzz.ratio(fantasy_last_norm, cand_last)
-        score_full = fuzz.token_sort_ratio(fantasy_full_norm, cand_full)
-
-        combined = 0.7 * score_last + 0.3 * score_full
-
-        rows.append({
-            "db_name": cand["name"],
-            "score_last": score_last,
-            "score_full": score_full,
-            "combined": combined,
-        })
-
-    rows.sort(key=lambda x: x["combined"], reverse=True)
-    return rows
-
-
-def find_best_match(full_name_raw, team_abbr, players_by_team, threshold=65.5, debug=True):
-    fantasy_full_norm = normalize_name(full_name_raw)
-    fantasy_last_norm = extract_last(full_name_raw)
-
-    candidates = players_by_team.get(team_abbr, [])
-    if not candidates:
-        return None, -1
-
-    best = None
-    best_score = -1
-
-    for cand in candidates:
-        cand_full = cand["norm_name"]
-        cand_last = cand["last_norm"]
+def update_fantasy_prices(conn: sqlite3.Connection, cur: sqlite3.Cursor, split_by_position: bool = False):
+    # the fuzzy-matching stack (numpy, rapidfuzz) is only loaded by the stage that needs it
+    import matching
+    import prices
+    from unidecode import unidecode
 
-        score_last = fuzz.ratio(fantasy_last_norm, cand_last)
-        score_full = fuzz.token_sort_ratio(fantasy_full_norm, cand_full)
-        combined = 0.7 * score_last + 0.3 * score_full
-
-        if combined > best_score:
-            best_score = combined
-            best = cand
-
-    # If low score & debug enabled → show full candidate list
-    if debug and best_score < threshold:
-        print("\n⚠️  LOW SCORE MATCH ATTEMPT")
-        print(f"Fantasy name: {full_name_raw}")
-        print(f"Team: {team_abbr}")
-        print(f"Best score: {best_score:.1f}")
-        print("\nCandidates:")
-        ranked = debug_candidates(fantasy_full_norm, fantasy_last_norm, candidates)
-        for r in ranked:
-            print(f"  - {r['db_name']:25s} | combined={r['combined']:.1f} | last={r['score_last']:.1f} | full={r['score_full']:.1f}")
-
-    if best_score >= threshold:
-        return best, best_score
-
-    return None, best_score
-
-
-def update_fantasy_prices(conn: sqlite3.Connection, cur: sqlite3.Cursor):
-    players_by_team = load_players_by_team(cur)
-    data = get_fantasy_data()['data']['playersSearchRecordsFromClient']['records']
-    unmatched = []
+    known = identity.load_identities(cur, identity.FANTASY_SOURCE)
+    data = get_fantasy_data(split_by_position=split_by_position)['data']['playersSearchRecordsFromClient']['records']
 
+    price_rows = []
+    pending = []
     for player in data:
+        external_id = str(player['id'])
+        player_id = known.get(external_id)
+        if player_id is not None:
+            price_rows.append((player['fantasyPrice'], player['fantasyPriceChange'], player_id))
+        else:
+            pending.append(player)
+
+    # only ids we have no confident link for go through fuzzy matching,
+    # against roster players nobody has claimed yet
+    claimed = {player_id for player_id in known.values() if player_id is not None}
+    players_by_team = {
+        team_abbr: [cand for cand in candidates if cand['player_id'] not in claimed]
+        for team_abbr, candidates in load_players_by_team(cur).items()
+    }
+    matcher = matching.RosterMatcher(players_by_team)
+
+    records = []
+    for player in pending:
         first_name = player['firstName'] or ""
         middle_name = player['middleName'] or ""
         last_name = player['lastName'] or ""
         team_abbr = player['team']['team']['abbreviation']
-        price = player['fantasyPrice']
-        price_change = player['fantasyPriceChange']
 
         full_name = unidecode(" ".join([first_name, last_name]).strip().upper())
+        records.append((full_name, team_abbr))
 
-        # enable debug = True to show candidate lists
-        match, score = find_best_match(full_name, team_abbr, players_by_team, threshold=85, debug=True)
+    # candidate listings are only printed the first time an id fails to match
+    seen_before = {i for i, player in enumerate(pending) if str(player['id']) in known}
+    matches = matcher.match_all(records, threshold=85, debug=True, quiet=seen_before)
+
+    unmatched = []
+    identity_rows = []
+    for i, (player, (full_name, team_abbr), (match, score)) in enumerate(zip(pending, records, matches)):
+        identity_rows.append((str(player['id']), match['player_id'] if match else None, score))
 
         if match is None:
-            unmatched.append((full_name, team_abbr, score))
+            if i not in seen_before:
+                unmatched.append((full_name, team_abbr, score))
             continue
 
         print(f"MATCHED: {full_name} -> {match['name']} (score={score:.1f})")
-
-        cur.execute("""
-            UPDATE Players SET fantasy_price = ?, fantasy_price_change = ? WHERE player_id = ?
-        """, (price, price_change, match["player_id"]))
-
+        price_rows.append((player['fantasyPrice'], player['fantasyPriceChange'], match['player_id']))
+
+    cur.execute("SELECT player_id, fantasy_price, fantasy_price_change FROM Players")
+    stored_prices = {player_id: (price, change) for player_id, price, change in cur.fetchall()}
+    changed_prices = [row for row in price_rows if stored_prices.get(row[2]) != (row[0], row[1])]
+    instrument.record_rows('Players.fantasy_price', updated=len(changed_prices),
+                           unchanged=len(price_rows) - len(changed_prices))
+
+    identity.save_identities(cur, identity.FANTASY_SOURCE, identity_rows)
+    cur.executemany("UPDATE Players SET fantasy_price = ?, fantasy_price_change = ? WHERE player_id = ?",
+                    changed_prices)
+    # history gets a row only when the price itself moved, not just the reported change
+    prices.record_prices(cur, [row for row in changed_prices if stored_prices.get(row[2], (None,))[0] != row[0]])
     conn.commit()
 
+    still_unmatched = sum(1 for i in seen_before if matches[i][0] is None)
+    print(f"Prices updated for {len(price_rows)} players: {len(data) - len(pending)} by known id, "
+          f"{len(pending)} name lookups, {still_unmatched} previously unmatched still unmatched")
     if unmatched:
         print("\n=== UNMATCHED PLAYERS ===")
         for name, team, score in unmatched:
             print(f"- {name} ({team}) score={score:.1f}")
 
 
-
-def get_fantasy_data() -> dict:
-    url = 'https://fantasy.basketnews.com/backend/graphql'
-    variables = {
-        "locale": "lt",
-        "leagueId": "68c43c76151aef80fbfdb894",
-        "fantasyRound": None,
-        "position": None,
-        "teamId": None,
-        "search": None,
-        "teamGamesCurrentRound": None,
-        "pointCalcSystem": None
-    }
+def get_fantasy_data(full: bool = False, split_by_position: bool = False,
+                     workers: int = fetching.MAX_WORKERS) -> dict:
+    if full:
+        query = FANTASY_QUERY
+        variables = {
+            "locale": "lt",
+            "leagueId": FANTASY_LEAGUE_ID,
+            "fantasyRound": None,
+            "position": None,
+            "teamId": None,
+            "search": None,
+            "teamGamesCurrentRound": None,
+            "pointCalcSystem": None
+        }
+    else:
+        # only the variables the query declares; unused ones fail validation
+        query = FANTASY_PRICE_QUERY
+        variables = {"leagueId": FANTASY_LEAGUE_ID, "fantasyRound": None, "position": None, "teamId": None}
     headers = {
         "Content-Type": "application/json",
+        "Accept-Encoding": "gzip",
         # Add auth header if required:
         # "Authorization": "Bearer <TOKEN>"
     }
-    response = r.post(url, json={"query": FANTASY_QUERY, "variables": variables}, headers=headers)
-    return response.json()
+
+    positions = FANTASY_POSITIONS if split_by_position else (None,)
+    payloads = [{"query": query, "variables": {**variables, "position": position}} for position in positions]
+    responses = fetching.post_many(FANTASY_URL, payloads, workers=workers, headers=headers)
+
+    records = {}
+    for position, response in zip(positions, responses):
+        page = response.json()['data']['playersSearchRecordsFromClient']['records']
+        if position is not None and not page:
+            raise ValueError(f"No fantasy records for position {position!r}; check FANTASY_POSITIONS")
+        for record in page:
+            records[record['id']] = record
+    return {'data': {'playersSearchRecordsFromClient': {'records': list(records.values())}}}
 
 
 def convert_abbr(abbr: str) -> str:
@@ -331,8 +346,18 @@ def convert_abbr(abbr: str) -> str:
             return abbr
 
 
-def get_teams() -> list[tuple[str, str]]:
-    for club in resp.json()['data']:
+def competition_of(season: str) -> str:
+    # 'E2025' -> 'E'
+    return season.rstrip('0123456789')
+
+
+def feed_url(season: str, path: str) -> str:
+    return FEEDS_URL.format(competition=competition_of(season), season=season) + path
+
+
+def get_teams(season: str = db.CURRENT_SEASON) -> list[tuple[str, str]]:
+    clubs = []
+    for club in fetching.get(feed_url(season, '/clubs')).json()['data']:
         abbreviation = convert_abbr(club['tvCode'])
 
         name = club['name']
@@ -341,11 +366,17 @@ def get_teams() -> list[tuple[str, str]]:
     return clubs
 
 
-def update_teams(conn: sqlite3.Connection, cur: sqlite3.Cursor):
-    clubs_api = get_teams()
+def update_teams(conn: sqlite3.Connection, cur: sqlite3.Cursor, season: str = db.CURRENT_SEASON):
+    clubs_api = get_teams(season)
 
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
+    cur.execute("SELECT abbreviation, team_name FROM Teams")
+    existing = dict(cur.fetchall())
+    instrument.record_rows(
+        'Teams',
+        inserted=sum(1 for _, abbr in clubs_api if abbr not in existing),
+        updated=sum(1 for name, abbr in clubs_api if abbr in existing and existing[abbr] != name),
+        unchanged=sum(1 for name, abbr in clubs_api if existing.get(abbr) == name),
+    )
 
     for club in clubs_api:
         name = club[0]
@@ -366,91 +397,279 @@ def update_teams(conn: sqlite3.Connection, cur: sqlite3.Cursor):
     conn.commit()
 
 
-def update_players(conn: sqlite3.Connection, cur: sqlite3.Cursor):
-    url = 'https://feeds.incrowdsports.com/provider/euroleague-feeds/v2/competitions/E/seasons/E2025/people?personType=J&Limit=1000&Offset=0&active=true&search=&sortBy=name'
-    resp = r.get(url)
-    for player in resp.json()['data']:
+PEOPLE_PATH = '/people?personType=J&Limit=1000&Offset=0&active=true&search=&sortBy=name'
+SITE_URL = 'https://www.euroleaguebasketball.net/en/euroleague/'
+PLAYER_PAGE_URL = 'https://www.euroleaguebasketball.net/_next/data/{build_id}/en/euroleague/players/{slug}/{code}.json'
+BUILD_ID = re.compile(r'"buildId"\s*:\s*"([^"]+)"')
+FALLBACK_BUILD_ID = '7KEJm6i-JCDbt9MDHCi3O'
+
+_build_id: str | None = None
+
+
+def get_build_id() -> str:
+    # _next/data urls embed the id of the site's current deployment; read it from any page
+    global _build_id
+    if _build_id is None:
+        found = BUILD_ID.search(fetching.get(SITE_URL).text)
+        if found is None:
+            print("Next.js build id not found on", SITE_URL, "- using", FALLBACK_BUILD_ID)
+        _build_id = found.group(1) if found else FALLBACK_BUILD_ID
+    return _build_id
+
+
+def get_roster(season: str = db.CURRENT_SEASON) -> list[dict]:
+    return fetching.get(feed_url(season, PEOPLE_PATH)).json()['data']
+
+
+def roster_rows(players: list[dict], team_ids: dict[str, int]) -> list[tuple]:
+    rows = []
+    for player in players:
         person_data = player['person']
-        code = person_data['code']
         name = person_data['name'].split(', ')
         first_name, last_name = name[1], name[0]
         team_name = player['club']['name']
         team_abbr = convert_abbr(player['club']['tvCode'])
-        position = player['positionName']
-        url_detailed = f'https://www.euroleaguebasketball.net/_next/data/7KEJm6i-JCDbt9MDHCi3O/en/euroleague/players/{first_name.lower()}-{last_name.lower()}/{code}.json'
-        resp_detailed = r.get(url_detailed)
 
-        cur.execute("SELECT team_id FROM Teams WHERE abbreviation = ?", (team_abbr,))
-        row = cur.fetchone()
-        if row is None:
+        team_id = team_ids.get(team_abbr)
+        if team_id is None:
             raise ValueError(f"Team not found in Teams table: {team_abbr} ({team_name})")
-        team_id = row[0]
 
-        cur.execute(
-            """
-            INSERT INTO Players (player_code, player_name, team_id, position, fantasy_price, fantasy_price_change)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ON CONFLICT(player_code) DO UPDATE SET team_id  = excluded.team_id,
-                                                   position = excluded.position
-            """,
-            (code, f'{first_name} {last_name}', team_id, position, 0.0, 0.0),
-        )
+        rows.append((person_data['code'], f'{first_name} {last_name}', team_id, player['positionName'], 0.0, 0.0))
+    return rows
 
-        cur.execute("SELECT player_id FROM Players WHERE player_code = ?", (code,))
-        player_id = cur.fetchone()[0]
 
-        try:
-            game_stats = resp_detailed.json()['pageProps']['data']['stats']['currentSeason']['gameStats'][0]['table']['sections']
-            stat_dict = defaultdict(dict)
-            for i in range(0, 6):
-                for j in range(0, len(game_stats[i]['stats']) - 2):
-                    match i:
-                        case 0:
-                            # Minutes / Points / 2FG / 3FG / Free throws
-                            stat_dict[j]['min'] = game_stats[i]['stats'][j]['statSets'][0]['value']
-                            stat_dict[j]['pts'] = game_stats[i]['stats'][j]['statSets'][1]['value']
-                            stat_dict[j]['2fg_made'], stat_dict[j]['2fg_taken'] = game_stats[i]['stats'][j]['statSets'][2]['value'].split('/')[0], game_stats[i]['stats'][j]['statSets'][2]['value'].split('/')[1]
-                            stat_dict[j]['3fg_made'], stat_dict[j]['3fg_taken'] = game_stats[i]['stats'][j]['statSets'][3]['value'].split('/')[0], game_stats[i]['stats'][j]['statSets'][3]['value'].split('/')[1]
-                            stat_dict[j]['ft_made'], stat_dict[j]['ft_taken'] = game_stats[i]['stats'][j]['statSets'][4]['value'].split('/')[0], game_stats[i]['stats'][j]['statSets'][4]['value'].split('/')[1]
-                        case 1:
-                            # Offensive rebounds / Defensive rebounds / Total rebounds
-                            stat_dict[j]['oreb'] = game_stats[i]['stats'][j]['statSets'][0]['value']
-                            stat_dict[j]['dreb'] = game_stats[i]['stats'][j]['statSets'][1]['value']
-                            stat_dict[j]['treb'] = game_stats[i]['stats'][j]['statSets'][2]['value']
-                        case 2:
-                            # ???
-                            stat_dict[j]['as'] = game_stats[i]['stats'][j]['statSets'][0]['value']
-                            stat_dict[j]['st'] = game_stats[i]['stats'][j]['statSets'][1]['value']
-                            stat_dict[j]['to'] = game_stats[i]['stats'][j]['statSets'][2]['value']
-                        case 3:
-                            # Blocks
-                            stat_dict[j]['fv'] = game_stats[i]['stats'][j]['statSets'][0]['value']
-                            stat_dict[j]['ag'] = game_stats[i]['stats'][j]['statSets'][1]['value']
-                        case 4:
-                            # Fouls
-                            stat_dict[j]['cm'] = game_stats[i]['stats'][j]['statSets'][0]['value']
-                            stat_dict[j]['rv'] = game_stats[i]['stats'][j]['statSets'][1]['value']
-                        case 5:
-                            # Efficiency
-                            stat_dict[j]['eff'] = game_stats[i]['stats'][j]['statSets'][0]['value']
-
-            opp_names = resp_detailed.json()['pageProps']['data']['stats']['currentSeason']['gameStats'][0]['table']['headSection']['stats']
-            for i in range(0, len(opp_names)):
-                if i == len(opp_names) - 1 or i == len(opp_names) - 2:
-                    stat_dict[i]['opp'] = opp_names[i]['statSets'][0]['value']
-                else:
-                    stat_dict[i]['opp'] = convert_abbr(opp_names[i]['statSets'][1]['value'])
-                    stat_dict[i]['type'] = 'home' if opp_names[i]['statSets'][1]['statType'] == 'vsType' else 'away'
+def upsert_players(cur: sqlite3.Cursor, player_rows: list[tuple]) -> None:
+    # rows identical to what is stored are left alone
+    cur.execute("SELECT player_code, team_id, position FROM Players")
+    stored_players = {code: (team_id, position) for code, team_id, position in cur.fetchall()}
+    new_players = [row for row in player_rows if row[0] not in stored_players]
+    moved_players = [row for row in player_rows
+                     if row[0] in stored_players and stored_players[row[0]] != (row[2], row[3])]
+    instrument.record_rows('Players', inserted=len(new_players), updated=len(moved_players),
+                           unchanged=len(player_rows) - len(new_players) - len(moved_players))
+
+    cur.executemany(
+        """
+        INSERT INTO Players (player_code, player_name, team_id, position, fantasy_price, fantasy_price_change)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(player_code) DO UPDATE SET team_id  = excluded.team_id,
+                                               position = excluded.position
+        """,
+        new_players + moved_players,
+    )
+
+
+def update_roster(conn: sqlite3.Connection, cur: sqlite3.Cursor, season: str = db.CURRENT_SEASON):
+    # players and their clubs only; box scores come from update_boxscores
+    cur.execute("SELECT abbreviation, team_id FROM Teams")
+    upsert_players(cur, roster_rows(get_roster(season), dict(cur.fetchall())))
+    conn.commit()
+
 
-            update_boxscore(stat_dict, player_id, team_id)
-            print("Updated stats for player:", first_name, last_name)
-            conn.commit()
+def player_stat_dict(data: dict) -> defaultdict:
+    # per-game stats of one player page, keyed by column index; TypeError when the page has none
+    table = data['pageProps']['data']['stats']['currentSeason']['gameStats'][0]['table']
+    game_stats = table['sections']
+    stat_dict = defaultdict(dict)
+    for i in range(0, 6):
+        for j in range(0, len(game_stats[i]['stats']) - 2):
+            match i:
+                case 0:
+                    # Minutes / Points / 2FG / 3FG / Free throws
+                    stat_dict[j]['min'] = game_stats[i]['stats'][j]['statSets'][0]['value']
+                    stat_dict[j]['pts'] = game_stats[i]['stats'][j]['statSets'][1]['value']
+                    stat_dict[j]['2fg_made'], stat_dict[j]['2fg_taken'] = game_stats[i]['stats'][j]['statSets'][2]['value'].split('/')[0], game_stats[i]['stats'][j]['statSets'][2]['value'].split('/')[1]
+                    stat_dict[j]['3fg_made'], stat_dict[j]['3fg_taken'] = game_stats[i]['stats'][j]['statSets'][3]['value'].split('/')[0], game_stats[i]['stats'][j]['statSets'][3]['value'].split('/')[1]
+                    stat_dict[j]['ft_made'], stat_dict[j]['ft_taken'] = game_stats[i]['stats'][j]['statSets'][4]['value'].split('/')[0], game_stats[i]['stats'][j]['statSets'][4]['value'].split('/')[1]
+                case 1:
+                    # Offensive rebounds / Defensive rebounds / Total rebounds
+                    stat_dict[j]['oreb'] = game_stats[i]['stats'][j]['statSets'][0]['value']
+                    stat_dict[j]['dreb'] = game_stats[i]['stats'][j]['statSets'][1]['value']
+                    stat_dict[j]['treb'] = game_stats[i]['stats'][j]['statSets'][2]['value']
+                case 2:
+                    # ???
+                    stat_dict[j]['as'] = game_stats[i]['stats'][j]['statSets'][0]['value']
+                    stat_dict[j]['st'] = game_stats[i]['stats'][j]['statSets'][1]['value']
+                    stat_dict[j]['to'] = game_stats[i]['stats'][j]['statSets'][2]['value']
+                case 3:
+                    # Blocks
+                    stat_dict[j]['fv'] = game_stats[i]['stats'][j]['statSets'][0]['value']
+                    stat_dict[j]['ag'] = game_stats[i]['stats'][j]['statSets'][1]['value']
+                case 4:
+                    # Fouls
+                    stat_dict[j]['cm'] = game_stats[i]['stats'][j]['statSets'][0]['value']
+                    stat_dict[j]['rv'] = game_stats[i]['stats'][j]['statSets'][1]['value']
+                case 5:
+                    # Efficiency
+                    stat_dict[j]['eff'] = game_stats[i]['stats'][j]['statSets'][0]['value']
+
+    opp_names = table['headSection']['stats']
+    for i in range(0, len(opp_names)):
+        if i == len(opp_names) - 1 or i == len(opp_names) - 2:
+            stat_dict[i]['opp'] = opp_names[i]['statSets'][0]['value']
+        else:
+            stat_dict[i]['opp'] = convert_abbr(opp_names[i]['statSets'][1]['value'])
+            stat_dict[i]['type'] = 'home' if opp_names[i]['statSets'][1]['statType'] == 'vsType' else 'away'
+    return stat_dict
+
+
+def update_players(conn: sqlite3.Connection, cur: sqlite3.Cursor, workers: int = fetching.MAX_WORKERS,
+                   season: str = db.CURRENT_SEASON, pipelined: bool = False):
+    # one season page per player; update_roster + update_boxscores is the cheaper path
+    if pipelined:
+        return stream_players(conn, cur, workers, season)
+    players = get_roster(season)
+
+    build_id = get_build_id()
+    detail_urls = [player_page_url(build_id, player) for player in players]
 
+    # fetch every player page concurrently, then write in the original order
+    detailed = fetching.get_many(detail_urls, workers=workers)
+
+    cur.execute("SELECT abbreviation, team_id FROM Teams")
+    team_ids = dict(cur.fetchall())
+    game_ids = load_game_ids(cur, season)
+    player_rows = roster_rows(players, team_ids)
+
+    parsed = []
+    for player, resp_detailed, (code, _, team_id, _, _, _) in zip(players, detailed, player_rows):
+        last_name, first_name = player['person']['name'].split(', ')[:2]
+
+        try:
+            parsed.append((code, team_id, player_stat_dict(resp_detailed.json()), first_name, last_name))
         except TypeError:
             print("No stats found for player:", first_name, last_name)
 
+    # all writes for the stage go out as two bulk statements in a single transaction
+    upsert_players(cur, player_rows)
 
-def update_boxscore(stats: defaultdict, pid: int, tid: int) -> None:
+    cur.execute("SELECT player_code, player_id FROM Players")
+    player_ids = dict(cur.fetchall())
+
+    box_rows = []
+    for code, team_id, stat_dict, first_name, last_name in parsed:
+        box_rows.extend(boxscore_rows(stat_dict, player_ids[code], team_id, team_ids, game_ids))
+        print("Updated stats for player:", first_name, last_name)
+
+    stored_box = load_boxscore(cur, {row[0] for row in box_rows})
+    changed_box = [row for row in box_rows if stored_box.get(row[:2]) != row]
+    inserted = sum(1 for row in changed_box if row[:2] not in stored_box)
+    instrument.record_rows('Boxscore', inserted=inserted, updated=len(changed_box) - inserted,
+                           unchanged=len(box_rows) - len(changed_box))
+
+    update_boxscore(cur, changed_box)
+    features.refresh_for_boxscore(cur, box_rows)
+    conn.commit()
+
+
+def player_page_url(build_id: str, player: dict) -> str:
+    last_name, first_name = player['person']['name'].split(', ')[:2]
+    return PLAYER_PAGE_URL.format(build_id=build_id, slug=f'{first_name.lower()}-{last_name.lower()}',
+                                  code=player['person']['code'])
+
+
+def stream_players(conn: sqlite3.Connection, cur: sqlite3.Cursor, workers: int = fetching.MAX_WORKERS,
+                   season: str = db.CURRENT_SEASON):
+    # update_players as a pipeline: players first, then each page is parsed and its rows
+    # written while the next pages are still downloading
+    players = get_roster(season)
+    cur.execute("SELECT abbreviation, team_id FROM Teams")
+    team_ids = dict(cur.fetchall())
+    game_ids = load_game_ids(cur, season)
+    player_rows = roster_rows(players, team_ids)
+    upsert_players(cur, player_rows)
+    conn.commit()
+    cur.execute("SELECT player_code, player_id FROM Players")
+    player_ids = dict(cur.fetchall())
+
+    build_id = get_build_id()
+
+    def parse(item, resp):
+        player, (code, _, team_id, _, _, _) = item
+        last_name, first_name = player['person']['name'].split(', ')[:2]
+        try:
+            stat_dict = player_stat_dict(resp.json())
+        except TypeError:
+            print("No stats found for player:", first_name, last_name)
+            return []
+        print("Updated stats for player:", first_name, last_name)
+        return boxscore_rows(stat_dict, player_ids[code], team_id, team_ids, game_ids)
+
+    sink = BoxscoreSink(diff=True)
+    stats = pipeline.run(conn, zip(players, player_rows), lambda item: fetching.get(player_page_url(build_id, item[0])),
+                         parse, sink.write, workers=workers)
+    sink.finish(cur)
+    conn.commit()
+    print(f"Player pages: {stats['items']} fetched, {stats['rows']} rows in {stats['batches']} batches "
+          f"in {stats['wall_s']:.1f}s, busy {', '.join(f'{k} {v:.0%}' for k, v in stats['busy'].items())}")
+
+
+class BoxscoreSink:
+    # writer side of the pipelined stages: upserts each batch as it arrives and refreshes
+    # PlayerForm / PositionAllowed once at the end for every player and team touched
+    def __init__(self, diff: bool):
+        self.diff = diff    # compare with the stored rows and skip unchanged ones
+        self.player_ids: set[int] = set()
+        self.game_ids: set[int] = set()
+        self.inserted = self.updated = self.unchanged = 0
+
+    def write(self, cur: sqlite3.Cursor, rows: list[tuple]) -> None:
+        changed = rows
+        if self.diff:
+            stored = load_player_boxscore(cur, {row[1] for row in rows})
+            changed = [row for row in rows if stored.get(row[:2]) != row]
+            inserted = sum(1 for row in changed if row[:2] not in stored)
+            self.inserted += inserted
+            self.updated += len(changed) - inserted
+            self.unchanged += len(rows) - len(changed)
+        else:
+            self.inserted += len(rows)
+        update_boxscore(cur, changed)
+        self.player_ids.update(row[1] for row in rows)
+        self.game_ids.update(row[0] for row in rows)
+
+    def finish(self, cur: sqlite3.Cursor) -> None:
+        instrument.record_rows('Boxscore', inserted=self.inserted, updated=self.updated, unchanged=self.unchanged)
+        if self.player_ids:
+            features.refresh(cur, self.player_ids, features.teams_of_games(cur, self.game_ids))
+
+
+def load_player_boxscore(cur: sqlite3.Cursor, player_ids: set[int]) -> dict[tuple[int, int], tuple]:
+    # stored rows of the given players, keyed like the upsert: (game_id, player_id)
+    stored = {}
+    player_ids = sorted(player_ids)
+    for i in range(0, len(player_ids), 500):
+        chunk = player_ids[i:i + 500]
+        cur.execute(f"SELECT * FROM Boxscore WHERE player_id IN ({','.join('?' * len(chunk))})", chunk)
+        for row in cur.fetchall():
+            stored[row[:2]] = row
+    return stored
+
+
+def load_boxscore(cur: sqlite3.Cursor, game_ids: set[int]) -> dict[tuple[int, int], tuple]:
+    # stored rows of the given games, keyed like the upsert: (game_id, player_id)
+    stored = {}
+    game_ids = sorted(game_ids)
+    for i in range(0, len(game_ids), 500):
+        chunk = game_ids[i:i + 500]
+        cur.execute(f"SELECT * FROM Boxscore WHERE game_id IN ({','.join('?' * len(chunk))})", chunk)
+        for row in cur.fetchall():
+            stored[row[:2]] = row
+    return stored
+
+
+def load_game_ids(cur: sqlite3.Cursor, season: str = db.CURRENT_SEASON) -> dict[tuple[int, int], int]:
+    # (home_team, away_team) -> first matching game of the season, same as the old per-row lookup
+    cur.execute("SELECT game_id, home_team, away_team FROM Games WHERE season_code = ? ORDER BY game_id", (season,))
+    game_ids: dict[tuple[int, int], int] = {}
+    for game_id, home_team, away_team in cur.fetchall():
+        game_ids.setdefault((home_team, away_team), game_id)
+    return game_ids
+
+
+def boxscore_rows(stats: defaultdict, pid: int, tid: int, team_ids: dict[str, int],
+                  game_ids: dict[tuple[int, int], int]) -> list[tuple]:
+    rows = []
     for idx, stats in stats.items():
         # skip rows that don't have stats (just in case)
         if 'pts' not in stats:
@@ -458,12 +677,10 @@ def update_boxscore(stats: defaultdict, pid: int, tid: int) -> None:
 
         # 1) find opponent team_id from abbreviation
         opp_abbr = stats['opp']
-        cur.execute("SELECT team_id FROM Teams WHERE abbreviation = ?", (opp_abbr,))
-        row = cur.fetchone()
-        if row is None:
+        opp_team_id = team_ids.get(opp_abbr)
+        if opp_team_id is None:
             print("Opponent not found in Teams:", opp_abbr)
             continue
-        opp_team_id = row[0]
 
         # 2) decide who is home/away from 'type'
         if stats.get('type') == 'home':
@@ -473,21 +690,11 @@ def update_boxscore(stats: defaultdict, pid: int, tid: int) -> None:
             home_team_id = opp_team_id  # player's team is away
             away_team_id = tid
 
-        # 3) find the game_id from Games table
-        cur.execute(
-            """
-            SELECT game_id
-            FROM Games
-            WHERE home_team = ?
-              AND away_team = ?
-            """,
-            (home_team_id, away_team_id),
-        )
-        row = cur.fetchone()
-        if row is None:
+        # 3) find the game_id from the Games map
+        game_id = game_ids.get((home_team_id, away_team_id))
+        if game_id is None:
             print("Game not found in Games for teams:", home_team_id, away_team_id)
             continue
-        game_id = row[0]
 
         # 4) prepare boxscore values
         minutes = parse_minutes(stats.get('min', "0"))
@@ -508,54 +715,58 @@ def update_boxscore(stats: defaultdict, pid: int, tid: int) -> None:
         fouls_rv = int(stats.get('rv', 0) or 0)
         eff = int(stats.get('eff', 0) or 0)
 
-        # 5) insert / update Boxscore
-        cur.execute(
-            """
-            INSERT INTO Boxscore
-                (
-                    game_id,
-                    player_id,
-                    minutes_played,
-                    pts,
-                    twofg_made,
-                    twofg_taken,
-                    threefg_made,
-                    threefg_taken,
-                    ft_made,
-                    ft_taken,
-                    oreb,
-                    dreb,
-                    ast,
-                    stl,
-                    fv_blk,
-                    ag_blk,
-                    fouls_cm,
-                    fouls_rv,
-                    eff
-                )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(game_id, player_id)
-                DO UPDATE SET minutes_played = excluded.minutes_played,
-                              pts            = excluded.pts,
-                              twofg_made     = excluded.twofg_made,
-                              twofg_taken    = excluded.twofg_taken,
-                              threefg_made   = excluded.threefg_made,
-                              threefg_taken  = excluded.threefg_taken,
-                              ft_made        = excluded.ft_made,
-                              ft_taken       = excluded.ft_taken,
-                              oreb           = excluded.oreb,
-                              dreb           = excluded.dreb,
-                              ast            = excluded.ast,
-                              stl            = excluded.stl,
-                              fv_blk         = excluded.fv_blk,
-                              ag_blk         = excluded.ag_blk,
-                              fouls_cm       = excluded.fouls_cm,
-                              fouls_rv       = excluded.fouls_rv,
-                              eff            = excluded.eff;
-            """,
-            (game_id, pid, minutes, pts, twofg_made, twofg_taken, threefg_made, threefg_taken,
-             ft_made, ft_taken, oreb, dreb, ast, stl, fv_blk, ag_blk, fouls_cm, fouls_rv, eff),
-        )
+        rows.append((game_id, pid, minutes, pts, twofg_made, twofg_taken, threefg_made, threefg_taken,
+                     ft_made, ft_taken, oreb, dreb, ast, stl, fv_blk, ag_blk, fouls_cm, fouls_rv, eff))
+    return rows
+
+
+def update_boxscore(cur: sqlite3.Cursor, rows: list[tuple]) -> None:
+    cur.executemany(
+        """
+        INSERT INTO Boxscore
+            (
+                game_id,
+                player_id,
+                minutes_played,
+                pts,
+                twofg_made,
+                twofg_taken,
+                threefg_made,
+                threefg_taken,
+                ft_made,
+                ft_taken,
+                oreb,
+                dreb,
+                ast,
+                stl,
+                fv_blk,
+                ag_blk,
+                fouls_cm,
+                fouls_rv,
+                eff
+            )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(game_id, player_id)
+            DO UPDATE SET minutes_played = excluded.minutes_played,
+                          pts            = excluded.pts,
+                          twofg_made     = excluded.twofg_made,
+                          twofg_taken    = excluded.twofg_taken,
+                          threefg_made   = excluded.threefg_made,
+                          threefg_taken  = excluded.threefg_taken,
+                          ft_made        = excluded.ft_made,
+                          ft_taken       = excluded.ft_taken,
+                          oreb           = excluded.oreb,
+                          dreb           = excluded.dreb,
+                          ast            = excluded.ast,
+                          stl            = excluded.stl,
+                          fv_blk         = excluded.fv_blk,
+                          ag_blk         = excluded.ag_blk,
+                          fouls_cm       = excluded.fouls_cm,
+                          fouls_rv       = excluded.fouls_rv,
+                          eff            = excluded.eff;
+        """,
+        rows,
+    )
 
 
 def parse_minutes(min_str: str) -> float:
@@ -570,72 +781,354 @@ def parse_minutes(min_str: str) -> float:
     return minutes + seconds / 60.0
 
 
-def update_games(conn: sqlite3.Connection, cur: sqlite3.Cursor):
-    for i in range(1, 39):
-        url = f'https://feeds.incrowdsports.com/provider/euroleague-feeds/v2/competitions/E/seasons/E2025/games?teamCode=&phaseTypeCode=RS&roundNumber={i}'
-        resp = r.get(url)
-        for game in resp.json()['data']:
+GAME_STATS_URL = 'https://api-live.euroleague.net/v3/competitions/{competition}/seasons/{season}/games/{code}/stats'
+
+# Boxscore column <- field of a player's stats in the game stats feed
+BOXSCORE_FIELDS = (
+    ('pts', 'points'),
+    ('twofg_made', 'fieldGoalsMade2'),
+    ('twofg_taken', 'fieldGoalsAttempted2'),
+    ('threefg_made', 'fieldGoalsMade3'),
+    ('threefg_taken', 'fieldGoalsAttempted3'),
+    ('ft_made', 'freeThrowsMade'),
+    ('ft_taken', 'freeThrowsAttempted'),
+    ('oreb', 'offensiveRebounds'),
+    ('dreb', 'defensiveRebounds'),
+    ('ast', 'assistances'),
+    ('stl', 'steals'),
+    ('fv_blk', 'blocksFavour'),
+    ('ag_blk', 'blocksAgainst'),
+    ('fouls_cm', 'foulsCommited'),
+    ('fouls_rv', 'foulsReceived'),
+    ('eff', 'valuation'),
+)
+
+
+def game_boxscore_rows(data: dict, game_id: int, player_ids: dict[str, int]) -> tuple[list[tuple], list[str]]:
+    # both rosters of one game; players who did not get on the floor have no row,
+    # same as on the player pages. Returns the rows and codes missing from Players.
+    rows, unknown = [], []
+    for side in ('local', 'road'):
+        for entry in data[side]['players']:
+            stats = entry['stats']
+            if not stats.get('timePlayed'):
+                continue
+            code = entry['player']['person']['code']
+            player_id = player_ids.get(code)
+            if player_id is None:
+                unknown.append(code)
+                continue
+            rows.append((game_id, player_id, stats['timePlayed'] / 60.0,
+                         *(int(stats.get(field) or 0) for _, field in BOXSCORE_FIELDS)))
+    return rows, unknown
+
+
+def update_boxscores(conn: sqlite3.Connection, cur: sqlite3.Cursor, workers: int = fetching.MAX_WORKERS,
+                     season: str = db.CURRENT_SEASON, pipelined: bool = False):
+    # one request per finished game that has no box score yet; rows go to that exact game
+    cur.execute("""
+        SELECT g.game_id, g.game_code
+        FROM Games g
+        WHERE g.season_code = ?
+          AND g.game_code IS NOT NULL
+          AND g.game_date < date('now')
+          AND (g.home_score > 0 OR g.away_score > 0)
+          AND NOT EXISTS (SELECT 1 FROM Boxscore b WHERE b.game_id = g.game_id)
+        ORDER BY g.game_id
+    """, (season,))
+    pending = cur.fetchall()
+    urls = [GAME_STATS_URL.format(competition=competition_of(season), season=season, code=code) for _, code in pending]
+
+    cur.execute("SELECT player_code, player_id FROM Players")
+    player_ids = dict(cur.fetchall())
+
+    unknown, failed = set(), []
+
+    def parse(game, resp):
+        if resp.status_code != 200:
+            failed.append(game[1])
+            return []
+        rows, missing = game_boxscore_rows(resp.json(), game[0], player_ids)
+        unknown.update(missing)
+        return rows
+
+    if pipelined:
+        sink = BoxscoreSink(diff=False)
+        stats = pipeline.run(conn, list(zip(pending, urls)), lambda item: fetching.get(item[1]),
+                             lambda item, resp: parse(item[0], resp), sink.write, workers=workers)
+        sink.finish(cur)
+        conn.commit()
+        n_rows = stats['rows']
+    else:
+        responses = fetching.get_many(urls, workers=workers)
+        box_rows = [row for game, resp in zip(pending, responses) for row in parse(game, resp)]
+        instrument.record_rows('Boxscore', inserted=len(box_rows))
+        update_boxscore(cur, box_rows)
+        features.refresh_for_boxscore(cur, box_rows)
+        conn.commit()
+        n_rows = len(box_rows)
+
+    print(f"Box scores: {len(pending) - len(failed)} games fetched, {n_rows} rows")
+    if failed:
+        print("Box score not available for game codes:", ", ".join(map(str, failed)))
+    if unknown:
+        print("Players missing from Players (run update_roster):", ", ".join(sorted(unknown)))
+
+
+ROUNDS = 38
+
+
+def is_final(game: dict) -> bool:
+    if 'played' in game:
+        return bool(game['played'])
+    return bool(game['home']['score'] or game['away']['score'])
+
+
+def unnumbered_games(cur: sqlite3.Cursor, season: str = db.CURRENT_SEASON) -> int:
+    # games stored before Games.round_number existed, with no code for the migration to place them by
+    cur.execute("SELECT COUNT(*) FROM Games WHERE season_code = ? AND round_number IS NULL", (season,))
+    return cur.fetchone()[0]
+
+
+def update_games(conn: sqlite3.Connection, cur: sqlite3.Cursor, full: bool = False, season: str = db.CURRENT_SEASON):
+    # completed rounds are skipped, unless some game still lacks its round: then every round is read once
+    full = full or unnumbered_games(cur, season) > 0
+    cur.execute("SELECT round_number FROM RoundSync WHERE season_code = ? AND completed = 1", (season,))
+    completed_rounds = set() if full else {row[0] for row in cur.fetchall()}
+
+    cur.execute("SELECT team_name, team_id FROM Teams")
+    team_ids = dict(cur.fetchall())
+
+    cur.execute(
+        "SELECT game_id, game_date, home_team, away_team, home_score, away_score, game_code, round_number "
+        "FROM Games WHERE season_code = ?",
+        (season,),
+    )
+    # a game is found by its code first: a rescheduled game keeps its code but not its date
+    existing_games = {row[0]: tuple(row[1:]) for row in cur.fetchall()}
+    games_by_code = {row[5]: game_id for game_id, row in existing_games.items() if row[5] is not None}
+    games_by_key = {tuple(row[:3]): game_id for game_id, row in existing_games.items()}
+
+    summary = {'fetched': 0, 'skipped': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'completed': 0}
+
+    for i in range(1, ROUNDS + 1):
+        if i in completed_rounds:
+            summary['skipped'] += 1
+            continue
+
+        url = feed_url(season, f'/games?teamCode=&phaseTypeCode=RS&roundNumber={i}')
+        resp = fetching.get(url)
+        summary['fetched'] += 1
+        games = resp.json()['data']
+
+        for game in games:
             home_team = game['home']['name']
             away_team = game['away']['name']
             home_score = game['home']['score']
             away_score = game['away']['score']
             date = game['date'].split('T')[0]
+            game_code = game.get('code')
 
-            cur.execute("SELECT team_id FROM Teams WHERE team_name = ?", (home_team,))
-            row = cur.fetchone()
-            if row is None:
+            home_team_id = team_ids.get(home_team)
+            if home_team_id is None:
                 raise ValueError(f"Home team not found in Teams table: {home_team}")
-            home_team_id = row[0]
-
-            cur.execute("SELECT team_id FROM Teams WHERE team_name = ?", (away_team,))
-            row = cur.fetchone()
-            if row is None:
+            away_team_id = team_ids.get(away_team)
+            if away_team_id is None:
                 raise ValueError(f"Away team not found in Teams table: {away_team}")
-            away_team_id = row[0]
-
-            cur.execute(
-                """
-                SELECT game_id, home_score, away_score
-                FROM Games
-                WHERE game_date = ?
-                  AND home_team = ?
-                  AND away_team = ?
-                """,
-                (date, home_team_id, away_team_id),
-            )
-            existing = cur.fetchone()
 
-            if existing is None:
+            key = (date, home_team_id, away_team_id)
+            game_id = games_by_code.get(game_code) if game_code is not None else None
+            if game_id is None:
+                game_id = games_by_key.get(key)
+            row = (date, home_team_id, away_team_id, home_score, away_score, game_code, i)
+
+            if game_id is None:
                 cur.execute(
                     """
-                    INSERT INTO Games (game_date, home_team, away_team, home_score, away_score)
-                    VALUES (?, ?, ?, ?, ?)
+                    INSERT INTO Games (season_code, game_date, home_team, away_team, home_score, away_score, game_code,
+                                       round_number)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                     """,
-                    (date, home_team_id, away_team_id, home_score, away_score),
+                    (season, *row),
                 )
+                game_id = cur.lastrowid
+                summary['inserted'] += 1
                 print(f"Inserted game: {date} {home_team} {home_score} - {away_score} {away_team}")
             else:
-                game_id, old_home_score, old_away_score = existing
-                if old_home_score != home_score or old_away_score != away_score:
+                old = existing_games[game_id]
+                if old != row:
                     cur.execute(
                         """
                         UPDATE Games
-                        SET home_score = ?,
-                            away_score = ?
+                        SET game_date    = ?,
+                            home_team    = ?,
+                            away_team    = ?,
+                            home_score   = ?,
+                            away_score   = ?,
+                            game_code    = ?,
+                            round_number = ?
                         WHERE game_id = ?
                         """,
-                        (home_score, away_score, game_id),
+                        (*row, game_id),
                     )
-                    print(
-                        f"Updated score for game {game_id}: {old_home_score}-{old_away_score} -> {home_score}-{away_score}")
-            conn.commit()
+                    games_by_key.pop(tuple(old[:3]), None)
+                    summary['updated'] += 1
+                    moved = f", {old[0]} -> {date}" if old[0] != date else ""
+                    print(f"Updated game {game_id}: {old[3]}-{old[4]} -> {home_score}-{away_score}{moved}")
+                else:
+                    summary['unchanged'] += 1
+            existing_games[game_id] = row
+            games_by_key[key] = game_id
+            if game_code is not None:
+                games_by_code[game_code] = game_id
+
+        # a round is frozen once every game in it has a final score
+        completed = bool(games) and all(is_final(game) for game in games)
+        summary['completed'] += completed
+        cur.execute(
+            """
+            INSERT INTO RoundSync (season_code, round_number, completed, games, synced_at)
+            VALUES (?, ?, ?, ?, datetime('now'))
+            ON CONFLICT(season_code, round_number) DO UPDATE SET completed = excluded.completed,
+                                                                 games     = excluded.games,
+                                                                 synced_at = excluded.synced_at
+            """,
+            (season, i, int(completed), len(games)),
+        )
+        conn.commit()
+
+    instrument.record_rows('Games', inserted=summary['inserted'], updated=summary['updated'],
+                           unchanged=summary['unchanged'])
+    print(
+        f"Games sync: {summary['fetched']} rounds fetched, {summary['skipped']} skipped (complete), "
+        f"{summary['completed']} marked complete | {summary['inserted']} inserted, "
+        f"{summary['updated']} updated, {summary['unchanged']} unchanged"
+    )
+    return summary
+
+
+def update_model_params(conn: sqlite3.Connection, cur: sqlite3.Cursor, season: str = db.CURRENT_SEASON):
+    # refit the projection weights on the box scores just ingested
+    import fit
+    result = fit.refit(conn, [season])
+    print(f"Model params: walk-forward MAE {result['default_cv_mae']:.3f} (defaults) -> {result['cv_mae']:.3f}")
+
+
+# stage name -> (function, stages that must finish first when they run in the same call).
+# Independent stages run concurrently, each on its own connection.
+STAGES = {
+    'teams': (update_teams, ()),
+    'games': (update_games, ('teams',)),
+    'roster': (update_roster, ('teams',)),
+    'players': (update_players, ('teams', 'games')),     # per-player pages, replaces roster + boxscores
+    'boxscores': (update_boxscores, ('games', 'roster')),
+    'prices': (update_fantasy_prices, ('roster',)),      # names resolve against the roster only
+    'fit': (update_model_params, ('boxscores', 'players')),       # opt-in: --stages ...,fit
+}
+DEFAULT_STAGES = ('teams', 'games', 'roster', 'boxscores', 'prices')
+BUSY_TIMEOUT = 120.0    # seconds a stage waits for another stage's write transaction
+
+
+def run_stage(name: str, **kwargs) -> None:
+    with instrument.stage(f'update_{name}'):
+        conn = db.connect(DB_PATH, factory=instrument.TimedConnection, timeout=BUSY_TIMEOUT)
+        # take the write lock when a transaction starts, so concurrent stages queue
+        # on the busy timeout instead of failing to upgrade a read snapshot
+        conn.isolation_level = 'IMMEDIATE'
+        try:
+            STAGES[name][0](conn, conn.cursor(), **kwargs)
+        finally:
+            conn.close()
+
+
+def run_stages(names: list[str], options: dict[str, dict] | None = None) -> None:
+    # start every stage whose selected dependencies are done; a failure stops new
+    # stages from starting, lets the running ones finish, then re-raises
+    options = options or {}
+    pending = {name: {dep for dep in STAGES[name][1] if dep in names} for name in names}
+    done: set[str] = set()
+    error = None
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        running = {}
+        while (pending and error is None) or running:
+            if error is None:
+                for name in [name for name, deps in pending.items() if deps <= done]:
+                    del pending[name]
+                    running[pool.submit(run_stage, name, **options.get(name, {}))] = name
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                if future.exception() is not None:
+                    print(f"Stage {name} failed: {future.exception()}")
+                    error = error or future.exception()
+                done.add(name)
+    if pending:
+        print(f"Skipped: {', '.join(pending)}")
+    if error is not None:
+        raise error
+
 
 if __name__ == "__main__":
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    update_teams(conn, cur)
-    update_games(conn, cur)
-    update_players(conn, cur)
-    update_fantasy_prices(conn, cur)
-    print("\nALL STATISTICS UPDATED.")
-    conn.close()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Sync teams, games, box scores and fantasy prices")
+    parser.add_argument("--stages", default=','.join(DEFAULT_STAGES),
+                        help=f"comma-separated subset of {', '.join(STAGES)}; dependencies among the chosen "
+                             f"stages are respected, unchosen ones are not run (default: %(default)s)")
+    parser.add_argument("--report", default=time.strftime("reports/update_data-%Y%m%d-%H%M%S.json"),
+                        help="where the JSON run report goes")
+    parser.add_argument("--profile", metavar="PATH", help="cProfile the run and dump the stats to PATH")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="track peak Python allocations per stage (slower)")
+    parser.add_argument("--season", default=db.CURRENT_SEASON,
+                        help="competition + season code to ingest, e.g. E2024 or U2025 (default: %(default)s)")
+    parser.add_argument("--player-pages", action="store_true",
+                        help="same as --stages with players instead of boxscores (and of roster, "
+                             "unless prices are updated too)")
+    parser.add_argument("--fantasy-pages", action="store_true",
+                        help="fetch fantasy prices one position per request, concurrently")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="stream box score pages through fetch, parse and write concurrently, "
+                             "committing in batches")
+    args = parser.parse_args()
+
+    stages = [name.strip() for name in args.stages.split(',') if name.strip()]
+    if args.player_pages:
+        # the roster stays when prices need it: one request, where the page crawl takes minutes
+        dropped = ('boxscores',) if 'prices' in stages else ('roster', 'boxscores')
+        stages = [name for name in stages if name not in dropped]
+        stages.insert(stages.index('prices') if 'prices' in stages else len(stages), 'players')
+    stages = list(dict.fromkeys(stages))
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+
+    options = {name: {'season': args.season} for name in stages if name != 'prices'}
+    options['prices'] = {'split_by_position': args.fantasy_pages}
+    for name in ('players', 'boxscores'):
+        if name in options:
+            options[name]['pipelined'] = args.pipeline
+
+    run = instrument.start(trace_memory=args.trace_memory)
+    with instrument.profile(args.profile):
+        with instrument.stage('migrate'):
+            conn = db.connect(DB_PATH, factory=instrument.TimedConnection)
+            migrations.migrate(conn)
+            if features.fill(conn.cursor()):
+                conn.commit()
+                print("Feature tables built from existing box scores")
+            if 'games' not in stages and unnumbered_games(conn.cursor(), args.season):
+                # the round backfill reads the rounds feed, which only the games stage fetches
+                stages.insert(0, 'games')
+                options['games'] = {'season': args.season}
+                print("Games without a round number: adding the games stage")
+            conn.close()
+        run_stages(stages, options)
+        print(f"\nUPDATED: {', '.join(stages)}.")
+        with instrument.stage('optimize'):
+            conn = db.connect(DB_PATH, factory=instrument.TimedConnection)
+            conn.execute("PRAGMA optimize")
+            conn.close()
+    instrument.stop()
+
+    run.print_summary()
+    run.write(args.report)
+    print(f"Run report written to {args.report}")